@@ -0,0 +1 @@
+"""ページ全体・計算処理のベンチマーク。"""
@@ -0,0 +1,431 @@
+"""全ページのエンドツーエンド・レイテンシ計測。
+
+各ページを Streamlit の AppTest でヘッドレス実行し、フォームを送信してから描画が
+終わるまでの時間を、データ取得（acquire）・投影（project）・描画（render）・
+解析（analyze）・それ以外（other）に分けて計測する。内訳は各ページが
+``gallery.perf.stage`` で記録したスパンから求める。外部 API の代わりに
+``gallery.stub_server`` をプロセス内で起動し、同梱のデータ
+（``input_data/West-Oakland.osm.bz2``、``data/mynetwork.graphml``、
+``data/east_bay.gpkg``）から応答させるので、ネットワーク接続なしで再現できる。
+
+    python -m benchmarks.e2e                           # 全ページ
+    python -m benchmarks.e2e --pages 06 13 --repeat 5  # ページを指定
+    python -m benchmarks.e2e --compare benchmarks/results/baseline.json
+
+結果は ``benchmarks/results/<日時>.json`` に保存され、``--compare`` で指定した
+過去の結果と比べて ``--threshold`` を超えて遅くなったページがあれば終了コード 1 を返す。
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES_DIR = ROOT / "pages"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+OSM_SOURCES = [
+    ROOT / "input_data" / "West-Oakland.osm.bz2",
+    ROOT / "data" / "mynetwork.graphml",
+]
+PLACES = ROOT / "data" / "east_bay.gpkg"
+
+# ネットワークは data/mynetwork.graphml（Piedmont）、建物は West Oakland の抽出から返る。
+# east_bay.gpkg にない地名は、代替サーバーが両方を含む範囲を境界として返す。
+NETWORK_PLACE = "Piedmont, California, USA"
+FEATURES_PLACE = "West Oakland"
+CENTER = (37.8243, -122.2316)
+
+
+# --------------------
+# ページごとのシナリオ
+# --------------------
+@dataclass
+class Scenario:
+    """フォームへの入力（ウィジェット種別, 順番, 値）と送信ボタンのラベル。
+
+    ``expect_error`` はエラー表示で終わるのが正常なシナリオ（API キーが必要なページなど）。
+    """
+
+    submit: str
+    inputs: list[tuple[str, int, object]] = field(default_factory=list)
+    expect_error: bool = False
+
+
+SCENARIOS = {
+    "00": Scenario("両方を並行取得・表示", [("text_input", 0, FEATURES_PLACE)]),
+    "01": Scenario("④ まとめて表示", [("text_input", 0, FEATURES_PLACE)]),
+    "02": Scenario("ルートを計算・表示", [("text_input", 0, NETWORK_PLACE)]),
+    "03": Scenario("ネットワークを取得・表示", [("text_input", 0, NETWORK_PLACE)]),
+    "04": Scenario("グラフを取得・処理", [("text_input", 0, NETWORK_PLACE)]),
+    "05": Scenario("実行", [("text_input", 0, NETWORK_PLACE)]),
+    "06": Scenario("解析実行", [("text_input", 0, NETWORK_PLACE)]),
+    "07": Scenario("描画実行", [("text_input", 0, NETWORK_PLACE)]),
+    "08": Scenario(
+        "取得・描画",
+        [
+            ("text_input", 0, NETWORK_PLACE),
+            ("text_input", 1, '["highway"~"residential"]'),
+        ],
+    ),
+    "09": Scenario("描画", [("text_input", 0, FEATURES_PLACE)]),
+    "10": Scenario("実行", [("text_input", 0, FEATURES_PLACE)]),
+    "11": Scenario("マップを生成", [("text_input", 0, FEATURES_PLACE)]),
+    # Google Elevation API キーがないため、ネットワーク取得後のエラー表示までを計測する
+    "12": Scenario("取得・表示", [("text_input", 0, NETWORK_PLACE)], expect_error=True),
+    "13": Scenario(
+        "実行",
+        [
+            ("number_input", 0, CENTER[0]),
+            ("number_input", 1, CENTER[1]),
+            ("slider", 0, 1000),
+        ],
+    ),
+    "14": Scenario("ネットワークを取得・変換", [("text_input", 0, NETWORK_PLACE)]),
+    "15": Scenario("描画", [("text_input", 0, NETWORK_PLACE)]),
+    "16": Scenario("データを取得・表示", [("text_input", 0, FEATURES_PLACE)]),
+    "17": Scenario("解析・表示", [("text_input", 0, NETWORK_PLACE)]),
+    "18": Scenario("クラスタリング実行", [("text_input", 0, NETWORK_PLACE)]),
+}
+
+
+# --------------------
+# 段階ごとの計測
+# --------------------
+# ページが ``gallery.perf.stage`` で記録したスパン名の先頭部分から集計先を決める。
+# どれにも当てはまらない段階（保存・読み込みなど）とスパン外の処理は other に入る。
+STAGES = {
+    "acquire": "acquire",
+    "fetch": "acquire",
+    "geocode": "acquire",
+    "nominatim": "acquire",
+    "project": "project",
+    "analyze": "analyze",
+    "render": "render",
+}
+
+
+def _union_length(intervals: list[tuple[float, float]]) -> float:
+    """重なりを除いた区間の長さの合計（並行して動いた処理を二重に数えない）。"""
+    total = 0.0
+    end = float("-inf")
+    for start, stop in sorted(intervals):
+        if stop <= end:
+            continue
+        total += stop - max(start, end)
+        end = stop
+    return total
+
+
+class StageRecorder:
+    """``gallery.perf`` のスパンを受け取り、段階ごとの実行区間を集める。
+
+    入れ子のスパン（``acquire`` の中の ``fetch.graph`` など）や別スレッドで並行に
+    動いたスパンは、区間の和集合をとることで二重に数えない。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def install(self) -> None:
+        from gallery import perf
+
+        perf.add_listener(self)
+
+    def uninstall(self) -> None:
+        from gallery import perf
+
+        perf.remove_listener(self)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.intervals: dict[str, list[tuple[float, float]]] = {
+                stage: [] for stage in dict.fromkeys(STAGES.values())
+            }
+            self.spans: list[dict] = []
+
+    def __call__(self, trace, span) -> None:
+        interval = (span.start_ns / 1e9, span.end_ns / 1e9)
+        with self._lock:
+            self.spans.append({"name": span.name, "duration": span.duration})
+            stage = STAGES.get(span.name.split(".")[0])
+            if stage is not None:
+                self.intervals[stage].append(interval)
+
+    def summary(self, total: float) -> dict[str, float]:
+        with self._lock:
+            stages = {
+                stage: _union_length(intervals)
+                for stage, intervals in self.intervals.items()
+            }
+            recorded = _union_length([i for v in self.intervals.values() for i in v])
+        stages["other"] = max(total - recorded, 0.0)
+        return stages
+
+
+# --------------------
+# 実行
+# --------------------
+def _reset_caches(cache_dir: Path) -> None:
+    """プロセス内・ディスク上のキャッシュを空にして、毎回同じ条件で計測する。"""
+    from gallery import geocode, render
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    geocode._memory.clear()
+    render._figures.clear()
+
+
+def _apply(at, scenario: Scenario) -> None:
+    for widget, index, value in scenario.inputs:
+        getattr(at, widget)[index].set_value(value)
+    buttons = [b for b in at.button if b.label == scenario.submit]
+    if not buttons:
+        raise LookupError(f"送信ボタンが見つかりません: {scenario.submit}")
+    buttons[0].click()
+
+
+def run_page(
+    path: Path,
+    scenario: Scenario,
+    recorder: StageRecorder,
+    timeout: float,
+    trace_memory: bool = False,
+) -> dict:
+    """ページを 1 回実行し、フォーム送信後の処理時間と段階ごとの内訳を返す。"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(path), default_timeout=timeout)
+    start = time.perf_counter()
+    at.run()
+    initial = time.perf_counter() - start
+
+    _apply(at, scenario)
+    recorder.reset()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    at.run()
+    total = time.perf_counter() - start
+    result = {
+        "initial": initial,
+        "total": total,
+        "stages": recorder.summary(total),
+        "spans": list(recorder.spans),
+    }
+    if trace_memory:
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result["errors"] = [e.value for e in at.error]
+    result["exception"] = [e.message for e in at.exception]
+    return result
+
+
+def _median(runs: list[dict]) -> dict[str, float]:
+    median = {"total": statistics.median(r["total"] for r in runs)}
+    for stage in runs[0]["stages"]:
+        median[stage] = statistics.median(r["stages"][stage] for r in runs)
+    return median
+
+
+def benchmark(
+    pages: list[Path], repeat: int, timeout: float, cache_dir: Path, warm: bool
+) -> dict:
+    recorder = StageRecorder()
+    recorder.install()
+    results = {}
+    try:
+        for path in pages:
+            scenario = SCENARIOS[path.name[:2]]
+            print(f"▶ {path.name}", flush=True)
+            runs = []
+            for i in range(repeat):
+                if not warm or i == 0:
+                    _reset_caches(cache_dir)
+                runs.append(run_page(path, scenario, recorder, timeout))
+            # メモリ計測は tracemalloc のオーバーヘッドが時間に影響するため別に 1 回実行する
+            if not warm:
+                _reset_caches(cache_dir)
+            memory = run_page(path, scenario, recorder, timeout, trace_memory=True)
+
+            last = runs[-1]
+            failed = last["exception"] or (last["errors"] and not scenario.expect_error)
+            results[path.stem] = {
+                "status": "error" if failed else "ok",
+                "errors": last["errors"],
+                "exception": last["exception"],
+                "median": _median(runs),
+                "peak_memory_bytes": memory["peak_memory_bytes"],
+                "runs": runs,
+            }
+            median = results[path.stem]["median"]
+            print(
+                "  "
+                + "  ".join(f"{k}={v:.2f}s" for k, v in median.items())
+                + f"  peak={memory['peak_memory_bytes'] / 1024**2:.1f}MB",
+                flush=True,
+            )
+    finally:
+        recorder.uninstall()
+    return results
+
+
+def _metadata(args) -> dict:
+    import osmnx as ox
+    import streamlit as st
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            # git の管理外で実行した場合は空文字列になる
+            check=False,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "osmnx": ox.__version__,
+        "streamlit": st.__version__,
+        "repeat": args.repeat,
+        "warm": args.warm,
+        "delay": args.delay,
+    }
+
+
+# --------------------
+# 比較
+# --------------------
+def compare(
+    current: dict, baseline: dict, threshold: float, min_delta: float = 0.05
+) -> list[dict]:
+    """中央値が baseline より ``threshold`` 以上（かつ ``min_delta`` 秒以上）遅いものを返す。"""
+    regressions = []
+    for page, result in current["pages"].items():
+        base = baseline["pages"].get(page)
+        if base is None:
+            continue
+        for metric, value in result["median"].items():
+            before = base["median"].get(metric)
+            if before is None:
+                continue
+            if value - before >= min_delta and value > before * (1 + threshold):
+                regressions.append(
+                    {
+                        "page": page,
+                        "metric": metric,
+                        "baseline": before,
+                        "current": value,
+                        "ratio": value / before if before else float("inf"),
+                    }
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", nargs="*", help="計測するページ番号（例: 06 13）")
+    parser.add_argument("--repeat", type=int, default=3, help="ページごとの計測回数")
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="1 回の実行の上限（秒）"
+    )
+    parser.add_argument(
+        "--warm", action="store_true", help="キャッシュを計測ごとに空にしない"
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="代替サーバーの応答遅延（秒）"
+    )
+    parser.add_argument("--output", help="結果の保存先（既定: benchmarks/results/）")
+    parser.add_argument("--compare", help="比較する過去の結果（JSON）")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="遅くなったとみなす割合"
+    )
+    args = parser.parse_args()
+
+    # ページが出す非推奨警告などで計測結果の表示が埋もれないようにする
+    warnings.simplefilter("ignore")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    cache_dir = Path(tempfile.mkdtemp(prefix="gallery-bench-"))
+    # gallery.settings を読み込む前に設定する
+    os.environ["GALLERY_CACHE_DIR"] = str(cache_dir)
+    # 初回アクセスの時間を計測するため、既定では起動時の事前読み込みを行わない
+    os.environ.setdefault("GALLERY_PRELOAD", "")
+
+    from gallery.stub_server import OsmExtract, StubBackend, start_in_thread
+
+    backend = StubBackend(
+        extract=OsmExtract(*OSM_SOURCES), places=PLACES, delay=args.delay
+    )
+    server, url = start_in_thread(backend)
+    os.environ["OVERPASS_URL"] = f"{url}/api"
+    os.environ["NOMINATIM_URL"] = f"{url}/"
+
+    pages = sorted(PAGES_DIR.glob("[0-9][0-9]_*.py"))
+    if args.pages:
+        pages = [p for p in pages if p.name[:2] in args.pages]
+
+    try:
+        results = {
+            "meta": _metadata(args),
+            "pages": benchmark(pages, args.repeat, args.timeout, cache_dir, args.warm),
+        }
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    output = (
+        Path(args.output)
+        if args.output
+        else RESULTS_DIR / (datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 {output}")
+
+    failed = [p for p, r in results["pages"].items() if r["status"] != "ok"]
+    for page in failed:
+        result = results["pages"][page]
+        print(f"❌ {page}: {result['exception'] or result['errors']}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            print(
+                f"🐢 {r['page']} {r['metric']}: "
+                f"{r['baseline']:.2f}s → {r['current']:.2f}s (×{r['ratio']:.2f})"
+            )
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""解析処理のベンチマークに使うグラフ。
+
+同梱の ``data/mynetwork.graphml`` に加え、規模を変えた格子状の
+道路ネットワークを生成して計算量の伸び方を比較できるようにする。
+"""
+
+import functools
+import itertools
+import math
+from pathlib import Path
+
+import networkx as nx
+import osmnx as ox
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURE = ROOT / "data" / "mynetwork.graphml"
+
+# 格子の一辺のノード数（ノード数は 100, 400, 1600）
+GRID_SIZES = (10, 20, 40)
+
+# 格子を置く位置と間隔（Piedmont 付近、100m 間隔）
+ORIGIN = (37.8243, -122.2316)
+SPACING = 100.0
+
+
+def grid_graph(size: int, spacing: float = SPACING, origin=ORIGIN):
+    """``size`` × ``size`` の格子状の道路ネットワークを OSMnx と同じ形式で作る。
+
+    ノードは緯度経度（EPSG:4326）を持ち、エッジは双方向で ``length`` を持つ。
+    """
+    lat0, lon0 = origin
+    dlat = spacing / 111_320
+    dlon = spacing / (111_320 * math.cos(math.radians(lat0)))
+
+    G = nx.MultiDiGraph(crs="epsg:4326", simplified=True)
+    for i in range(size):
+        for j in range(size):
+            G.add_node(i * size + j, y=lat0 + i * dlat, x=lon0 + j * dlon)
+
+    # 右隣と上隣のノードとを双方向のエッジで結ぶ
+    pairs = [(u, u + 1) for u in G.nodes if (u + 1) % size]
+    pairs += [(u, u + size) for u in G.nodes if u + size < size * size]
+    for osmid, (u, v) in enumerate(pairs):
+        attrs = {"osmid": osmid, "highway": "residential", "length": spacing}
+        G.add_edge(u, v, oneway=False, reversed=False, **attrs)
+        G.add_edge(v, u, oneway=False, reversed=True, **attrs)
+    return G
+
+
+@functools.lru_cache
+def load(name: str):
+    """名前（``mynetwork`` または ``grid-<一辺のノード数>``）からグラフを返す。
+
+    同じグラフを使い回すため、解析処理で属性を書き換える場合は複製して使う。
+    """
+    if name == "mynetwork":
+        return ox.load_graphml(FIXTURE)
+    return grid_graph(int(name.removeprefix("grid-")))
+
+
+@functools.lru_cache
+def load_projected(name: str):
+    """``load`` のグラフを投影したもの。"""
+    return ox.project_graph(load(name))
+
+
+NAMES = ["mynetwork"] + [f"grid-{size}" for size in GRID_SIZES]
+
+
+def unsimplified(G, segments: int = 4):
+    """簡素化済みのグラフ ``G`` を、``simplify=False`` で取得したような形に戻す。
+
+    形状（``geometry``）を持つエッジはその頂点ごとに、持たないエッジは
+    ``segments`` 等分した点ごとにノードを置いた線分のエッジに分解する。
+    同じ座標の点は同じノードになり、逆向きのエッジとノードを共有する。
+    """
+    H = nx.MultiDiGraph(crs=G.graph["crs"])
+    H.add_nodes_from((n, {"x": d["x"], "y": d["y"]}) for n, d in G.nodes(data=True))
+    ids = {(d["x"], d["y"]): n for n, d in G.nodes(data=True)}
+    next_id = max(G.nodes) + 1
+
+    for u, v, data in G.edges(data=True):
+        if "geometry" in data:
+            coords = list(data["geometry"].coords)
+        else:
+            (x0, y0), (x1, y1) = [(G.nodes[n]["x"], G.nodes[n]["y"]) for n in (u, v)]
+            coords = [
+                (x0 + (x1 - x0) * i / segments, y0 + (y1 - y0) * i / segments)
+                for i in range(segments + 1)
+            ]
+        # 簡素化でリストにまとめられた属性は、先頭の値に戻す
+        attrs = {
+            key: value[0] if isinstance(value, list) else value
+            for key, value in data.items()
+            if key not in ("geometry", "length")
+        }
+        path = [u]
+        for xy in coords[1:-1]:
+            xy = (round(xy[0], 9), round(xy[1], 9))
+            if xy not in ids:
+                ids[xy] = next_id
+                H.add_node(next_id, x=xy[0], y=xy[1])
+                next_id += 1
+            path.append(ids[xy])
+        path.append(v)
+        length = data.get("length", 0) / (len(path) - 1)
+        for a, b in itertools.pairwise(path):
+            H.add_edge(a, b, length=length, **attrs)
+    return H
@@ -0,0 +1,83 @@
+"""解析処理のベンチマーク結果から、規模に対する処理時間の伸び方を表示する。
+
+``pytest benchmarks/test_kernels.py --benchmark-json=<path>`` の結果を読み、
+処理ごとに格子グラフのノード数と処理時間（中央値）を並べ、
+両対数での傾き（処理時間 ∝ ノード数^傾き）を求める。
+
+    python -m benchmarks.scaling benchmarks/results/kernels.json
+    python -m benchmarks.scaling current.json --baseline baseline.json
+"""
+
+import argparse
+import json
+import math
+import sys
+from collections import defaultdict
+
+
+def scaling_curves(results: dict) -> dict[str, list[tuple[str, int, float]]]:
+    """処理ごとの ``(グラフ名, ノード数, 中央値[s])`` のリスト（ノード数順）。"""
+    curves = defaultdict(list)
+    for bench in results["benchmarks"]:
+        info = bench["extra_info"]
+        curves[bench["group"]].append(
+            (info["graph"], info["nodes"], bench["stats"]["median"])
+        )
+    return {
+        group: sorted(points, key=lambda p: p[1]) for group, points in curves.items()
+    }
+
+
+def exponent(points) -> float | None:
+    """格子グラフの点から、両対数での最小二乗の傾きを求める。"""
+    xs, ys = [], []
+    for name, nodes, seconds in points:
+        if name.startswith("grid-") and seconds > 0:
+            xs.append(math.log(nodes))
+            ys.append(math.log(seconds))
+    if len(xs) < 2:
+        return None
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results", help="pytest-benchmark の JSON")
+    parser.add_argument("--baseline", help="比較する過去の JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="傾きがこれ以上大きくなったら計算量の悪化とみなす",
+    )
+    args = parser.parse_args()
+
+    with open(args.results, encoding="utf-8") as f:
+        curves = scaling_curves(json.load(f))
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = scaling_curves(json.load(f))
+
+    regressions = []
+    for group, points in sorted(curves.items()):
+        slope = exponent(points)
+        print(f"\n## {group}" + ("" if slope is None else f"  (∝ n^{slope:.2f})"))
+        for name, nodes, seconds in points:
+            print(f"  {name:<12} {nodes:>7} nodes  {seconds * 1000:10.2f} ms")
+        before = exponent(baseline.get(group, []))
+        if slope is not None and before is not None:
+            print(f"  baseline: n^{before:.2f}")
+            if slope - before > args.tolerance:
+                regressions.append(group)
+
+    if regressions:
+        print(f"\n計算量が悪化した処理: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
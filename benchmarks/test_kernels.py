@@ -0,0 +1,125 @@
+"""解析処理（``gallery.analytics``）のマイクロベンチマーク。
+
+各処理を同梱の ``data/mynetwork.graphml`` と規模の異なる格子グラフで実行し、
+処理ごとのグループにノード数・エッジ数を記録する。pytest-benchmark で実行する。
+
+    pytest benchmarks/test_kernels.py --benchmark-json=benchmarks/results/kernels.json
+    python -m benchmarks.scaling benchmarks/results/kernels.json
+
+``tests/`` とは別に置いているので、通常の ``pytest`` では実行されない。
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.graphs import NAMES, load, load_projected
+from gallery import analytics, spatial
+
+# 計測回数。全ノード間の最短経路を求める処理は大きな格子で数十秒かかるため 1 回にする
+ROUNDS = 3
+HEAVY_ROUNDS = 1
+
+
+def _run(benchmark, kernel, name, func, *args, rounds=ROUNDS, **kwargs):
+    G = args[0]
+    benchmark.group = kernel
+    benchmark.extra_info.update(
+        graph=name, nodes=G.number_of_nodes(), edges=G.number_of_edges()
+    )
+    return benchmark.pedantic(func, args, kwargs, rounds=rounds, iterations=1)
+
+
+@pytest.fixture(params=NAMES)
+def graph(request):
+    return request.param, load(request.param)
+
+
+@pytest.fixture(params=NAMES)
+def projected(request):
+    return request.param, load_projected(request.param)
+
+
+def test_closeness(benchmark, projected):
+    name, G = projected
+    result = _run(
+        benchmark, "closeness", name, analytics.closeness, G, rounds=HEAVY_ROUNDS
+    )
+    assert len(result) == len(G)
+
+
+def test_betweenness(benchmark, projected):
+    name, G = projected
+    result = _run(
+        benchmark, "betweenness", name, analytics.betweenness, G, rounds=HEAVY_ROUNDS
+    )
+    assert len(result) == len(G)
+
+
+def test_betweenness_approx(benchmark, projected):
+    # ページ 06 と同じく 100 ノードからの近似
+    name, G = projected
+    k = min(100, len(G))
+    result = _run(
+        benchmark, "betweenness.k100", name, analytics.betweenness, G, k=k, seed=0
+    )
+    assert len(result) == len(G)
+
+
+def test_isochrones(benchmark, projected):
+    # ページ 13 の既定値（時速 4.5km、5〜20 分）
+    name, G = projected
+    center = next(iter(G.nodes))
+    G = G.copy()
+    result = _run(
+        benchmark,
+        "isochrones",
+        name,
+        analytics.isochrone_polygons,
+        G,
+        center,
+        [20, 15, 10, 5],
+        4.5 * 1000 / 60,
+    )
+    assert [t for t, _ in result] == [20, 15, 10, 5]
+
+
+def test_bearings(benchmark, graph):
+    name, G = graph
+    G = G.copy()
+    result = _run(benchmark, "bearings", name, analytics.edge_bearings, G)
+    assert len(result) > 0
+
+
+def test_kmeans(benchmark, projected):
+    pytest.importorskip("sklearn")
+    name, G = projected
+    result = _run(benchmark, "kmeans", name, analytics.kmeans_labels, G, 5)
+    assert set(result.values()) == set(range(5))
+
+
+def test_to_igraph(benchmark, graph):
+    pytest.importorskip("igraph")
+    name, G = graph
+    G_ig, _ = _run(benchmark, "to_igraph", name, analytics.to_igraph, G)
+    assert G_ig.vcount() == len(G) and G_ig.ecount() == G.number_of_edges()
+
+
+def _random_points(G, n=1000, seed=0):
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)])
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), size=(n, 2))
+    return points[:, 0], points[:, 1]
+
+
+def _snap(G, X, Y):
+    # インデックスはグラフごとに 1 度だけ作られ、2 回目以降は検索のみになる
+    return spatial.index_for(G).nearest_nodes(X, Y)
+
+
+def test_nearest_nodes(benchmark, projected):
+    name, G = projected
+    X, Y = _random_points(G)
+    result = _run(benchmark, "nearest_nodes", name, _snap, G, X, Y)
+    assert len(result) == len(X)
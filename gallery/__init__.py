@@ -0,0 +1 @@
+"""OSMnx デモギャラリーの各ページで共有するユーティリティ。"""
@@ -0,0 +1,232 @@
+"""OpenStreetMap からのデータ取得処理。
+
+ネットワーク・建物など複数のレイヤーを必要とするページ向けに、
+ジオコーディング後の各レイヤーの取得を asyncio で並行実行し、
+取得できたものから順に返す仕組みを提供する。
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import osmnx as ox
+import shapely
+
+from gallery import preload, settings, spatial
+from gallery.cache import SessionStore, cache_key
+from gallery.geocode import place_polygon
+from gallery.perf import stage
+
+settings.configure_osmnx()
+
+# 取得処理はプロセス全体で共有するスレッドプールで実行し、Overpass への同時接続を抑える
+_executor = ThreadPoolExecutor(
+    max_workers=settings.MAX_CONCURRENCY, thread_name_prefix="gallery-acquire"
+)
+
+# ポリゴンを受け取ってレイヤーを返す関数
+Fetcher = Callable[[Any], Any]
+
+
+def graph_from_place(place, **kwargs):
+    """``ox.graph_from_place`` のジオコーディング結果をキャッシュする版。
+
+    事前読み込み（``gallery.preload``）済みの場所はそのグラフの複製を返す。
+    取得したグラフは、範囲を指定した取得（``graph_from_polygon`` など）で
+    切り出しに使えるよう登録する。
+    """
+    if isinstance(place, str) and kwargs.keys() == {"network_type"}:
+        G = preload.lookup("graph", place, kwargs["network_type"])
+        if G is None:
+            polygon = place_polygon(place)
+            with stage("fetch.graph"):
+                G = ox.graph_from_polygon(polygon, **kwargs)
+        register_coverage(place_polygon(place), kwargs["network_type"], G)
+        return G
+    polygon = place_polygon(place)
+    with stage("fetch.graph"):
+        return ox.graph_from_polygon(polygon, **kwargs)
+
+
+def features_from_place(place, tags: dict):
+    """``ox.features_from_place`` のジオコーディング結果をキャッシュする版。
+
+    事前読み込み済みの場所の建物はその複製を返す。
+    """
+    if isinstance(place, str) and tags == {"building": True}:
+        gdf = preload.lookup("buildings", place)
+        if gdf is not None:
+            return gdf
+    polygon = place_polygon(place)
+    with stage("fetch.features"):
+        return ox.features_from_polygon(polygon, tags)
+
+
+# --------------------
+# 取得済みネットワークからの切り出し
+# --------------------
+# 範囲ごとに取得したネットワーク（境界ポリゴン, ネットワークタイプ, グラフ）
+_coverage = SessionStore(settings.COVERAGE_STORE_MB * 1024**2)
+_coverage_lock = threading.Lock()
+
+
+def register_coverage(boundary, network_type: str, G) -> None:
+    """``boundary`` 内を取得したグラフを、切り出し用に登録する（複製を保持する）。"""
+    key = cache_key("coverage", boundary.wkb_hex, network_type)
+    with _coverage_lock:
+        if key in _coverage:
+            return
+    entry = (boundary, network_type, G.copy())
+    with _coverage_lock:
+        _coverage.put(key, entry)
+
+
+def covering_graph(polygon, network_type: str):
+    """``polygon`` 全体を境界内に含む取得済みのグラフ（なければ None）。"""
+    with _coverage_lock:
+        entries = [entry for _, entry in _coverage.items()]
+    for boundary, entry_type, G in entries:
+        if entry_type == network_type and boundary.contains(polygon):
+            return G
+    return None
+
+
+def extract_subgraph(G, polygon):
+    """``G`` のうち ``polygon`` 内のノードからなる部分グラフ（最大の連結成分）。
+
+    ``ox.graph_from_polygon`` の既定（``truncate_by_edge=False``・``retain_all=False``）と
+    同じく、範囲内のノードだけを残して最大の弱連結成分を返す。
+    """
+    nodes = spatial.index_for(G).nodes_within(polygon)
+    if not nodes:
+        raise ValueError("指定した範囲にノードがありません")
+    return ox.truncate.largest_component(G.subgraph(nodes).copy())
+
+
+def graph_from_polygon(polygon, network_type: str):
+    """``ox.graph_from_polygon`` と同じだが、範囲を含む取得済みのグラフがあれば切り出す。"""
+    G = covering_graph(polygon, network_type)
+    if G is not None:
+        with stage("extract.graph"):
+            return extract_subgraph(G, polygon)
+    with stage("fetch.graph"):
+        G = ox.graph_from_polygon(polygon, network_type=network_type)
+    register_coverage(polygon, network_type, G)
+    return G
+
+
+def graph_from_bbox(bbox, network_type: str):
+    """``ox.graph_from_bbox`` の代わり。``bbox`` は ``(left, bottom, right, top)``。"""
+    return graph_from_polygon(shapely.box(*bbox), network_type)
+
+
+def graph_from_point(center_point, dist: float, network_type: str):
+    """``ox.graph_from_point`` の代わり（中心から ``dist`` メートルの矩形）。
+
+    ``center_point`` は ``(緯度, 経度)``。
+    """
+    bbox = ox.utils_geo.bbox_from_point(center_point, dist)
+    return graph_from_bbox(bbox, network_type)
+
+
+def graph_layer(network_type: str, **kwargs) -> Fetcher:
+    """ポリゴンから道路ネットワークを取得する関数を返す。"""
+    return functools.partial(ox.graph_from_polygon, network_type=network_type, **kwargs)
+
+
+def features_layer(tags: dict) -> Fetcher:
+    """ポリゴンから地物を取得する関数を返す。"""
+    return functools.partial(ox.features_from_polygon, tags=tags)
+
+
+def _in_context(func, *args) -> Callable[[], Any]:
+    """呼び出し元のトレース（``gallery.perf``）を引き継いで別スレッドで実行する関数。"""
+    return functools.partial(contextvars.copy_context().run, func, *args)
+
+
+async def acquire_layers(
+    place, layers: dict[str, Fetcher]
+) -> AsyncIterator[tuple[str, Any, Exception | None]]:
+    """ジオコーディング後に各レイヤーを並行取得し、完了した順に返す。
+
+    各要素は ``(レイヤー名, 取得結果, 例外)`` で、失敗したレイヤーは
+    取得結果が None、例外にその内容が入る。
+    """
+    loop = asyncio.get_running_loop()
+    polygon = await loop.run_in_executor(_executor, _in_context(place_polygon, place))
+
+    pending = {
+        loop.run_in_executor(
+            _executor, _in_context(stage(f"fetch.{name}")(fetcher), polygon)
+        ): name
+        for name, fetcher in layers.items()
+    }
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            name, error = pending.pop(future), future.exception()
+            yield name, None if error is not None else future.result(), error
+
+
+def iter_layers(
+    place, layers: dict[str, Fetcher]
+) -> Iterator[tuple[str, Any, Exception | None]]:
+    """``acquire_layers`` を Streamlit のスクリプトから同期的に使うためのラッパー。"""
+    loop = asyncio.new_event_loop()
+    agen = acquire_layers(place, layers)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+
+def iter_cached_layers(
+    store, place, layers: dict[str, tuple[str, Fetcher]]
+) -> Iterator[tuple[str, Any, Exception | None]]:
+    """ストアにあるレイヤーはそのまま返し、ないものだけを並行取得する。
+
+    ``layers`` はレイヤー名から ``(キャッシュキー, 取得関数)`` への辞書。
+    ストアになければ事前読み込み済みのデータを探し、それもなければ取得する。
+    取得できたレイヤーはストアに登録してから返す。
+    """
+    missing = {}
+    for name, (key, fetcher) in layers.items():
+        if key in store:
+            yield name, store.get(key), None
+            continue
+        value = preload.get(key)
+        if value is not None:
+            yield name, store.put(key, value), None
+        else:
+            missing[name] = (key, fetcher)
+    if not missing:
+        return
+    fetchers = {name: fetcher for name, (_, fetcher) in missing.items()}
+    for name, value, error in iter_layers(place, fetchers):
+        if error is None:
+            store.put(missing[name][0], value)
+        yield name, value, error
+
+
+def graph_and_features_from_place(place, network_type: str, tags: dict):
+    """道路ネットワークと地物を同じ範囲から取得する。
+
+    ジオコーディングは一度だけ行い、得られたポリゴンに対して
+    ネットワークと地物の Overpass クエリを並行して実行する。
+    """
+    results = {}
+    layers = {"graph": graph_layer(network_type), "features": features_layer(tags)}
+    for name, value, error in iter_layers(place, layers):
+        if error is not None:
+            raise error
+        results[name] = value
+    return results["graph"], results["features"]
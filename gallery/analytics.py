@@ -0,0 +1,128 @@
+"""ページで行うグラフ解析の計算処理。
+
+描画や Streamlit に依存しない部分だけをまとめ、ページとベンチマーク
+（``benchmarks/test_kernels.py``）の両方から同じ実装を呼び出せるようにする。
+"""
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+from shapely.geometry import MultiPoint
+
+# これより多いノードを持つグラフでは、媒介中心性を BETWEENNESS_SAMPLES 個のノードから近似する
+BETWEENNESS_EXACT_MAX_NODES = 300
+BETWEENNESS_SAMPLES = 100
+
+
+def closeness(G, weight: str = "length") -> dict:
+    """各ノードの近接中心性。"""
+    return nx.closeness_centrality(G, distance=weight)
+
+
+def betweenness(G, k: int | None = None, weight: str = "length", seed=None) -> dict:
+    """各ノードの媒介中心性。``k`` を指定すると k 個のノードからの近似になる。"""
+    return nx.betweenness_centrality(G, k=k, weight=weight, normalized=True, seed=seed)
+
+
+def betweenness_samples(G) -> int | None:
+    """ページで媒介中心性を求めるときのサンプル数（正確に求める場合は None）。"""
+    if G.number_of_nodes() > BETWEENNESS_EXACT_MAX_NODES:
+        return BETWEENNESS_SAMPLES
+    return None
+
+
+def isochrone_polygons(G, center_node, trip_times, meters_per_minute: float) -> list:
+    """中心ノードから各所要時間（分）で到達できる範囲の凸包を返す。
+
+    ``G`` は投影済みのグラフで、エッジに所要時間 ``time`` を追加する。
+    戻り値は ``(所要時間, ポリゴン)`` のリストで、到達できるノードが
+    ない所要時間は含まない。
+    """
+    for _, _, _, data in G.edges(keys=True, data=True):
+        data["time"] = data["length"] / meters_per_minute
+
+    polygons = []
+    for trip_time in trip_times:
+        subgraph = nx.ego_graph(G, center_node, radius=trip_time, distance="time")
+        points = [(data["x"], data["y"]) for _, data in subgraph.nodes(data=True)]
+        if points:
+            polygons.append((trip_time, MultiPoint(points).convex_hull))
+    return polygons
+
+
+def edge_bearing_arrays(G) -> tuple[np.ndarray, np.ndarray]:
+    """自己ループを除く各エッジの方位角（度）と長さ ``length`` の配列。
+
+    ``ox.bearing.add_edge_bearings`` と同じ方位角を、ノードの座標の配列から
+    まとめて求める。グラフには属性を追加しない。``G`` は緯度経度のグラフ。
+    """
+    if ox.projection.is_projected(G.graph.get("crs")):
+        raise ValueError("方位角は緯度経度のグラフから求めてください")
+    index = {node: i for i, node in enumerate(G.nodes)}
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)], dtype=float)
+    xy = xy.reshape(-1, 2)
+    edges = [
+        (index[u], index[v], length)
+        for u, v, length in G.edges(data="length", default=0.0)
+        if u != v
+    ]
+    edges = np.array(edges, dtype=float).reshape(-1, 3)
+    u, v = edges[:, 0].astype(int), edges[:, 1].astype(int)
+    bearings = ox.bearing.calculate_bearing(xy[u, 1], xy[u, 0], xy[v, 1], xy[v, 0])
+    return bearings, edges[:, 2]
+
+
+def edge_bearings(G) -> np.ndarray:
+    """自己ループを除く各エッジの方位角（度）。グラフには属性を追加しない。"""
+    return edge_bearing_arrays(G)[0]
+
+
+def bearing_histogram(bearings, weights=None, num_bins: int = 36):
+    """方位角のヒストグラム ``(ビンごとの合計, ビンの中心の角度)``。
+
+    ox の ``orientation_entropy`` と同じく、0 度・90 度などの値がビンの境界に
+    来ないよう、最初のビンを 0 度を中心とする範囲（36 ビンなら 355〜5 度）にする。
+    ``weights`` に長さを渡すと長さで重み付けした合計になる。
+    """
+    split_edges = np.linspace(0, 360, num_bins * 2 + 1)
+    split, _ = np.histogram(bearings, bins=split_edges, weights=weights)
+    split = np.roll(split, 1)
+    return split[::2] + split[1::2], split_edges[: num_bins * 2 : 2]
+
+
+def orientation_entropy(counts) -> float:
+    """ヒストグラムの方位エントロピー（シャノンエントロピー、自然対数）。
+
+    すべての方向に均等なら ``log(ビンの数)``、1 方向だけか、すべて 0 なら 0 になる。
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    p = counts[counts > 0] / total
+    return float(-(p * np.log(p)).sum())
+
+
+def kmeans_labels(G, n_clusters: int, random_state: int = 0) -> dict:
+    """投影済みのノード座標を KMeans で分類し、ノード ID からラベルへの辞書を返す。"""
+    from sklearn.cluster import KMeans
+
+    node_ids = list(G.nodes)
+    X = np.array([[G.nodes[n]["x"], G.nodes[n]["y"]] for n in node_ids])
+    labels = KMeans(n_clusters=n_clusters, random_state=random_state).fit(X).labels_
+    return dict(zip(node_ids, labels))
+
+
+def to_igraph(G, directed: bool = True):
+    """NetworkX のグラフを igraph に変換する。
+
+    戻り値は ``(igraph のグラフ, NetworkX ノード ID → igraph ノード ID)``。
+    """
+    import igraph as ig
+
+    node_mapping = {node: i for i, node in enumerate(G.nodes)}
+    G_ig = ig.Graph(directed=directed)
+    G_ig.add_vertices(len(node_mapping))
+    G_ig.vs["name"] = [str(node) for node in node_mapping]
+    G_ig.add_edges([(node_mapping[u], node_mapping[v]) for u, v in G.edges()])
+    return G_ig, node_mapping
@@ -0,0 +1,149 @@
+"""ページ間・再実行間で再利用するオブジェクトのキャッシュ。
+
+Streamlit はウィジェットを操作するたびにページ全体を再実行するため、
+取得したグラフや GeoDataFrame、描画済みの図はセッション単位のストアに保持する。
+ストアは推定メモリ使用量を記録し、上限を超えると最も古く使われたものから破棄する。
+"""
+
+import hashlib
+import json
+import sys
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+import streamlit as st
+
+from gallery import settings
+
+_STATE_KEY = "_gallery_store"
+
+
+def cache_key(*parts) -> str:
+    """クエリパラメータ（地名・ネットワークタイプなど）から安定したキーを生成する。"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def estimate_nbytes(obj: Any) -> int:
+    """オブジェクトのおおよそのメモリ使用量（バイト）を見積もる。"""
+    import networkx as nx
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, nx.Graph):
+        # ノード・エッジの属性辞書に加え、エッジ形状の座標を数える
+        nbytes = 300 * obj.number_of_nodes()
+        for *_, data in obj.edges(data=True):
+            nbytes += 400
+            geom = data.get("geometry")
+            if geom is not None:
+                nbytes += 16 * len(geom.coords)
+        return nbytes
+    if isinstance(obj, pd.DataFrame):
+        nbytes = int(obj.memory_usage(deep=True).sum())
+        geometry = getattr(obj, "geometry", None)
+        if geometry is not None:
+            import shapely
+
+            nbytes += 16 * int(shapely.get_num_coordinates(geometry.values).sum())
+        return nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimate_nbytes(k) + estimate_nbytes(v) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class SessionStore:
+    """メモリ上限付きの LRU オブジェクトストア。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+        self._entries: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key: str, value: Any, nbytes: int | None = None) -> Any:
+        """値を登録し、上限を超えた分を古いものから破棄する。
+
+        それだけで上限を超える値は登録せず（他の値も破棄しない）、そのまま返す。
+        登録した値も後の ``put`` で破棄されうるので、呼び出し側は直後に ``get`` で
+        読み直さず、戻り値を使うこと。
+        """
+        self.pop(key)
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+        if nbytes > self.max_bytes:
+            self.rejected += 1
+            return value
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+        return value
+
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> Any:
+        """登録済みならその値を、なければ ``factory()`` の結果を登録して返す。"""
+        if key in self._entries:
+            return self.get(key)
+        self.misses += 1
+        return self.put(key, factory())
+
+    def items(self) -> list[tuple[str, Any]]:
+        """登録済みのキーと値の一覧（使用順は更新しない）。"""
+        return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def pop(self, key: str) -> Any:
+        if key not in self._entries:
+            return None
+        value, nbytes = self._entries.pop(key)
+        self.nbytes -= nbytes
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+        }
+
+
+def get_store() -> SessionStore:
+    """現在のセッションに紐づくストアを返す。"""
+    if _STATE_KEY not in st.session_state:
+        st.session_state[_STATE_KEY] = SessionStore(settings.SESSION_STORE_MB * 1024**2)
+    return st.session_state[_STATE_KEY]
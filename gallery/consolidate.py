@@ -0,0 +1,164 @@
+"""交差点の統合（``ox.consolidate_intersections``）を許容距離を変えながら求める。
+
+``ox.consolidate_intersections`` は呼ぶたびにノードを許容距離だけ膨らませた円を
+結合し直すため、許容距離を変えて比べるとグラフ全体の処理を繰り返すことになる。
+ここでは、円が重なる（距離が許容距離の 2 倍未満の）ノードの組を最大の許容距離に
+ついて KD 木で 1 度だけ求め、その最小全域木（Kruskal 法）を作っておく。
+任意の許容距離での統合は、最小全域木のうち短い辺だけで結ばれた連結成分になる。
+
+    hierarchy = consolidate.hierarchy_for(G_proj)
+    nodes = hierarchy.consolidated_nodes(tolerance=15)
+
+結果のノードは ``ox.consolidate_intersections(G_proj, tolerance)`` が作るグラフの
+ノードと同じ位置・元のノード（``osmid_original``）を持つ。
+"""
+
+import threading
+import weakref
+
+import numpy as np
+import shapely
+
+from gallery import spatial
+
+# 求めておく最大の許容距離（メートル）
+MAX_TOLERANCE = 50.0
+
+# geopandas の buffer の既定と同じ円の分割数（統合後のノードの位置を ox と揃える）
+QUAD_SEGS = 16
+
+
+def _components(n: int, rows, cols) -> np.ndarray:
+    """``n`` 個のノードを辺 ``(rows, cols)`` で結んだときの連結成分の番号。"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
+
+
+class ConsolidationHierarchy:
+    """投影済みのグラフの交差点を、許容距離ごとに統合するための階層。
+
+    ``max_tolerance`` を超える許容距離は扱えない。
+    """
+
+    def __init__(self, G, max_tolerance: float = MAX_TOLERANCE):
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import minimum_spanning_tree
+
+        index = spatial.index_for(G)
+        self.max_tolerance = max_tolerance
+        self.crs = G.graph["crs"]
+        self.node_ids = index.node_ids
+        self.node_xy = index.node_xy
+        n = len(self.node_ids)
+
+        # ox と同じく、行き止まり（接続する道路が 1 本以下）のノードは統合しない
+        street_count = G.nodes(data="street_count")
+        self.keep = np.array(
+            [(c is None or c > 1) for _, c in street_count], dtype=bool
+        ).reshape(-1)
+
+        # 円が重なりうるノードの組の最小全域木（距離 0 の組は疎行列で消えないよう補う）
+        pairs, dist = index.node_pairs_within(2 * max_tolerance)
+        both = self.keep[pairs[:, 0]] & self.keep[pairs[:, 1]]
+        pairs, dist = pairs[both], np.maximum(dist[both], np.finfo(float).tiny)
+        mst = minimum_spanning_tree(
+            coo_matrix((dist, (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+        ).tocoo()
+        order = np.argsort(mst.data, kind="stable")
+        self._rows, self._cols = mst.row[order], mst.col[order]
+        self._weights = mst.data[order]
+
+        # 統合するノード同士がグラフ上でつながっているかの確認に使うエッジ
+        position = {node: i for i, node in enumerate(self.node_ids.tolist())}
+        uv = np.array([(position[u], position[v]) for u, v in G.edges()], dtype=int)
+        uv = uv.reshape(-1, 2)
+        self._edges = uv[self.keep[uv[:, 0]] & self.keep[uv[:, 1]]]
+
+    def merged(self, tolerance: float) -> np.ndarray:
+        """ノードごとの、重なった円の集まりの番号（最小全域木を切って求める）。"""
+        if tolerance > self.max_tolerance:
+            raise ValueError(f"許容距離は {self.max_tolerance} 以下にしてください")
+        cut = np.searchsorted(self._weights, 2 * tolerance, side="left")
+        return _components(len(self.node_ids), self._rows[:cut], self._cols[:cut])
+
+    def clusters(self, tolerance: float, merged=None) -> np.ndarray:
+        """ノードごとの統合先の番号（行き止まりのノードは -1）。
+
+        ox と同じく、重なった円の中でもグラフ上でつながっていないノードは分ける。
+        """
+        n = len(self.node_ids)
+        if merged is None:
+            merged = self.merged(tolerance)
+
+        # 同じ円の集まりに入り、エッジで結ばれたノードだけをまとめる
+        u, v = self._edges.T
+        same = merged[u] == merged[v]
+        labels = _components(n, u[same], v[same])
+
+        # 行き止まりのノードを除いて、番号を 0 から詰め直す
+        result = np.full(n, -1)
+        result[self.keep] = np.unique(labels[self.keep], return_inverse=True)[1]
+        return result
+
+    def count(self, tolerance: float) -> int:
+        """統合後のノード数。"""
+        return int(self.clusters(tolerance).max()) + 1
+
+    def consolidated_nodes(self, tolerance: float):
+        """統合後のノードの GeoDataFrame（``x``・``y``・``osmid_original``）。
+
+        1 つの円の集まりをまとめたノードは、ox と同じく円を結合した図形の
+        重心に置き、つながりで分けたノードは元のノードの座標の平均に置く。
+        """
+        import geopandas as gpd
+
+        merged = self.merged(tolerance)
+        labels = self.clusters(tolerance, merged)
+        kept = np.flatnonzero(labels >= 0)
+        order = kept[np.argsort(labels[kept], kind="stable")]
+        groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+
+        # 円の集まりごとの統合後のノード数（2 以上ならつながりで分けている）
+        first = [members[0] for members in groups]
+        split = np.bincount(merged[first], minlength=len(merged))[merged] > 1
+
+        xy = np.empty((len(groups), 2))
+        osmids = []
+        for i, members in enumerate(groups):
+            ids = self.node_ids[members].tolist()
+            osmids.append(ids[0] if len(ids) == 1 else ids)
+            if len(members) == 1:
+                xy[i] = self.node_xy[members[0]]
+            elif split[members[0]]:
+                xy[i] = self.node_xy[members].mean(axis=0)
+            else:
+                circles = shapely.buffer(
+                    shapely.points(self.node_xy[members]),
+                    tolerance,
+                    quad_segs=QUAD_SEGS,
+                )
+                xy[i] = shapely.get_coordinates(
+                    shapely.centroid(shapely.union_all(circles))
+                )[0]
+        return gpd.GeoDataFrame(
+            {"x": xy[:, 0], "y": xy[:, 1], "osmid_original": osmids},
+            geometry=shapely.points(xy),
+            crs=self.crs,
+        )
+
+
+# グラフごとの階層（グラフが破棄されると一緒に破棄される）
+_hierarchies: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_hierarchies_lock = threading.Lock()
+
+
+def hierarchy_for(G) -> ConsolidationHierarchy:
+    """投影済みのグラフ ``G`` の統合の階層。同じグラフには同じ階層を返す。"""
+    with _hierarchies_lock:
+        hierarchy = _hierarchies.get(G)
+        if hierarchy is None:
+            hierarchy = _hierarchies[G] = ConsolidationHierarchy(G)
+        return hierarchy
@@ -0,0 +1,52 @@
+"""グラフのエクスポートファイル（GraphML / GeoPackage）の遅延生成。
+
+生成したバイト列はグラフのキャッシュキーごとにセッションストアに保持し、
+ダウンロードボタンによる再実行でもグラフの再取得やファイルの再生成を行わない。
+"""
+
+import os
+import tempfile
+
+import osmnx as ox
+
+from gallery.cache import cache_key, get_store
+
+EXPORT_FORMATS = {
+    "graphml": {
+        "label": "GraphML",
+        "suffix": ".graphml",
+        "mime": "application/xml",
+    },
+    "gpkg": {
+        "label": "GeoPackage",
+        "suffix": ".gpkg",
+        "mime": "application/geopackage+sqlite3",
+    },
+}
+
+
+def _save(G, fmt: str, filepath: str) -> None:
+    if fmt == "graphml":
+        ox.save_graphml(G, filepath=filepath)
+    elif fmt == "gpkg":
+        ox.save_graph_geopackage(G, filepath=filepath)
+    else:
+        raise ValueError(f"未対応のエクスポート形式です: {fmt}")
+
+
+def get_export(graph_key: str, fmt: str) -> bytes | None:
+    """生成済みのエクスポートファイルを返す（未生成なら None）。"""
+    return get_store().get(cache_key("export", graph_key, fmt))
+
+
+def build_export(G, graph_key: str, fmt: str) -> bytes:
+    """エクスポートファイルを生成してセッションに保持する（生成済みなら再利用）。"""
+
+    def _build() -> bytes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "graph" + EXPORT_FORMATS[fmt]["suffix"])
+            _save(G, fmt, filepath)
+            with open(filepath, "rb") as f:
+                return f.read()
+
+    return get_store().get_or_create(cache_key("export", graph_key, fmt), _build)
@@ -0,0 +1,110 @@
+"""地名のジオコーディング結果の永続キャッシュ。
+
+Nominatim への問い合わせは遅く、利用制限もあるため、解決した境界ポリゴンを
+正規化した地名ごとにディスクへ保存し、全ページ・全セッションで共有する。
+保存するのは Nominatim の結果そのもの（完全な境界）と、表示や範囲判定に使う
+簡略化した境界の2種類。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+import geopandas as gpd
+import osmnx as ox
+import pandas as pd
+from shapely.geometry import mapping, shape
+
+from gallery import settings
+from gallery.perf import stage
+
+settings.configure_osmnx()
+
+CACHE_DIR = settings.CACHE_DIR / "geocode"
+
+# 簡略化した境界の許容誤差（度、約10m）
+SIMPLIFY_TOLERANCE = 1e-4
+
+_lock = threading.Lock()
+_memory: dict[str, dict] = {}
+
+
+def normalize_query(query: str) -> str:
+    """表記ゆれ（全角・半角、空白、大文字・小文字）を吸収した地名を返す。"""
+    query = unicodedata.normalize("NFKC", query)
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+def _cache_path(normalized: str) -> Path:
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{digest}.json"
+
+
+def _load(normalized: str) -> dict | None:
+    path = _cache_path(normalized)
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        record = json.load(f)
+    return {
+        "gdf": gpd.GeoDataFrame.from_features(record["features"], crs="epsg:4326"),
+        "simplified": shape(record["simplified"]),
+    }
+
+
+def _save(normalized: str, query: str, entry: dict) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    record = {
+        "query": query,
+        "normalized": normalized,
+        "features": json.loads(entry["gdf"].to_json()),
+        "simplified": mapping(entry["simplified"]),
+    }
+    path = _cache_path(normalized)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@stage("geocode")
+def _lookup(query: str) -> dict:
+    normalized = normalize_query(query)
+    with _lock:
+        entry = _memory.get(normalized)
+    if entry is not None:
+        return entry
+
+    entry = _load(normalized)
+    if entry is None:
+        with stage("nominatim", query=query):
+            gdf = ox.geocode_to_gdf(query)
+        simplified = gdf.union_all().simplify(
+            SIMPLIFY_TOLERANCE, preserve_topology=True
+        )
+        entry = {"gdf": gdf, "simplified": simplified}
+        _save(normalized, query, entry)
+    with _lock:
+        _memory[normalized] = entry
+    return entry
+
+
+def geocode_to_gdf(query: str | list[str]) -> gpd.GeoDataFrame:
+    """``ox.geocode_to_gdf`` のキャッシュ付き版。"""
+    if isinstance(query, str):
+        return _lookup(query)["gdf"].copy()
+    gdfs = [_lookup(q)["gdf"] for q in query]
+    return gpd.GeoDataFrame(pd.concat(gdfs, ignore_index=True), crs="epsg:4326")
+
+
+def place_polygon(query: str | list[str], simplified: bool = False):
+    """地名の境界ポリゴンを返す（``simplified=True`` で簡略化した境界）。"""
+    if simplified:
+        queries = [query] if isinstance(query, str) else query
+        geoms = gpd.GeoSeries([_lookup(q)["simplified"] for q in queries])
+        return geoms.union_all()
+    return geocode_to_gdf(query).union_all()
@@ -0,0 +1,213 @@
+"""道路ネットワークを固定の格子（タイル）単位で取得・保持し、つなぎ合わせる。
+
+複数の地名をまとめた広い範囲を 1 つの大きなグラフとして毎回取得する代わりに、
+経緯度の固定格子のタイルごとに簡略化前のネットワークを取得してキャッシュし、
+要求された範囲を覆うタイルをつなぎ合わせてから簡略化する。重なる範囲の
+要求ではタイルを共有し、一部の範囲を取得し直す場合もそのタイルだけを破棄する。
+
+    G = graph_tiles.graph_from_polygon(polygon, "drive")
+
+タイル同士の境界にまたがるエッジは両方のタイルに含まれ、ノードは OSM の ID で
+重複なくつながる。
+"""
+
+import contextvars
+import math
+import threading
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import shapely
+
+from gallery import settings
+from gallery.cache import SessionStore, cache_key
+from gallery.geocode import place_polygon
+from gallery.perf import stage
+from gallery.simplify import simplify_graph
+
+# タイルの大きさ（度）。東京付近で約 2km 四方
+TILE_DEG = 0.02
+
+_lock = threading.Lock()
+_tiles = SessionStore(settings.GRAPH_TILE_STORE_MB * 1024**2)
+_fetching: dict[str, threading.Lock] = {}
+
+# 道路のないタイル（海など）で osmnx の InsufficientResponseError が持つメッセージ
+_NO_DATA = "No data elements"
+
+# タイルの取得は専用のスレッドプールで並行に行う（``gallery.acquire`` のプールで
+# 実行中の処理から呼ばれても待ち合わせで詰まらないよう、プールを分けている）
+_executor = ThreadPoolExecutor(
+    max_workers=settings.MAX_CONCURRENCY, thread_name_prefix="gallery-tiles"
+)
+
+
+def tiles_for(polygon) -> list[tuple[int, int]]:
+    """``polygon``（緯度経度）と交わるタイル ``(列, 行)`` の一覧。"""
+    minx, miny, maxx, maxy = polygon.bounds
+    cols = range(math.floor(minx / TILE_DEG), math.floor(maxx / TILE_DEG) + 1)
+    rows = range(math.floor(miny / TILE_DEG), math.floor(maxy / TILE_DEG) + 1)
+    candidates = [(ix, iy) for ix in cols for iy in rows]
+    boxes = [shapely.box(*tile_bounds(t)) for t in candidates]
+    hits = shapely.intersects(np.array(boxes, dtype=object), polygon)
+    return [t for t, hit in zip(candidates, hits) if hit]
+
+
+def tile_bounds(tile: tuple[int, int]) -> tuple[float, float, float, float]:
+    """タイルの範囲 ``(left, bottom, right, top)``。"""
+    ix, iy = tile
+    return ix * TILE_DEG, iy * TILE_DEG, (ix + 1) * TILE_DEG, (iy + 1) * TILE_DEG
+
+
+def _key(tile, network_type: str) -> str:
+    return cache_key("graph_tile", network_type, TILE_DEG, *tile)
+
+
+def _fetch(tile, network_type: str):
+    try:
+        # 境界をまたぐエッジも含め、簡略化はつなぎ合わせた後に行う
+        return ox.graph_from_bbox(
+            tile_bounds(tile),
+            network_type=network_type,
+            simplify=False,
+            retain_all=True,
+            truncate_by_edge=True,
+        )
+    except ValueError as error:
+        # 道路のないタイル（海など）は空のネットワークとし、その他の誤りはそのまま返す
+        if _NO_DATA not in str(error):
+            raise
+        return nx.MultiDiGraph(crs=ox.settings.default_crs, simplified=False)
+
+
+def get_tile(tile, network_type: str):
+    """タイルのネットワーク（簡略化前）。キャッシュになければ取得する。
+
+    同じタイルを複数のセッションが同時に要求した場合も、取得は 1 度だけ行う。
+    """
+    key = _key(tile, network_type)
+    with _lock:
+        fetching = _fetching.setdefault(key, threading.Lock())
+    try:
+        with fetching:
+            with _lock:
+                G = _tiles.get(key)
+            if G is None:
+                with stage("fetch.graph_tile", tile=f"{tile[0]},{tile[1]}"):
+                    G = _fetch(tile, network_type)
+                with _lock:
+                    _tiles.put(key, G)
+    finally:
+        with _lock:
+            # 待っていた間に別の呼び出しが新しいロックを置いていれば、それは残す
+            if _fetching.get(key) is fetching:
+                del _fetching[key]
+    return G
+
+
+def stitch(graphs, polygon):
+    """タイルのネットワークをつなぎ、簡略化して ``polygon`` 内に切り詰める。
+
+    ``ox.graph_from_polygon`` の既定と同じく、最大の弱連結成分を返す。
+    """
+    graphs = [G for G in graphs if len(G)]
+    if not graphs:
+        raise ValueError("指定した範囲に道路がありません")
+    G = nx.compose_all(graphs)
+    G.graph.update(crs=graphs[0].graph.get("crs"), simplified=False)
+    G = simplify_graph(G)
+    nx.set_node_attributes(G, ox.stats.count_streets_per_node(G), "street_count")
+    G = ox.truncate.truncate_graph_polygon(G, polygon)
+    return ox.truncate.largest_component(G)
+
+
+def _submit(func, *args) -> Future:
+    # 呼び出し元のトレース（gallery.perf）を引き継いで実行する
+    return _executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def graph_from_polygon(polygon, network_type: str):
+    """``polygon``（緯度経度）を覆うタイルを並行に集めてつないだネットワーク。"""
+    tiles = tiles_for(polygon)
+    futures = [_submit(get_tile, t, network_type) for t in tiles]
+    graphs = [future.result() for future in futures]
+    with stage("stitch.graph", tiles=len(tiles)):
+        return stitch(graphs, polygon)
+
+
+def graph_from_places(
+    places: list[str],
+    network_type: str,
+    on_progress: Callable[[str, int, int], None] | None = None,
+):
+    """複数の地名の範囲をまとめたネットワーク。
+
+    各地名のジオコーディングとタイルの取得を並行に行い、地名ごとに
+    取得が終わるたびに ``on_progress(地名, 完了数, 地名の数)`` を呼ぶ。
+    地名の間で共有するタイルは 1 度だけ取得し、最後に全体を 1 つにつなぐ
+    （地名の境界をまたぐ道路もつながる）。
+    """
+    places = list(dict.fromkeys(places))
+    polygons: dict[str, Any] = {}
+    remaining: dict[str, set] = {}
+    tile_futures: dict[tuple[int, int], Future] = {}
+    jobs = {_submit(place_polygon, place): ("geocode", place) for place in places}
+    pending = set(jobs)
+    finished = set()
+
+    def report(place):
+        if on_progress is not None:
+            on_progress(place, len(polygons) - len(remaining), len(places))
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind, item = jobs[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                names = (
+                    [item]
+                    if kind == "geocode"
+                    else [place for place, tiles in remaining.items() if item in tiles]
+                )
+                raise ValueError(f"{', '.join(names)}: {e}") from e
+
+            if kind == "geocode":
+                polygons[item] = result
+                tiles = set(tiles_for(result)) - finished
+                # 他の地名で要求済みのタイルは取得し直さない
+                for tile in tiles - tile_futures.keys():
+                    tile_futures[tile] = _submit(get_tile, tile, network_type)
+                    jobs[tile_futures[tile]] = ("tile", tile)
+                    pending.add(tile_futures[tile])
+                remaining[item] = tiles
+            else:
+                finished.add(item)
+                for tiles in remaining.values():
+                    tiles.discard(item)
+
+            for place in [p for p, tiles in remaining.items() if not tiles]:
+                del remaining[place]
+                report(place)
+
+    polygon = shapely.union_all(list(polygons.values()))
+    graphs = [future.result() for future in tile_futures.values()]
+    with stage("stitch.graph", tiles=len(graphs)):
+        return stitch(graphs, polygon)
+
+
+def invalidate(polygon, network_type: str) -> int:
+    """``polygon`` と交わるタイルをキャッシュから破棄し、破棄した数を返す。"""
+    with _lock:
+        dropped = [_tiles.pop(_key(t, network_type)) for t in tiles_for(polygon)]
+    return sum(G is not None for G in dropped)
+
+
+def stats() -> dict:
+    with _lock:
+        return _tiles.stats()
@@ -0,0 +1,216 @@
+"""インタラクティブマップに埋め込む GeoJSON / TopoJSON を小さくする。
+
+``folium.GeoJson(gdf)`` は全属性と元の精度の座標をそのまま HTML に埋め込むため、
+都市規模のデータでは数 MB になる。ここでは表示するズームで見分けられない
+細部を簡略化し、座標の桁数を丸め、使わない属性を落としてから埋め込む。
+件数を制限する場合は ``representative`` で範囲全体から重要なものを選ぶ。
+
+    data = payload.optimize(edges, zoom=16, columns=["highway", "name"])
+    folium.GeoJson(data, name="Network").add_to(m)
+
+``topojson=True`` の場合は、隣り合う図形で共有する線を 1 度だけ持つ
+TopoJSON にする（``topojson`` パッケージが必要）。
+"""
+
+import json
+import math
+
+import numpy as np
+import shapely
+
+# ズーム 0 での 1 ピクセルあたりの距離（赤道上、メートル）
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+# 緯度 1 度あたりの距離（メートル）
+METERS_PER_DEGREE = 111_320
+
+# 簡略化の許容誤差（ピクセル）
+TOLERANCE_PIXELS = 0.5
+
+
+def meters_per_pixel(zoom: float, lat: float = 0.0) -> float:
+    """Web メルカトルのズーム ``zoom`` での 1 ピクセルあたりの距離（メートル）。"""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2**zoom
+
+
+def tolerance_for_zoom(zoom: float, lat: float = 0.0) -> float:
+    """ズーム ``zoom`` で見分けられない細部の大きさ（度）。"""
+    return TOLERANCE_PIXELS * meters_per_pixel(zoom, lat) / METERS_PER_DEGREE
+
+
+def precision_for_zoom(zoom: float, lat: float = 0.0) -> int:
+    """ズーム ``zoom`` で 1 ピクセルより細かく表せる座標の小数点以下の桁数。"""
+    return max(0, math.ceil(-math.log10(tolerance_for_zoom(zoom, lat))))
+
+
+def property_value(value):
+    """属性の値を JSON に入れられる文字列・数値にする（欠損値は None）。"""
+    # osmnx の属性にはリストや NaN が入る
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def simplify(gdf, zoom: float, columns=()):
+    """``columns`` だけを残し、ズームに合わせて簡略化・丸めた GeoDataFrame を返す。
+
+    ``gdf`` は緯度経度（EPSG:4326）に変換してから処理する。簡略化で消えた図形は除く。
+    """
+    columns = [c for c in columns if c in gdf.columns]
+    gdf = gdf[gdf.geometry.notna()].to_crs(epsg=4326)
+    lat = gdf.geometry.values.total_bounds[[1, 3]].mean() if len(gdf) else 0.0
+
+    geometry = shapely.simplify(
+        np.asarray(gdf.geometry.values),
+        tolerance_for_zoom(zoom, lat),
+        preserve_topology=True,
+    )
+    digits = precision_for_zoom(zoom, lat)
+    geometry = shapely.transform(geometry, lambda xy: np.round(xy, digits))
+
+    keep = ~shapely.is_empty(geometry)
+    result = gdf.loc[keep, columns].copy()
+    for column in columns:
+        result[column] = result[column].map(property_value)
+    return result.set_geometry(geometry[keep], crs="epsg:4326")
+
+
+def to_geojson(gdf) -> dict:
+    """GeoDataFrame を GeoJSON の FeatureCollection（辞書）にする。
+
+    ``gdf.to_json()`` と異なり、インデックス（``id``）と欠損値の属性は含めない。
+    """
+    columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    features = []
+    for geom, values in zip(gdf.geometry.values, gdf[columns].itertuples(False)):
+        # 数値の列では simplify で None にした欠損値が NaN に戻っている
+        properties = {
+            c: v for c, v in zip(columns, map(property_value, values)) if v is not None
+        }
+        features.append(
+            {
+                "type": "Feature",
+                "properties": properties,
+                "geometry": shapely.geometry.mapping(geom),
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def optimize(gdf, zoom: float, columns=(), topojson: bool = False, name="data"):
+    """地図に埋め込むデータを作る。
+
+    ``zoom`` は地図を見るときの最大のズームで、これより拡大すると簡略化が
+    目立つ。``topojson=True`` の場合は TopoJSON の辞書を返し、``name`` が
+    オブジェクト名（``folium.TopoJson`` の ``object_path`` は ``objects.<name>``）になる。
+    """
+    gdf = simplify(gdf, zoom, columns)
+    if not topojson:
+        return to_geojson(gdf)
+
+    import topojson as tp
+
+    # 共有する線を 1 度だけ持ち、座標は整数の格子に量子化する
+    # （folium.TopoJson は量子化した TopoJSON の ``transform`` を必要とする）
+    return tp.Topology(gdf, object_name=name, prequantize=True).to_dict()
+
+
+def payload_bytes(data: dict) -> int:
+    """``data`` を JSON として埋め込んだときのおおよそのバイト数。"""
+    return len(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode())
+
+
+# --------------------
+# 代表的な図形の選択
+# --------------------
+# 道路種別の重要度（先頭ほど重要、_link は本線と同じ扱い）
+HIGHWAY_CLASSES = (
+    "motorway",
+    "trunk",
+    "primary",
+    "secondary",
+    "tertiary",
+    "unclassified",
+    "residential",
+    "living_street",
+    "service",
+)
+
+# 選択するときに範囲を分割する格子の数（縦横それぞれ）
+GRID_CELLS = 8
+
+
+def highway_rank(value) -> int:
+    """道路種別の重要度の順位（0 が最も重要）。複数の種別を持つ場合は最も重要なもの。"""
+    values = value if isinstance(value, list) else [value]
+    ranks = [
+        HIGHWAY_CLASSES.index(v.removesuffix("_link"))
+        for v in values
+        if isinstance(v, str) and v.removesuffix("_link") in HIGHWAY_CLASSES
+    ]
+    return min(ranks, default=len(HIGHWAY_CLASSES))
+
+
+def edge_importance(edges, centrality: dict | None = None):
+    """エッジの重要度（大きいほど重要）。
+
+    道路種別の順位を優先し、同じ種別の中では長さと、``centrality``
+    （ノードの中心性の辞書）があれば両端のノードの中心性の平均で比べる。
+    """
+    import pandas as pd
+
+    highway = edges["highway"] if "highway" in edges else pd.Series(None, edges.index)
+    score = len(HIGHWAY_CLASSES) - highway.map(highway_rank).astype(float)
+    if "length" in edges:
+        length = edges["length"].astype(float).fillna(0)
+        score += length / (length.max() or 1) / 2
+    if centrality:
+        u = edges.index.get_level_values(0).map(centrality)
+        v = edges.index.get_level_values(1).map(centrality)
+        c = pd.Series((np.asarray(u, float) + np.asarray(v, float)) / 2, edges.index)
+        score += c.fillna(0) / (c.max() or 1) / 2
+    return score
+
+
+def area_importance(gdf):
+    """ポリゴンの重要度として面積（平方メートル）を返す。"""
+    return gdf.to_crs(gdf.estimate_utm_crs()).area
+
+
+def representative(gdf, budget: int, importance, cells: int = GRID_CELLS):
+    """範囲全体から偏りなく、重要なものを優先して最大 ``budget`` 件を選ぶ。
+
+    範囲を ``cells`` × ``cells`` の格子に分け、各マスから重要度の高い順に
+    1 件ずつ順番に取る。図形の少ないマスの余りは他のマスに回る。
+    ``importance`` は重要度の配列か、``gdf`` から重要度を求める関数
+    （件数が ``budget`` 以下なら呼ばない）。選んだ図形は元の順番のまま返す。
+    """
+    if len(gdf) <= budget:
+        return gdf
+    if callable(importance):
+        importance = importance(gdf)
+
+    points = gdf.geometry.representative_point()
+    minx, miny, maxx, maxy = gdf.total_bounds
+    ix = np.clip(
+        ((points.x - minx) / ((maxx - minx) or 1) * cells).astype(int), 0, cells - 1
+    )
+    iy = np.clip(
+        ((points.y - miny) / ((maxy - miny) or 1) * cells).astype(int), 0, cells - 1
+    )
+    cell = np.asarray(iy * cells + ix)
+
+    # マスごとの重要度の順位（0 が最も重要）
+    importance = np.asarray(importance, dtype=float)
+    order = np.lexsort((-importance, cell))
+    start = np.searchsorted(cell[order], cell[order])
+    rank = np.empty(len(gdf), dtype=int)
+    rank[order] = np.arange(len(gdf)) - start
+
+    # 順位が同じものは重要度の高い順に取る
+    chosen = np.lexsort((-importance, rank))[:budget]
+    return gdf.iloc[np.sort(chosen)]
@@ -0,0 +1,436 @@
+"""ページ内の処理段階ごとの時間・メモリ計測。
+
+各ページは ``start_trace`` で 1 回の実行（トレース）を始め、処理を ``stage`` で囲む。
+
+    trace = perf.start_trace("06")
+    with perf.stage("acquire"):
+        G = graph_from_place(place)
+    ...
+    perf.perf_panel()
+
+計測結果はページ下部の「⏱ パフォーマンス」パネルに表示され、OpenTelemetry 形式
+（OTLP/JSON）のスパンと Prometheus のテキスト形式でダウンロードできる。
+運用時は次の環境変数で外部に出力する。
+
+- ``GALLERY_TRACE_FILE``: 完了したトレースを OTLP/JSON で 1 行ずつ追記する
+- ``GALLERY_METRICS_PORT``: ``/metrics`` で Prometheus 形式の集計を公開する
+  （待ち受けるアドレスは ``GALLERY_METRICS_HOST``、既定は ``127.0.0.1``）
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Prometheus ヒストグラムのバケット（秒）
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def peak_rss_bytes() -> int | None:
+    """プロセスの最大常駐メモリ（取得できない環境では None）。"""
+    if resource is None:
+        return None
+    # Linux は KB、macOS はバイト単位
+    scale = 1 if os.uname().sysname == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def rss_bytes() -> int | None:
+    """プロセスの現在の常駐メモリ（Linux 以外では None）。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration(self) -> float:
+        """経過時間（秒）。終了していなければ 0。"""
+        if self.end_ns is None:
+            return 0.0
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+@dataclass
+class Trace:
+    page: str
+    trace_id: str = field(default_factory=lambda: secrets.token_hex(16))
+    spans: list[Span] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+# 完了したスパンを受け取る関数（ベンチマークなどから登録する）
+_listeners: list = []
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "gallery_trace", default=None
+)
+_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "gallery_span", default=None
+)
+
+
+def start_trace(page: str) -> Trace:
+    """このスクリプト実行のトレースを開始する。"""
+    serve_metrics()
+    trace = Trace(page)
+    _trace.set(trace)
+    _span.set(None)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    return _trace.get()
+
+
+def add_listener(listener) -> None:
+    """完了したスパンごとに ``listener(trace, span)`` を呼ぶよう登録する。"""
+    _listeners.append(listener)
+
+
+def remove_listener(listener) -> None:
+    _listeners.remove(listener)
+
+
+class stage:
+    """処理段階を計測するコンテキストマネージャ兼デコレータ。
+
+    トレースが始まっていない場合（ページ外から呼ばれた場合）は何もしない。
+    別スレッドで実行する処理は ``contextvars.copy_context().run`` 経由で呼ぶと、
+    呼び出し元のスパンの子として記録される。
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span | None:
+        trace = _trace.get()
+        if trace is None:
+            self._token = None
+            return None
+        parent = _span.get()
+        self._span = Span(
+            name=self.name,
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=dict(self.attributes),
+        )
+        self._start = time.perf_counter_ns()
+        self._token = _span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        span = self._span
+        span.end_ns = span.start_ns + time.perf_counter_ns() - self._start
+        rss = peak_rss_bytes()
+        if rss is not None:
+            span.attributes["process.memory.peak_rss_bytes"] = rss
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _span.reset(self._token)
+        trace = _trace.get()
+        trace.add(span)
+        _registry.observe(trace.page, span)
+        for listener in _listeners:
+            listener(trace, span)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(self.name, **self.attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+# --------------------
+# 出力形式
+# --------------------
+def to_otlp(trace: Trace) -> dict:
+    """トレースを OTLP/JSON（ExportTraceServiceRequest）の形にする。"""
+
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    spans = []
+    for span in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        attribute("service.name", "osmnx-gallery"),
+                        attribute("gallery.page", trace.page),
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "gallery.perf"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class _Registry:
+    """プロセス全体の段階別ヒストグラム（Prometheus 出力用）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (ページ, 段階) → [バケットごとの件数, 合計秒, 件数, エラー件数]
+        self._histograms: dict[tuple[str, str], list] = {}
+        # メトリクス名 → (説明, 値)
+        self._gauges: dict[str, tuple[str, float]] = {}
+
+    def set_gauge(self, name: str, value: float, help_text: str) -> None:
+        with self._lock:
+            self._gauges[name] = (help_text, value)
+
+    def observe(self, page: str, span: Span) -> None:
+        with self._lock:
+            h = self._histograms.setdefault(
+                (page, span.name), [[0] * len(BUCKETS), 0.0, 0, 0]
+            )
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    h[0][i] += 1
+            h[1] += span.duration
+            h[2] += 1
+            h[3] += span.error is not None
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            items = sorted(
+                (key, ([*buckets], *rest))
+                for key, (buckets, *rest) in self._histograms.items()
+            )
+            gauges = sorted(self._gauges.items())
+        lines = [
+            "# HELP gallery_stage_duration_seconds ページの処理段階ごとの所要時間",
+            "# TYPE gallery_stage_duration_seconds histogram",
+        ]
+        for (page, name), (buckets, total, count, _) in items:
+            labels = f'page="{page}",stage="{name}"'
+            lines += [
+                f'gallery_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {n}'
+                for bound, n in zip(BUCKETS, buckets)
+            ]
+            lines += [
+                f'gallery_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}',
+                f"gallery_stage_duration_seconds_sum{{{labels}}} {total}",
+                f"gallery_stage_duration_seconds_count{{{labels}}} {count}",
+            ]
+        lines += [
+            "# HELP gallery_stage_errors_total 例外で終わった処理段階の数",
+            "# TYPE gallery_stage_errors_total counter",
+        ]
+        lines += [
+            f'gallery_stage_errors_total{{page="{page}",stage="{name}"}} {errors}'
+            for (page, name), (_, _, _, errors) in items
+        ]
+        rss = peak_rss_bytes()
+        if rss is not None:
+            lines += [
+                "# HELP gallery_process_peak_rss_bytes プロセスの最大常駐メモリ",
+                "# TYPE gallery_process_peak_rss_bytes gauge",
+                f"gallery_process_peak_rss_bytes {rss}",
+            ]
+        for name, (help_text, value) in gauges:
+            lines += [
+                f"# HELP {name} {help_text}",
+                f"# TYPE {name} gauge",
+                f"{name} {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+_registry = _Registry()
+
+
+def prometheus_text() -> str:
+    """プロセス全体の集計を Prometheus のテキスト形式で返す。"""
+    return _registry.prometheus_text()
+
+
+def set_gauge(name: str, value: float, help_text: str) -> None:
+    """プロセス全体の現在値（メモリ使用量など）を記録し、``/metrics`` に含める。"""
+    _registry.set_gauge(name, value, help_text)
+
+
+def trace_prometheus_text(trace: Trace) -> str:
+    """1 回のトレースの段階別時間を Prometheus のテキスト形式で返す。"""
+    lines = [
+        "# HELP gallery_last_stage_duration_seconds 直近の実行での処理段階の所要時間",
+        "# TYPE gallery_last_stage_duration_seconds gauge",
+    ]
+    for span in trace.spans:
+        lines.append(
+            f'gallery_last_stage_duration_seconds{{page="{trace.page}",'
+            f'stage="{span.name}"}} {span.duration}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+_export_lock = threading.Lock()
+
+
+def export_trace(trace: Trace) -> None:
+    """``GALLERY_TRACE_FILE`` が設定されていれば、トレースを 1 行の JSON で追記する。"""
+    path = os.environ.get("GALLERY_TRACE_FILE")
+    if not path or not trace.spans:
+        return
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(to_otlp(trace), ensure_ascii=False) + "\n")
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def serve_metrics(port: int | None = None, host: str | None = None) -> None:
+    """``/metrics`` を公開する HTTP サーバーを 1 度だけ起動する。
+
+    ``port`` を省略すると ``GALLERY_METRICS_PORT`` を使い、未設定なら何もしない。
+    ``host`` を省略すると ``GALLERY_METRICS_HOST``（既定は ``127.0.0.1``）で待ち受ける。
+    """
+    global _metrics_server
+
+    port = port or int(os.environ.get("GALLERY_METRICS_PORT", "0"))
+    host = host or os.environ.get("GALLERY_METRICS_HOST", "127.0.0.1")
+    if not port:
+        return
+    with _metrics_lock:
+        if _metrics_server is not None:
+            return
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                body = prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        _metrics_server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+
+
+# --------------------
+# 表示
+# --------------------
+def perf_panel() -> None:
+    """現在のトレースを確定し、ページ下部に計測結果のパネルを表示する。
+
+    フォーム送信を伴わない再実行でも直近の計測結果が見えるよう、
+    スパンのあるトレースはセッションに残しておく。
+    """
+    import pandas as pd
+    import streamlit as st
+
+    trace = current_trace()
+    if trace is None:
+        return
+    key = f"_gallery_perf_{trace.page}"
+    if trace.spans:
+        export_trace(trace)
+        st.session_state[key] = trace
+    else:
+        trace = st.session_state.get(key)
+    if trace is None:
+        return
+
+    with st.expander("⏱ パフォーマンス"):
+        by_id = {span.span_id: span for span in trace.spans}
+        roots = [s for s in trace.spans if s.parent_id not in by_id]
+        total = sum(s.duration for s in roots)
+
+        def depth(span):
+            d = 0
+            while span.parent_id in by_id:
+                span = by_id[span.parent_id]
+                d += 1
+            return d
+
+        rows = [
+            {
+                "段階": "　" * depth(span) + span.name,
+                "時間（秒）": round(span.duration, 3),
+                "割合": f"{span.duration / total:.0%}" if total else "-",
+                "エラー": span.error or "",
+            }
+            for span in sorted(trace.spans, key=lambda s: s.start_ns)
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, width="stretch")
+
+        peak, rss = peak_rss_bytes(), rss_bytes()
+        if peak is not None:
+            current = f"現在 {rss / 1024**2:.0f} MB / " if rss is not None else ""
+            st.caption(f"プロセスのメモリ: {current}最大 {peak / 1024**2:.0f} MB")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "スパン（OTLP/JSON）",
+                data=json.dumps(to_otlp(trace), ensure_ascii=False, indent=2),
+                file_name=f"trace_{trace.page}.json",
+                mime="application/json",
+                key=f"perf_otlp_{trace.page}",
+            )
+        with col2:
+            st.download_button(
+                "メトリクス（Prometheus）",
+                data=trace_prometheus_text(trace),
+                file_name=f"metrics_{trace.page}.prom",
+                mime="text/plain",
+                key=f"perf_prom_{trace.page}",
+            )
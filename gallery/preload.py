@@ -0,0 +1,196 @@
+"""よく使われる場所のデータをサーバー起動時に読み込んでおく。
+
+各ページの既定の場所（東京都千代田区など）にはアクセスが集中するため、
+起動直後に別スレッドで道路ネットワーク・投影済みグラフ・建物と、方位角・
+中心性などの派生データを求め、プロセス全体で共有するキャッシュに置く。
+``gallery.acquire`` と各ページは、データを取得・計算する前に ``lookup`` で
+このキャッシュを確認する。
+
+読み込む場所は ``GALLERY_PRELOAD`` に「地名@ネットワークタイプ」を ``;`` 区切りで
+指定する（未設定なら ``DEFAULT_PLACES``、空文字なら事前読み込みしない）。
+"""
+
+import contextlib
+import threading
+from collections.abc import Callable
+from typing import Any
+
+import networkx as nx
+import osmnx as ox
+import pandas as pd
+
+from gallery import analytics, perf, projection, settings
+from gallery.cache import SessionStore, cache_key
+from gallery.geocode import place_polygon
+
+# 各ページの既定の場所
+DEFAULT_PLACES = [
+    ("東京都千代田区", "drive"),
+    ("東京都港区", "drive"),
+    ("東京都文京区", "walk"),
+    ("京都市左京区", "drive"),
+]
+
+# 読み込み中のデータを待つ最大時間（秒）
+WAIT_TIMEOUT = 120
+
+# 場所ごとに読み込むデータ（地名とネットワークタイプがキーになるもの）
+GRAPH_KINDS = ("graph", "graph_proj", "bearings", "closeness", "betweenness")
+
+_lock = threading.Lock()
+_store = SessionStore(settings.PRELOAD_STORE_MB * 1024**2)
+_pending: dict[str, threading.Event] = {}
+_thread: threading.Thread | None = None
+errors: dict[str, str] = {}
+
+
+def parse_places(value: str | None) -> list[tuple[str, str]]:
+    """``GALLERY_PRELOAD`` の値を ``(地名, ネットワークタイプ)`` のリストにする。"""
+    if value is None:
+        return list(DEFAULT_PLACES)
+    places = []
+    for item in value.split(";"):
+        place, _, network_type = item.partition("@")
+        if place.strip():
+            places.append((place.strip(), network_type.strip() or "drive"))
+    return places
+
+
+def _copy(value: Any) -> Any:
+    # グラフや GeoDataFrame はページ側で属性を書き換えることがあるため複製して渡す
+    if isinstance(value, (nx.Graph, pd.DataFrame)):
+        return value.copy()
+    if isinstance(value, (list, dict)):
+        return value.copy()
+    return value
+
+
+def lookup(
+    kind: str,
+    *parts,
+    compute: Callable[[], Any] | None = None,
+    wait: bool = True,
+) -> Any:
+    """事前読み込みしたデータを返す。
+
+    キーは ``cache_key(kind, *parts)`` で、``("graph", 地名, ネットワークタイプ)``、
+    ``("buildings", 地名)`` などページのストアと同じものを使う。
+    読み込み中であれば完了を待ち（``wait=False`` なら待たない）、読み込まれて
+    いなければ ``compute()`` の結果（``compute`` を省略した場合は None）を返す。
+    """
+    return get(cache_key(kind, *parts), compute, wait)
+
+
+def get(key: str, compute: Callable[[], Any] | None = None, wait: bool = True) -> Any:
+    """``lookup`` のキーを直接指定する版。"""
+    with _lock:
+        event = _pending.get(key)
+    if event is not None and wait:
+        event.wait(WAIT_TIMEOUT)
+    with _lock:
+        value = _store.get(key)
+    if value is not None:
+        return _copy(value)
+    return compute() if compute is not None else None
+
+
+def _put(key: str, value: Any) -> None:
+    with _lock:
+        _store.put(key, value)
+        event = _pending.pop(key, None)
+    if event is not None:
+        event.set()
+
+
+@contextlib.contextmanager
+def _loading(key: str):
+    """この段階の間だけ ``key`` を読み込み中にする。
+
+    ``lookup`` はその間だけ完了を待ち、段階が終われば（失敗した場合も）先に進む。
+    まだ始まっていない段階のデータは待たずにページ側で求める。
+    """
+    with _lock:
+        event = _pending.setdefault(key, threading.Event())
+    try:
+        yield
+    finally:
+        with _lock:
+            if _pending.get(key) is event:
+                del _pending[key]
+        event.set()
+
+
+def preload_place(place: str, network_type: str) -> None:
+    """1 か所分のデータを読み込み、キャッシュに置く。
+
+    読み込みが終わったものから順に ``lookup`` で参照できるようになる。
+    """
+    keys = {kind: cache_key(kind, place, network_type) for kind in GRAPH_KINDS}
+    keys["buildings"] = cache_key("buildings", place)
+
+    trace = perf.start_trace("preload")
+    try:
+        with (
+            _loading(keys["graph"]),
+            perf.stage("acquire", place=place, network_type=network_type),
+        ):
+            polygon = place_polygon(place)
+            with perf.stage("fetch.graph"):
+                G = ox.graph_from_polygon(polygon, network_type=network_type)
+            _put(keys["graph"], G)
+        with _loading(keys["graph_proj"]), perf.stage("project"):
+            G_proj = projection.project_graph(G)
+            _put(keys["graph_proj"], G_proj)
+        with _loading(keys["bearings"]), perf.stage("analyze.bearings"):
+            arrays = analytics.edge_bearing_arrays(G)
+            for array in arrays:
+                array.flags.writeable = False
+            _put(keys["bearings"], arrays)
+        with _loading(keys["buildings"]), perf.stage("fetch.buildings"):
+            _put(
+                keys["buildings"],
+                ox.features_from_polygon(polygon, {"building": True}),
+            )
+        with _loading(keys["closeness"]), perf.stage("analyze.closeness"):
+            _put(keys["closeness"], analytics.closeness(G_proj))
+        with _loading(keys["betweenness"]), perf.stage("analyze.betweenness"):
+            k = analytics.betweenness_samples(G_proj)
+            _put(keys["betweenness"], analytics.betweenness(G_proj, k=k))
+    finally:
+        perf.export_trace(trace)
+
+
+def _run(places: list[tuple[str, str]]) -> None:
+    for place, network_type in places:
+        # 取得・解析の失敗（osmnx・requests の例外は ValueError か OSError、
+        # 地名が範囲にならない場合は TypeError）は記録して次の場所に進む
+        try:
+            preload_place(place, network_type)
+        except (OSError, ValueError, TypeError) as e:
+            errors[f"{place}@{network_type}"] = f"{type(e).__name__}: {e}"
+
+
+def start(places: list[tuple[str, str]] | None = None) -> None:
+    """事前読み込みを別スレッドで 1 度だけ開始する。
+
+    ``places`` を省略すると ``GALLERY_PRELOAD``（未設定なら ``DEFAULT_PLACES``）を使う。
+    """
+    global _thread
+
+    if places is None:
+        places = parse_places(settings.PRELOAD)
+    if not places:
+        return
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(
+            target=_run, args=(places,), name="gallery-preload", daemon=True
+        )
+        _thread.start()
+
+
+def stats() -> dict:
+    """キャッシュの使用状況と、読み込みに失敗した場所。"""
+    with _lock:
+        return {**_store.stats(), "errors": dict(errors)}
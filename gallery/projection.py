@@ -0,0 +1,169 @@
+"""道路ネットワークの投影（``ox.project_graph`` の代わり）。
+
+``ox.project_graph`` はグラフを GeoDataFrame に変換して投影し、グラフを組み立て
+直すため、解析のたびに大きな固定費がかかる。ここではノードの座標を pyproj で
+配列のまま変換し、エッジの形状は最初に必要になったときにまとめて変換する。
+変換結果はグラフの内容（ノードと座標）をキーにプロセス全体で保持するので、
+同じグラフを再び投影するときは保持した座標と形状を使ってグラフを作るだけになる。
+
+    G_proj = projection.project_graph(G)
+    xy = projection.projection_for(G).node_xy  # 投影後のノードの座標 (n, 2)
+
+投影先は ``ox.project_graph`` と同じく、ノードの範囲に合う UTM（極域では UPS）。
+"""
+
+import hashlib
+import threading
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import shapely
+
+from gallery import settings
+from gallery.cache import SessionStore, estimate_nbytes
+
+# UTM の範囲（これより北・南は UPS を使う、ox と同じ値）
+UTM_NORTH_LIMIT = 84
+UTM_SOUTH_LIMIT = -80
+
+
+def _node_arrays(G) -> tuple[np.ndarray, np.ndarray]:
+    node_ids = np.asarray(list(G.nodes))
+    xy = [(d["x"], d["y"]) for _, d in G.nodes(data=True)]
+    return node_ids, np.asarray(xy, dtype=float).reshape(-1, 2)
+
+
+def utm_crs(lonlat: np.ndarray):
+    """緯度経度の点 ``(n, 2)`` に合う投影座標系（ox の ``project_gdf`` と同じ選び方）。"""
+    import geopandas as gpd
+
+    # ox と同じく、UTM の範囲外かどうかは点の重心（重複を除く）で判定する
+    centroid_lat = np.unique(lonlat, axis=0)[:, 1].mean()
+    if centroid_lat < UTM_SOUTH_LIMIT:
+        return "epsg:32761"
+    if centroid_lat > UTM_NORTH_LIMIT:
+        return "epsg:32661"
+    corners = shapely.points([lonlat.min(axis=0), lonlat.max(axis=0)])
+    return gpd.GeoSeries(corners, crs="epsg:4326").estimate_utm_crs()
+
+
+class GraphProjection:
+    """緯度経度のグラフを投影した座標と形状。
+
+    グラフ自体は持たず、``graph(G)`` に渡したグラフの属性と組み合わせて
+    投影済みのグラフを作る。エッジの形状は ``(u, v, key)`` ごとに保持するため、
+    ノードが同じでエッジの形状だけが異なるグラフには使わないこと。
+    """
+
+    def __init__(self, crs, node_ids: np.ndarray, lonlat: np.ndarray):
+        import pyproj
+
+        self.from_crs = pyproj.CRS.from_user_input(crs)
+        self.node_ids = node_ids
+        self.crs = pyproj.CRS.from_user_input(utm_crs(lonlat))
+        self.node_xy = self.transform(lonlat)
+        self._edges: dict = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _transformer(from_crs, to_crs):
+        import pyproj
+
+        # pyproj の Transformer はスレッド間で共有しない
+        transformer = pyproj.Transformer.from_crs(from_crs, to_crs, always_xy=True)
+
+        def transform(xy):
+            x, y = transformer.transform(xy[:, 0], xy[:, 1])
+            return np.column_stack([x, y])
+
+        return transform
+
+    def transform(self, xy: np.ndarray) -> np.ndarray:
+        """元のグラフの座標系の点 ``(n, 2)`` を投影する。"""
+        return self._transformer(self.from_crs, self.crs)(np.asarray(xy, dtype=float))
+
+    def edge_geometries(self, G) -> dict:
+        """``G`` のエッジのうち形状を持つものの、投影した形状 ``{(u, v, key): 形状}``。
+
+        まだ変換していないエッジの形状だけをまとめて変換し、結果を保持する。
+        """
+        with self._lock:
+            done = self._edges
+        todo = [
+            (u, v, k, geom)
+            for u, v, k, geom in G.edges(keys=True, data="geometry")
+            if geom is not None and (u, v, k) not in done
+        ]
+        if todo:
+            geoms = shapely.transform(
+                np.array([geom for *_, geom in todo], dtype=object),
+                self._transformer(self.from_crs, self.crs),
+            )
+            projected = {(u, v, k): geom for (u, v, k, _), geom in zip(todo, geoms)}
+            with self._lock:
+                self._edges = done = {**self._edges, **projected}
+        return done
+
+    def graph(self, G):
+        """``G`` を投影したグラフ（``ox.project_graph(G)`` と同じ属性を持つ）。
+
+        ノード・エッジの属性辞書は新しく作る（値は ``G`` と共有する）。
+        """
+        xy = dict(zip(self.node_ids.tolist(), self.node_xy.tolist()))
+        geometries = self.edge_geometries(G)
+
+        G_proj = nx.MultiDiGraph()
+        G_proj.graph = {**G.graph, "crs": self.crs}
+        G_proj.add_nodes_from(
+            (n, {**d, "x": xy[n][0], "y": xy[n][1]}) for n, d in G.nodes(data=True)
+        )
+        G_proj.add_edges_from(
+            (
+                u,
+                v,
+                k,
+                {**d, "geometry": geometries[u, v, k]} if "geometry" in d else {**d},
+            )
+            for u, v, k, d in G.edges(keys=True, data=True)
+        )
+        return G_proj
+
+
+# グラフの内容ごとの投影結果
+_projections = SessionStore(settings.PROJECTION_STORE_MB * 1024**2)
+_projections_lock = threading.Lock()
+
+
+def projection_for(G) -> GraphProjection:
+    """グラフ ``G`` の投影結果。同じノードと座標を持つグラフには同じ結果を返す。"""
+    crs = G.graph["crs"]
+    node_ids, lonlat = _node_arrays(G)
+    h = hashlib.sha1(repr(crs).encode())
+    h.update(repr(node_ids.tolist()).encode())
+    h.update(lonlat.tobytes())
+    key = h.hexdigest()[:16]
+
+    with _projections_lock:
+        projection = _projections.get(key)
+    if projection is None:
+        projection = GraphProjection(crs, node_ids, lonlat)
+        # 投影後の形状も含めたおおよその量で登録する
+        nbytes = estimate_nbytes(G)
+        with _projections_lock:
+            projection = _projections.get(key) or _projections.put(
+                key, projection, nbytes=nbytes
+            )
+    return projection
+
+
+def project_graph(G, to_crs=None):
+    """``ox.project_graph`` の代わり。投影した座標と形状は保持して再利用する。
+
+    ``to_crs`` を指定した場合と、すでに投影済みのグラフは ``ox.project_graph`` を呼ぶ。
+    """
+    if to_crs is not None or ox.projection.is_projected(G.graph.get("crs")):
+        return ox.project_graph(G, to_crs=to_crs)
+    if len(G) == 0:
+        raise ValueError("ノードのないグラフは投影できません")
+    return projection_for(G).graph(G)
@@ -0,0 +1,196 @@
+"""大規模な道路ネットワーク向けのラスター描画。
+
+``ox.plot_graph`` はエッジを 1 本ずつベクターのパスとして描くため、都市圏規模の
+グラフでは描画時間も画像サイズもエッジ数に比例して大きくなる。ここでは
+エッジを線分に分解して NumPy で固定サイズの画像に直接書き込み、画素ごとに
+重なった本数を集計して濃淡にする。処理時間はおおむね出力画素数に比例する。
+
+``plot_graph`` は ``ox.plot_graph`` と同じ引数で呼べ、エッジ数が
+``GALLERY_RASTER_EDGES`` を超えるとラスター描画に切り替える。
+"""
+
+import numpy as np
+import osmnx as ox
+
+from gallery import settings
+
+# 出力画像の横幅（ピクセル）
+RESOLUTION = 1200
+
+# 1 本だけ通る画素の不透明度（重なるほど濃くなる）
+MIN_ALPHA = 0.35
+
+
+def edge_segments(G) -> tuple[np.ndarray, np.ndarray]:
+    """エッジを線分に分解する。
+
+    戻り値は ``(線分の座標 (n, 4) = x0, y0, x1, y1, 線分ごとのエッジ番号)`` で、
+    エッジ番号は ``G.edges`` の順番。形状（``geometry``）のないエッジは
+    両端のノードを結ぶ 1 本の線分になる。
+    """
+    import shapely
+
+    index = {node: i for i, node in enumerate(G.nodes)}
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)], dtype=float)
+    xy = xy.reshape(-1, 2)
+
+    straight, straight_ids, geoms, geom_ids = [], [], [], []
+    for i, (u, v, data) in enumerate(G.edges(data=True)):
+        geom = data.get("geometry")
+        if geom is None:
+            straight.append((index[u], index[v]))
+            straight_ids.append(i)
+        else:
+            geoms.append(geom)
+            geom_ids.append(i)
+
+    pairs = np.array(straight, dtype=int).reshape(-1, 2)
+    segments = [np.hstack([xy[pairs[:, 0]], xy[pairs[:, 1]]])]
+    ids = [np.array(straight_ids, dtype=int)]
+    if geoms:
+        coords, owner = shapely.get_coordinates(geoms, return_index=True)
+        same = owner[1:] == owner[:-1]
+        segments.append(np.hstack([coords[:-1][same], coords[1:][same]]))
+        ids.append(np.asarray(geom_ids)[owner[:-1][same]])
+    return np.vstack(segments), np.concatenate(ids)
+
+
+def rasterize(segments, bounds, shape, weights=None) -> np.ndarray:
+    """線分を画像に書き込み、画素ごとに通過した線分の数（または重みの合計）を返す。
+
+    ``bounds`` は ``(minx, miny, maxx, maxy)``、``shape`` は ``(高さ, 幅)``。
+    ``weights`` を渡すと線分ごとの値を画素に足し合わせる。
+    """
+    height, width = shape
+    minx, miny, maxx, maxy = bounds
+    sx = (width - 1) / ((maxx - minx) or 1)
+    sy = (height - 1) / ((maxy - miny) or 1)
+    x0 = (segments[:, 0] - minx) * sx
+    y0 = (maxy - segments[:, 1]) * sy
+    x1 = (segments[:, 2] - minx) * sx
+    y1 = (maxy - segments[:, 3]) * sy
+
+    # 線分ごとに、長い方の軸の画素数だけ点を打つ
+    steps = np.ceil(np.maximum(np.abs(x1 - x0), np.abs(y1 - y0))).astype(int) + 1
+    seg = np.repeat(np.arange(len(steps)), steps)
+    offset = np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = offset / np.maximum(steps - 1, 1)[seg]
+    px = np.rint(x0[seg] + t * (x1 - x0)[seg]).astype(int)
+    py = np.rint(y0[seg] + t * (y1 - y0)[seg]).astype(int)
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    flat = py[inside] * width + px[inside]
+    w = None if weights is None else np.asarray(weights)[seg[inside]]
+    return np.bincount(flat, weights=w, minlength=height * width).reshape(shape)
+
+
+def shade(counts, colors, bgcolor="w", how="log") -> np.ndarray:
+    """通過数を不透明度にして、背景色の上に重ねた RGB 画像（0〜1）を返す。
+
+    ``colors`` は 1 色（RGB）か、画素ごとの色の配列 ``(高さ, 幅, 3)``。
+    ``how`` は ``"log"``（既定）か ``"linear"``。
+    """
+    from matplotlib.colors import to_rgb
+
+    scale = np.log1p if how == "log" else (lambda a: a)
+    peak = scale(counts.max()) or 1
+    alpha = np.where(counts > 0, MIN_ALPHA + (1 - MIN_ALPHA) * scale(counts) / peak, 0)
+    alpha = alpha[..., None]
+    background = np.asarray(to_rgb(bgcolor))
+    return background * (1 - alpha) + np.asarray(colors) * alpha
+
+
+def _geographic_aspect(G, miny, maxy) -> float:
+    # osmnx と同じく、緯度経度のグラフは中央の緯度で縦横比を補正する
+    if ox.projection.is_projected(G.graph.get("crs")):
+        return 1.0
+    return 1 / np.cos(np.deg2rad((miny + maxy) / 2))
+
+
+def plot_graph_raster(
+    G,
+    ax=None,
+    figsize=(8, 8),
+    bgcolor="#111111",
+    edge_color="#999999",
+    node_color="w",
+    node_size=15,
+    resolution: int = RESOLUTION,
+    how: str = "log",
+):
+    """グラフをラスター画像として描画し、``(fig, ax)`` を返す。
+
+    引数は ``ox.plot_graph`` に合わせている。``edge_color`` はエッジごとの色の
+    リストも受け付け、その場合は画素を通るエッジの色の平均で塗る。線幅は
+    1 ピクセル固定で、``node_size`` が 0 より大きければノードを 1 ピクセルの点で描く。
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import to_rgb, to_rgba_array
+
+    segments, edge_ids = edge_segments(G)
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)], dtype=float)
+    xy = xy.reshape(-1, 2)
+    minx, miny = xy.min(axis=0)
+    maxx, maxy = xy.max(axis=0)
+    if len(segments):
+        minx = min(minx, segments[:, [0, 2]].min())
+        maxx = max(maxx, segments[:, [0, 2]].max())
+        miny = min(miny, segments[:, [1, 3]].min())
+        maxy = max(maxy, segments[:, [1, 3]].max())
+    bounds = (minx, miny, maxx, maxy)
+    aspect = _geographic_aspect(G, miny, maxy)
+    width = resolution
+    # 縦横比は Python の float にしておく（round が numpy のバージョンによらず int を返す）
+    ratio = float((maxy - miny) * aspect / ((maxx - minx) or 1))
+    height = max(1, round(width * ratio))
+    shape = (height, width)
+
+    counts = rasterize(segments, bounds, shape)
+    if isinstance(edge_color, str):
+        colors = np.asarray(to_rgb(edge_color))
+    else:
+        # エッジごとの色は、画素を通る線分の色の平均にする
+        rgb = to_rgba_array(list(edge_color))[edge_ids, :3]
+        sums = [rasterize(segments, bounds, shape, rgb[:, c]) for c in range(3)]
+        colors = np.stack(sums, axis=-1) / np.maximum(counts, 1)[..., None]
+    image = shade(counts, colors, bgcolor, how)
+
+    if node_size > 0:
+        points = np.hstack([xy, xy])
+        mask = rasterize(points, bounds, shape) > 0
+        image[mask] = to_rgb(node_color)
+
+    if ax is None:
+        fig, ax = plt.subplots(figsize=figsize, facecolor=bgcolor, frameon=False)
+    else:
+        fig = ax.figure
+    ax.imshow(
+        image,
+        extent=(minx, maxx, miny, maxy),
+        interpolation="nearest",
+        aspect=aspect,
+    )
+    ax.set_facecolor(bgcolor)
+    ax.axis("off")
+    ax.margins(0)
+    return fig, ax
+
+
+# ラスター描画でも意味を持つ ox.plot_graph の引数
+_RASTER_KWARGS = {"ax", "figsize", "bgcolor", "edge_color", "node_color", "node_size"}
+
+
+def should_rasterize(G) -> bool:
+    """エッジ数がしきい値（``GALLERY_RASTER_EDGES``）を超えるか。"""
+    return G.number_of_edges() > settings.RASTER_EDGE_THRESHOLD
+
+
+def plot_graph(G, **kwargs):
+    """``ox.plot_graph`` の代わりに使い、大きなグラフはラスター描画する。
+
+    ラスター描画では線幅など画素単位で意味を持たない引数は使わない。
+    """
+    if not should_rasterize(G):
+        return ox.plot_graph(G, **kwargs)
+    return plot_graph_raster(
+        G, **{k: v for k, v in kwargs.items() if k in _RASTER_KWARGS}
+    )
@@ -0,0 +1,207 @@
+"""matplotlib の図を Streamlit で表示するための補助関数。
+
+描画結果はプロセス全体で共有するキャッシュに、描画するデータの指紋と
+見た目の設定をキーとして保持し、同じ入力での再描画を省く。
+"""
+
+import contextvars
+import functools
+import hashlib
+import io
+import threading
+from collections.abc import Callable
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from gallery import perf, settings
+from gallery.cache import SessionStore, cache_key
+
+
+def figure_to_png(fig, dpi: int = 200) -> bytes:
+    """図を PNG のバイト列に変換し、図自体は閉じる。
+
+    ``st.pyplot`` と同じく余白を切り詰めて保存する。
+    """
+    return _savefig(fig, format="png", dpi=dpi)
+
+
+def figure_to_svg(fig) -> bytes:
+    """図を SVG のバイト列に変換し、図自体は閉じる。"""
+    return _savefig(fig, format="svg")
+
+
+def _savefig(fig, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, bbox_inches="tight", **kwargs)
+    finally:
+        plt.close(fig)
+    return buf.getvalue()
+
+
+# --------------------
+# 描画結果のキャッシュ
+# --------------------
+def _is_scalar(value) -> bool:
+    return value is None or isinstance(value, (bool, int, float, str, np.generic))
+
+
+def _update(h, obj) -> None:
+    if isinstance(obj, nx.Graph):
+        # 構造と座標のみ（属性で色分けする場合はその値も別に渡す）
+        h.update(repr((obj.graph.get("crs"), list(obj.nodes))).encode())
+        xy = [(d.get("x", np.nan), d.get("y", np.nan)) for _, d in obj.nodes(data=True)]
+        h.update(np.asarray(xy, dtype=float).tobytes())
+        edges = obj.edges(keys=True) if obj.is_multigraph() else obj.edges
+        h.update(repr(list(edges)).encode())
+    elif isinstance(obj, pd.DataFrame):
+        # インデックスとジオメトリのみ
+        h.update(repr(obj.index.tolist()).encode())
+        geometry = getattr(obj, "geometry", None)
+        if geometry is not None:
+            import shapely
+
+            h.update(repr(obj.crs).encode())
+            h.update(b"".join(shapely.to_wkb(geometry.values)))
+    elif isinstance(obj, pd.Series):
+        h.update(repr((obj.index.tolist(), obj.tolist())).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif hasattr(obj, "wkb"):
+        h.update(obj.wkb)
+    elif isinstance(obj, (list, tuple)) and not all(map(_is_scalar, obj)):
+        for value in obj:
+            _update(h, value)
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*objs) -> str:
+    """描画するデータ（グラフ・GeoDataFrame・配列など）の内容を表す文字列。"""
+    h = hashlib.sha1()
+    for obj in objs:
+        _update(h, obj)
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+FORMATS = {"png": figure_to_png, "svg": figure_to_svg}
+
+_figures = SessionStore(settings.FIGURE_CACHE_MB * 1024**2)
+_figures_lock = threading.Lock()
+
+
+def cached_figure(draw: Callable, *data, fmt: str = "png", **style) -> bytes:
+    """``draw()`` が返す図を描画したバイト列を返す。
+
+    キーは ``draw`` を定義した場所、``data`` の指紋、``style`` の値で、
+    同じキーの描画結果があれば ``draw`` を呼ばずにそれを返す。
+    ``draw`` が参照するデータ・設定はすべて ``data`` か ``style`` に渡すこと。
+    """
+    code = draw.__code__
+    key = cache_key(
+        "figure",
+        fmt,
+        f"{code.co_filename}:{code.co_firstlineno}",
+        fingerprint(*data),
+        sorted(style.items()),
+    )
+    with _figures_lock:
+        image = _figures.get(key)
+    if image is None:
+        image = render_figure(draw, fmt)
+        with _figures_lock:
+            _figures.put(key, image)
+    return image
+
+
+def figure_cache_stats() -> dict:
+    with _figures_lock:
+        return _figures.stats()
+
+
+# --------------------
+# 図の後始末とメモリの記録
+# --------------------
+# render_figure の中で pyplot が作った図（呼び出しごと、スレッドをまたいで混ざらない）
+_created: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "gallery_created_figures", default=None
+)
+
+
+def _track_figures() -> None:
+    """``plt.figure`` を包み、``render_figure`` の中で作られた図を記録する。
+
+    ``plt.subplots`` や ox の描画関数も ``plt.figure`` で図を作る。
+    """
+    figure = plt.figure
+    if getattr(figure, "_gallery_tracked", False):
+        return
+
+    @functools.wraps(figure)
+    def tracked(*args, **kwargs):
+        fig = figure(*args, **kwargs)
+        created = _created.get()
+        if created is not None:
+            created.append(fig)
+        return fig
+
+    tracked._gallery_tracked = True
+    plt.figure = tracked
+
+
+_track_figures()
+
+
+def render_figure(draw: Callable, fmt: str = "png") -> bytes:
+    """``draw()`` の図をバイト列に変換し、この呼び出しで開いた図をすべて閉じる。
+
+    pyplot は開いた図をプロセス全体で保持し続けるため、``draw`` の途中で
+    例外が起きた場合（背景地図の取得失敗など）も含めて閉じる。閉じるのは
+    ``draw`` が返した図とこの呼び出しの中で作られた図だけで、他のセッションが
+    描画中の図には触れない。
+    """
+    created: list = []
+    token = _created.set(created)
+    try:
+        return FORMATS[fmt](draw())
+    finally:
+        _created.reset(token)
+        for fig in created:
+            plt.close(fig)
+
+
+def record_memory() -> None:
+    """開いている図の数・描画キャッシュ・常駐メモリを ``/metrics`` に記録する。"""
+    perf.set_gauge(
+        "gallery_matplotlib_open_figures",
+        len(plt.get_fignums()),
+        "pyplot が保持している図の数",
+    )
+    perf.set_gauge(
+        "gallery_figure_cache_bytes",
+        figure_cache_stats()["nbytes"],
+        "描画結果のキャッシュの使用量",
+    )
+    rss = perf.rss_bytes()
+    if rss is not None:
+        perf.set_gauge("gallery_process_rss_bytes", rss, "プロセスの常駐メモリ")
+
+
+def show_figure(draw: Callable, *data, fmt: str = "png", **style) -> None:
+    """``cached_figure`` の結果を ``st.image`` で表示する（``st.pyplot`` の代わり）。
+
+    図は表示前に閉じるので、再実行を繰り返しても pyplot に図が溜まらない。
+    """
+    import streamlit as st
+
+    image = cached_figure(draw, *data, fmt=fmt, **style)
+    record_memory()
+    if fmt == "svg":
+        st.image(image.decode("utf-8"), width="stretch")
+    else:
+        st.image(image, width="stretch")
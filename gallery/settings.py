@@ -0,0 +1,90 @@
+"""アプリ全体の設定。
+
+値は環境変数（および ``.env``）から読み込む。``OVERPASS_URL`` と ``NOMINATIM_URL`` を
+ローカルの代替サーバー（``python -m gallery.stub_server``）に向けると、
+外部 API に接続せずにアプリを動かせる。
+"""
+
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# osmnx の HTTP キャッシュとジオコーディング結果のキャッシュを置くディレクトリ
+CACHE_DIR = Path(os.environ.get("GALLERY_CACHE_DIR", "cache"))
+
+# セッションあたりのオブジェクトストア上限（MB）
+SESSION_STORE_MB = int(os.environ.get("GALLERY_SESSION_STORE_MB", "256"))
+
+# プロセス全体で共有するキャッシュ（図・タイル・投影など）の上限の合計（MB）
+# 各キャッシュの上限を個別に指定しなければ、この値を決まった割合で分ける
+PROCESS_CACHE_MB = int(os.environ.get("GALLERY_PROCESS_CACHE_MB", "512"))
+
+
+def _process_cache_mb(name: str, share: float) -> int:
+    """プロセス全体のキャッシュ 1 つの上限（MB）。未指定なら合計の ``share`` 倍。"""
+    return int(os.environ.get(name, str(int(PROCESS_CACHE_MB * share))))
+
+
+# プロセス全体で同時に実行するデータ取得の上限
+MAX_CONCURRENCY = int(os.environ.get("GALLERY_MAX_CONCURRENCY", "4"))
+
+# 起動時に事前読み込みする場所（「地名@ネットワークタイプ」を ; 区切り）
+# 未設定なら gallery.preload.DEFAULT_PLACES、空文字なら事前読み込みしない
+PRELOAD = os.environ.get("GALLERY_PRELOAD")
+
+# 描画済みの図を置くプロセス全体のキャッシュの上限（MB）
+FIGURE_CACHE_MB = _process_cache_mb("GALLERY_FIGURE_CACHE_MB", 1 / 8)
+
+# これより多いエッジを持つグラフはラスター画像として描画する（gallery.raster）
+RASTER_EDGE_THRESHOLD = int(os.environ.get("GALLERY_RASTER_EDGES", "20000"))
+
+# ベクタータイルを配信するローカルサーバーの待ち受けるアドレス（既定はローカルのみ）と
+# ポート、ブラウザから見た URL（未設定なら http://localhost:<ポート>）
+TILE_HOST = os.environ.get("GALLERY_TILE_HOST", "127.0.0.1")
+TILE_PORT = int(os.environ.get("GALLERY_TILE_PORT", "8765"))
+TILE_URL = os.environ.get("GALLERY_TILE_URL")
+
+# 大きな未簡素化グラフの簡素化に使うプロセス数と、複数のプロセスで簡素化するノード数の下限
+# （gallery.simplify）
+SIMPLIFY_WORKERS = int(
+    os.environ.get("GALLERY_SIMPLIFY_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+SIMPLIFY_PARALLEL_NODES = int(
+    os.environ.get("GALLERY_SIMPLIFY_PARALLEL_NODES", "50000")
+)
+
+# タイル配信用に登録したレイヤーを置くプロセス全体のキャッシュの上限（MB）
+TILE_STORE_MB = _process_cache_mb("GALLERY_TILE_STORE_MB", 1 / 8)
+
+# 範囲を指定した取得で切り出しに使う、取得済みネットワークのキャッシュの上限（MB）
+COVERAGE_STORE_MB = _process_cache_mb("GALLERY_COVERAGE_STORE_MB", 1 / 8)
+
+# 格子（タイル）単位で取得した道路ネットワークのキャッシュの上限（MB）
+GRAPH_TILE_STORE_MB = _process_cache_mb("GALLERY_GRAPH_TILE_STORE_MB", 1 / 4)
+
+# 投影したノードの座標・エッジの形状を置くプロセス全体のキャッシュの上限（MB）
+PROJECTION_STORE_MB = _process_cache_mb("GALLERY_PROJECTION_STORE_MB", 1 / 8)
+
+# 事前読み込みしたデータを置くプロセス全体のキャッシュの上限（MB）
+PRELOAD_STORE_MB = _process_cache_mb("GALLERY_PRELOAD_STORE_MB", 1 / 4)
+
+
+def configure_osmnx() -> None:
+    """osmnx の接続先・キャッシュ設定を環境変数に合わせる。
+
+    環境変数が変わった場合に備え、呼ばれるたびに読み直す。
+    """
+    import osmnx as ox
+
+    overpass_url = os.environ.get("OVERPASS_URL")
+    nominatim_url = os.environ.get("NOMINATIM_URL")
+    if overpass_url:
+        ox.settings.overpass_url = overpass_url
+    if nominatim_url:
+        ox.settings.nominatim_url = nominatim_url
+    ox.settings.cache_folder = str(
+        Path(os.environ.get("GALLERY_CACHE_DIR", CACHE_DIR)) / "http"
+    )
@@ -0,0 +1,223 @@
+"""大規模な未簡素化グラフの簡素化（``ox.simplify_graph``）を複数のプロセスで行う。
+
+``ox.simplify_graph`` は端点（交差点・行き止まり）の間の経路を 1 本ずつ
+Python で辿るため、``simplify=False`` で取得した都市規模のグラフでは数分かかる。
+ここではノードを座標で格子状の区画に分け、区画ごとに
+
+1. 区画内のノードが端点かどうかを判定し、
+2. 区画内の端点から始まり、区画内のノードだけを通る経路を 1 本のエッジにまとめる
+
+処理をプロセスプールで並行に行う。区画の外に出る経路だけは、全体の端点が
+そろってから元のプロセスで辿る。結果は ``ox.simplify_graph`` と同じグラフになる
+（同じ端点の間に複数のエッジがある場合、エッジのキーの振り方だけが異なりうる）。
+
+    G = simplify.simplify_graph(G_raw)
+
+ノード数が ``GALLERY_SIMPLIFY_PARALLEL_NODES`` 以下のグラフや、既定以外の
+オプションを指定した場合は ``ox.simplify_graph`` をそのまま使う。
+"""
+
+import itertools
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+from shapely.geometry import LineString
+
+from gallery import settings
+
+# ox.simplify_graph の既定の集計方法
+EDGE_ATTR_AGGS = {"length": sum, "travel_time": sum}
+
+# プロセスあたりの区画数（区画ごとの処理時間のばらつきをならす）
+PARTS_PER_WORKER = 4
+
+
+class GraphSimplificationError(ValueError):
+    """簡素化できないグラフ（ox の同名の例外と同じく ``ValueError`` の派生）。
+
+    osmnx の例外は非公開のモジュールにあるため、ここで定義する。
+    """
+
+
+# --------------------
+# 区画ごとの処理（プロセスプールで実行）
+# --------------------
+# グラフはプロセス間で受け渡しやすいよう、networkx の内部と同じ形の辞書
+# （succ[u][v][key] = 属性、pred[v][u][key] = 属性、nodes[n] = 属性）で扱う。
+def _is_endpoint(succ, pred, node) -> bool:
+    """ox の ``_is_endpoint`` の既定の規則と同じ判定。
+
+    自己ループを持つ、入るエッジか出るエッジがない、または隣接ノードが 2 つで
+    次数が 2 か 4 ではない場合に端点とする。
+    """
+    successors, predecessors = succ[node], pred[node]
+    neighbors = successors.keys() | predecessors.keys()
+    if node in neighbors or not successors or not predecessors:
+        return True
+    degree = sum(map(len, successors.values())) + sum(map(len, predecessors.values()))
+    return not (len(neighbors) == 2 and degree in (2, 4))
+
+
+def _walk(succ, endpoint, successor, endpoints, owned) -> list | None:
+    """ox の ``_build_path`` と同じ経路。区画 ``owned`` の外に出る場合は None。"""
+    if successor not in owned:
+        return None
+    path = [endpoint, successor]
+    for this_successor in succ[successor]:
+        successor = this_successor
+        if successor not in path:
+            path.append(successor)
+            while successor not in endpoints:
+                if successor not in owned:
+                    return None
+                successors = [n for n in succ[successor] if n not in path]
+                if len(successors) == 1:
+                    successor = successors[0]
+                    path.append(successor)
+                elif len(successors) == 0:
+                    if endpoint in succ[successor]:
+                        return [*path, endpoint]
+                    return path
+                else:
+                    msg = f"Impossible simplify pattern failed near {successor}."
+                    raise GraphSimplificationError(msg)
+            return path
+    return path
+
+
+def _path_edge(succ, nodes, path) -> tuple:
+    """経路 ``path`` をまとめたエッジ ``(始点, 終点, 属性)``（ox と同じ集計）。"""
+    path_attributes: dict = {}
+    for u, v in itertools.pairwise(path):
+        edge_data = next(iter(succ[u][v].values()))
+        for attr in edge_data:
+            path_attributes.setdefault(attr, []).append(edge_data[attr])
+
+    for attr, values in path_attributes.items():
+        if attr in EDGE_ATTR_AGGS:
+            path_attributes[attr] = EDGE_ATTR_AGGS[attr](values)
+        elif len(set(values)) == 1:
+            path_attributes[attr] = values[0]
+        else:
+            path_attributes[attr] = list(set(values))
+    # ox は Point のリストから作るが、座標の組から作っても同じ形状になる（その方が速い）
+    path_attributes["geometry"] = LineString(
+        [(nodes[node]["x"], nodes[node]["y"]) for node in path]
+    )
+    return path[0], path[-1], path_attributes
+
+
+def _simplify_part(part) -> tuple:
+    """区画内の端点・まとめたエッジ・区画の外に出る経路の始まり。"""
+    owned, succ, pred, nodes = part
+    endpoints = {n for n in owned if _is_endpoint(succ, pred, n)}
+    edges, removed, boundary = [], [], []
+    for endpoint in endpoints:
+        for successor in succ[endpoint]:
+            if successor in endpoints:
+                continue
+            path = _walk(succ, endpoint, successor, endpoints, owned)
+            if path is None:
+                boundary.append((endpoint, successor))
+            else:
+                edges.append(_path_edge(succ, nodes, path))
+                removed.extend(path[1:-1])
+    return endpoints, edges, removed, boundary
+
+
+# --------------------
+# 区画への分割とプロセスプール
+# --------------------
+def partition(G, parts: int) -> list[set]:
+    """ノードを座標で縦横の格子に分け、ノード数がほぼ等しい区画のリストを返す。"""
+    nodes = np.asarray(list(G.nodes))
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)], dtype=float)
+    xy = xy.reshape(-1, 2)
+    columns = max(1, round(math.sqrt(parts)))
+    rows = max(1, math.ceil(parts / columns))
+
+    result = []
+    for column in np.array_split(np.argsort(xy[:, 0], kind="stable"), columns):
+        order = column[np.argsort(xy[column, 1], kind="stable")]
+        result.extend(set(nodes[cell].tolist()) for cell in np.array_split(order, rows))
+    return [part for part in result if part]
+
+
+def _part_data(G, owned: set) -> tuple:
+    """区画を処理するプロセスに渡すデータ（区画内のノードの隣接辞書とノードの属性）。
+
+    networkx の内部の辞書をそのまま渡し、複製はプロセスへの転送（pickle）に任せる。
+    """
+    succ = {n: G._succ[n] for n in owned}
+    pred = {n: G._pred[n] for n in owned}
+    nodes = {n: G._node[n] for n in owned.union(*succ.values())}
+    return owned, succ, pred, nodes
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Streamlit のスレッドから fork しないよう spawn で起動し、プロセス全体で使い回す
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.SIMPLIFY_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+# --------------------
+# 簡素化
+# --------------------
+def simplify_graph(G, **kwargs):
+    """``ox.simplify_graph`` と同じ結果を、大きなグラフでは複数のプロセスで求める。
+
+    プロセス数は ``GALLERY_SIMPLIFY_WORKERS``。``kwargs`` を指定した場合と
+    小さなグラフでは ``ox.simplify_graph`` を呼ぶ。
+    """
+    workers = settings.SIMPLIFY_WORKERS
+    if kwargs or workers < 2 or len(G) <= settings.SIMPLIFY_PARALLEL_NODES:
+        return ox.simplify_graph(G, **kwargs)
+    if G.graph.get("simplified"):
+        msg = "This graph has already been simplified, cannot simplify it again."
+        raise GraphSimplificationError(msg)
+
+    parts = partition(G, workers * PARTS_PER_WORKER)
+    pool = _get_pool()
+    futures = [pool.submit(_simplify_part, _part_data(G, part)) for part in parts]
+    results = [future.result() for future in futures]
+
+    G = G.copy()
+    endpoints = set().union(*(r[0] for r in results))
+    edges = [edge for r in results for edge in r[1]]
+    removed = [node for r in results for node in r[2]]
+
+    # 区画の外に出る経路は、全体の端点がそろってから辿る
+    for endpoint, successor in (start for r in results for start in r[3]):
+        path = _walk(G._succ, endpoint, successor, endpoints, G._succ)
+        edges.append(_path_edge(G._succ, G._node, path))
+        removed.extend(path[1:-1])
+
+    for u, v, attrs in edges:
+        G.add_edge(u, v, **attrs)
+    G.remove_nodes_from(set(removed))
+
+    # ox と同じく、端点を持たない環状の連結成分を取り除く
+    rings = [
+        wcc
+        for wcc in nx.weakly_connected_components(G)
+        if not any(_is_endpoint(G._succ, G._pred, n) for n in wcc)
+    ]
+    G.remove_nodes_from(set().union(*rings))
+    G.graph["simplified"] = True
+    return G
@@ -0,0 +1,181 @@
+"""道路ネットワークの空間インデックス。
+
+最寄りノード・最寄りエッジの検索や、範囲（矩形・ポリゴン）に含まれる
+ノード・エッジの抽出のたびにグラフ全体を走査したり木を作り直したりしないよう、
+グラフごとに 1 度だけインデックスを作り、グラフと同じ期間だけ保持する。
+
+    index = spatial.index_for(G)
+    nodes = index.nearest_nodes(xs, ys)  # 多数の点もまとめて検索できる
+
+ノードは KD 木（``scipy.spatial.cKDTree``）、エッジは ``shapely.STRtree`` で
+検索する。緯度経度のグラフのノードは単位球面上の 3 次元座標で検索するため、
+距離は大円距離（メートル）になる。
+"""
+
+import functools
+import threading
+import weakref
+
+import numpy as np
+import shapely
+
+# 地球の半径（メートル、osmnx と同じ値）
+EARTH_RADIUS_M = 6_371_009
+
+
+def _unit_vectors(lon, lat) -> np.ndarray:
+    lon, lat = np.radians(lon), np.radians(lat)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+class SpatialIndex:
+    """グラフのノード・エッジの空間インデックス。
+
+    各インデックスは最初に使うときに作る。グラフの座標を変更した場合は
+    インデックスを作り直すこと（投影した場合は別のグラフになるので不要）。
+    """
+
+    def __init__(self, G):
+        import osmnx as ox
+
+        self.projected = ox.projection.is_projected(G.graph.get("crs"))
+        self.node_ids = np.asarray(list(G.nodes))
+        xy = [(d["x"], d["y"]) for _, d in G.nodes(data=True)]
+        self.node_xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        # インデックスはグラフをキーに保持するため、グラフ自体は弱参照で持つ
+        self._graph = weakref.ref(G)
+        self._lock = threading.Lock()
+
+    # --------------------
+    # インデックス（初回に作成）
+    # --------------------
+    @functools.cached_property
+    def _node_tree(self):
+        from scipy.spatial import cKDTree
+
+        if self.projected:
+            return cKDTree(self.node_xy)
+        return cKDTree(_unit_vectors(self.node_xy[:, 0], self.node_xy[:, 1]))
+
+    @functools.cached_property
+    def _node_points(self):
+        points = shapely.points(self.node_xy)
+        return points, shapely.STRtree(points)
+
+    @functools.cached_property
+    def _edges(self):
+        node_xy = dict(zip(self.node_ids.tolist(), map(tuple, self.node_xy)))
+        keys, geoms = [], []
+        for u, v, k, data in self._graph().edges(keys=True, data=True):
+            keys.append((u, v, k))
+            geom = data.get("geometry")
+            if geom is None:
+                geom = shapely.LineString([node_xy[u], node_xy[v]])
+            geoms.append(geom)
+        geoms = np.array(geoms, dtype=object)
+        return keys, geoms, shapely.STRtree(geoms)
+
+    def _build(self, name):
+        # 複数のセッションから同時に呼ばれても 1 度だけ作る
+        with self._lock:
+            return getattr(self, name)
+
+    # --------------------
+    # 検索
+    # --------------------
+    def nearest_nodes(self, X, Y, return_dist: bool = False):
+        """各点 ``(X, Y)`` の最寄りノード（``ox.distance.nearest_nodes`` と同じ形式）。
+
+        ``X``・``Y`` がスカラーならノード ID を 1 つ、配列なら配列を返す。
+        ``return_dist=True`` の場合は ``(ノード, 距離)`` を返す。
+        """
+        scalar = np.ndim(X) == 0
+        X, Y = np.atleast_1d(X).astype(float), np.atleast_1d(Y).astype(float)
+        tree = self._build("_node_tree")
+        if self.projected:
+            dist, pos = tree.query(np.column_stack([X, Y]))
+        else:
+            chord, pos = tree.query(_unit_vectors(X, Y))
+            dist = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(chord / 2, 1))
+        nodes = self.node_ids[pos]
+        if scalar:
+            nodes, dist = nodes[0].item(), dist[0]
+        return (nodes, dist) if return_dist else nodes
+
+    def nearest_edges(self, X, Y, return_dist: bool = False):
+        """各点 ``(X, Y)`` の最寄りエッジ ``(u, v, key)``。
+
+        距離はグラフの座標系での距離（緯度経度のグラフでは度）。
+        """
+        scalar = np.ndim(X) == 0
+        points = shapely.points(np.atleast_1d(X), np.atleast_1d(Y))
+        keys, _, tree = self._build("_edges")
+        (i, pos), dist = tree.query_nearest(
+            points, return_distance=True, all_matches=False
+        )
+        edges = np.empty(len(points), dtype=object)
+        edges[i] = [keys[p] for p in pos]
+        distances = np.empty(len(points))
+        distances[i] = dist
+        if scalar:
+            edges, distances = edges[0], distances[0]
+        return (edges, distances) if return_dist else edges
+
+    def node_pairs_within(self, distance: float) -> tuple[np.ndarray, np.ndarray]:
+        """距離が ``distance`` 以下のノードの組（投影済みのグラフのみ）。
+
+        戻り値は ``(組 (n, 2) = ノードの位置, 距離)`` で、位置は ``node_ids`` の添字。
+        """
+        if not self.projected:
+            raise ValueError("投影済みのグラフが必要です")
+        tree = self._build("_node_tree")
+        pairs = tree.query_pairs(distance, output_type="ndarray").reshape(-1, 2)
+        xy = self.node_xy
+        dist = np.hypot(*(xy[pairs[:, 0]] - xy[pairs[:, 1]]).T)
+        return pairs, dist
+
+    def nodes_within(self, geometry) -> list:
+        """ポリゴン（または矩形）に含まれるノード ID。"""
+        _, tree = self._build("_node_points")
+        pos = tree.query(geometry, predicate="intersects")
+        return self.node_ids[np.sort(pos)].tolist()
+
+    def edges_within(self, geometry) -> list:
+        """ポリゴン（または矩形）と交差するエッジ ``(u, v, key)``。"""
+        keys, _, tree = self._build("_edges")
+        pos = tree.query(geometry, predicate="intersects")
+        return [keys[p] for p in np.sort(pos)]
+
+    def nodes_in_bbox(self, bbox) -> list:
+        """矩形 ``(left, bottom, right, top)`` に含まれるノード ID。"""
+        return self.nodes_within(shapely.box(*bbox))
+
+    def edges_in_bbox(self, bbox) -> list:
+        """矩形 ``(left, bottom, right, top)`` と交差するエッジ。"""
+        return self.edges_within(shapely.box(*bbox))
+
+
+# グラフごとのインデックス（グラフが破棄されると一緒に破棄される）
+_indexes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def index_for(G) -> SpatialIndex:
+    """グラフ ``G`` の空間インデックス。同じグラフには同じインデックスを返す。
+
+    セッションのストアや事前読み込みのキャッシュにあるグラフに対して使うと、
+    インデックスはグラフがキャッシュにある間だけ保持される。
+    """
+    with _indexes_lock:
+        index = _indexes.get(G)
+        if index is None:
+            index = _indexes[G] = SpatialIndex(G)
+        return index
+
+
+def features_within(gdf, geometry):
+    """``geometry`` と交差する図形だけの GeoDataFrame（``gdf.sindex`` を使う）。"""
+    pos = gdf.sindex.query(geometry, predicate="intersects")
+    return gdf.iloc[np.sort(pos)]
@@ -0,0 +1,70 @@
+"""ページ起動時の処理を軽くするための補助関数。
+
+Streamlit は操作のたびにページのスクリプトを先頭から実行し直すため、
+フォントの探索のような重い処理はプロセスごとに一度だけ行い、
+一部の操作でしか使わないライブラリは使う時点まで読み込まない。
+"""
+
+import functools
+import importlib
+import sys
+import threading
+import types
+
+# 優先して使う日本語フォントと、見つからない場合のフォールバック
+JP_FONT_NAMES = ("Noto Sans CJK JP", "Noto Sans JP", "IPAexGothic", "IPAGothic")
+JP_FONT_FALLBACK = "IPAexGothic"
+
+_font_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_japanese_font() -> str:
+    import matplotlib.font_manager as fm
+
+    # matplotlib がキャッシュしているフォント一覧から探す
+    available = {f.name for f in fm.fontManager.ttflist}
+    for name in JP_FONT_NAMES:
+        if name in available:
+            return name
+
+    # キャッシュ作成後にインストールされたフォントは、ファイルを探して登録する
+    for path in fm.findSystemFonts():
+        if "NotoSansCJK" in path or "NotoSansCJKjp" in path:
+            fm.fontManager.addfont(path)
+            return fm.FontProperties(fname=path).get_name()
+    return JP_FONT_FALLBACK
+
+
+def japanese_font() -> str:
+    """グラフに使う日本語フォント名。結果はプロセス内でキャッシュする。"""
+    with _font_lock:
+        return _resolve_japanese_font()
+
+
+def use_japanese_font() -> None:
+    """matplotlib の既定フォントを日本語フォントにする。"""
+    from matplotlib import rcParams
+
+    rcParams["font.family"] = japanese_font()
+
+
+class _LazyModule(types.ModuleType):
+    """属性に初めてアクセスしたときにモジュールを読み込む代理オブジェクト。"""
+
+    def __getattr__(self, attr):
+        # import_module はロックを取って sys.modules を確認するので、
+        # 複数のセッションから同時に呼ばれても読み込みは一度だけになる
+        return getattr(importlib.import_module(self.__name__), attr)
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """``import name`` を属性へのアクセス時まで遅らせる。
+
+    すでに読み込み済みの場合はモジュールをそのまま返す。
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else _LazyModule(name)
@@ -0,0 +1,572 @@
+"""Overpass / Nominatim API のローカル代替サーバー。
+
+ベンチマークや負荷試験、オフライン環境での動作確認のために、外部 API の代わりに
+ローカルの OSM データ（``.osm`` / ``.osm.bz2`` / ``.graphml``）と記録済みレスポンスから
+応答する。
+
+    python -m gallery.stub_server --osm input_data/West-Oakland.osm.bz2 --port 8800
+
+アプリ側は ``.env`` で接続先を切り替える::
+
+    OVERPASS_URL=http://localhost:8800/api
+    NOMINATIM_URL=http://localhost:8800/
+
+Overpass クエリは記録済みレスポンス（``<responses>/overpass/<クエリのSHA1>.json``）が
+あればそれを返し、なければ OSM 抽出ファイルに対して osmnx が生成する形式の
+クエリ（タグフィルタ + ``poly:`` 範囲指定 + 下方向の再帰）を評価して返す。
+Nominatim も同様に記録済みレスポンスを優先し、次に ``--places`` で指定した
+ジオコーディング結果（``data/east_bay.gpkg`` など）から地名が一致するものを、
+それもなければ OSM データの範囲を境界ポリゴンとして返す。``--upstream-*`` を指定すると、記録がないクエリを
+実際の API に転送してレスポンスを記録する。
+"""
+
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from gallery.geocode import normalize_query
+
+_STATEMENT_RE = re.compile(
+    r"(node|way|relation)((?:\[[^\]]*\])*)\(poly:\s*(['\"])([^'\"]*)\3\s*\)"
+)
+_FILTER_RE = re.compile(
+    r"\[\s*(['\"])(?P<key>.*?)\1\s*"
+    r"(?:(?P<op>!=|=|!~|~)\s*(['\"])(?P<value>.*?)\4\s*(?P<flags>,\s*i)?)?\s*\]"
+)
+
+
+def _open(path: Path):
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _parse_filters(text: str) -> list[tuple[str, str | None, re.Pattern | str | None]]:
+    filters = []
+    for m in _FILTER_RE.finditer(text):
+        op, value = m.group("op"), m.group("value")
+        if op in ("~", "!~"):
+            value = re.compile(value, re.IGNORECASE if m.group("flags") else 0)
+        filters.append((m.group("key"), op, value))
+    return filters
+
+
+def _match_tags(tags: dict, filters) -> bool:
+    for key, op, value in filters:
+        tag = tags.get(key)
+        if op is None:
+            ok = tag is not None
+        elif op == "=":
+            ok = tag == value
+        elif op == "!=":
+            ok = tag != value
+        elif op == "~":
+            ok = tag is not None and value.search(tag) is not None
+        else:  # "!~"
+            ok = tag is None or value.search(tag) is None
+        if not ok:
+            return False
+    return True
+
+
+class OsmExtract:
+    """OSM データを読み込み、osmnx 形式の Overpass クエリに応答する。
+
+    ``.osm`` / ``.osm.bz2`` の抽出ファイルに加え、osmnx で保存した ``.graphml`` も
+    読み込める（エッジをウェイ、途中の形状点をノードとして復元する）。
+    """
+
+    def __init__(self, *paths: str | Path):
+        self.nodes: dict[int, tuple[float, float, dict]] = {}
+        self.ways: dict[int, tuple[list[int], dict]] = {}
+        self.relations: dict[int, tuple[list[tuple[str, int, str]], dict]] = {}
+        bounds = []
+
+        for path in map(Path, paths):
+            if path.suffix == ".graphml":
+                self._load_graphml(path)
+                continue
+            with _open(path) as f:
+                for _, elem in ET.iterparse(f, events=("end",)):
+                    if elem.tag == "bounds":
+                        bounds.append(
+                            [
+                                float(elem.get(k))
+                                for k in ("minlon", "minlat", "maxlon", "maxlat")
+                            ]
+                        )
+                    elif elem.tag in ("node", "way", "relation"):
+                        self._add(elem)
+                        elem.clear()
+
+        self._node_ids = np.fromiter(self.nodes, dtype=np.int64)
+        coords = np.array([self.nodes[n][:2] for n in self._node_ids]).reshape(-1, 2)
+        self._lats, self._lons = coords[:, 0], coords[:, 1]
+        if len(self._node_ids):
+            bounds.append(
+                [
+                    self._lons.min(),
+                    self._lats.min(),
+                    self._lons.max(),
+                    self._lats.max(),
+                ]
+            )
+        self.bounds = None
+        if bounds:
+            b = np.array(bounds)
+            self.bounds = (*b[:, :2].min(axis=0), *b[:, 2:].max(axis=0))
+
+    def _load_graphml(self, path: Path) -> None:
+        import osmnx as ox
+
+        G = ox.load_graphml(path)
+        for n, data in G.nodes(data=True):
+            tags = {
+                k: data[k] for k in ("highway", "ref") if isinstance(data.get(k), str)
+            }
+            self.nodes[n] = (data["y"], data["x"], tags)
+
+        # 復元したノード・ウェイには負の ID を振り、後から読み込む OSM データの
+        # （正の）ID と重ならないようにする
+        next_node = min(min(self.nodes, default=0), 0) - 1
+        next_way = min(min(self.ways, default=0), 0) - 1
+        seen = set()
+        for u, v, data in G.edges(data=True):
+            # 双方向の道路は往復 2 本のエッジになっているので 1 本のウェイにまとめる
+            pair = (min(u, v), max(u, v), round(data.get("length", 0), 1))
+            if not data.get("oneway") and pair in seen:
+                continue
+            seen.add(pair)
+
+            refs = [u]
+            if "geometry" in data:
+                for x, y in list(data["geometry"].coords)[1:-1]:
+                    self.nodes[next_node] = (y, x, {})
+                    refs.append(next_node)
+                    next_node -= 1
+            refs.append(v)
+
+            tags = {"oneway": "yes" if data.get("oneway") else "no"}
+            for key in ("highway", "name", "lanes", "maxspeed", "bridge", "junction"):
+                value = data.get(key)
+                if isinstance(value, list):
+                    value = value[0]
+                if isinstance(value, str):
+                    tags[key] = value
+            self.ways[next_way] = (refs, tags)
+            next_way -= 1
+
+    def _add(self, elem) -> None:
+        tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+        osmid = int(elem.get("id"))
+        if elem.tag == "node":
+            self.nodes[osmid] = (float(elem.get("lat")), float(elem.get("lon")), tags)
+        elif elem.tag == "way":
+            self.ways[osmid] = ([int(nd.get("ref")) for nd in elem.findall("nd")], tags)
+        else:
+            members = [
+                (m.get("type"), int(m.get("ref")), m.get("role", ""))
+                for m in elem.findall("member")
+            ]
+            self.relations[osmid] = (members, tags)
+
+    def _nodes_within(self, coord_str: str) -> set[int]:
+        values = [float(v) for v in coord_str.split()]
+        polygon = Polygon(zip(values[1::2], values[0::2]))
+        mask = shapely.contains_xy(polygon, self._lons, self._lats)
+        return set(self._node_ids[mask].tolist())
+
+    def query(self, query: str) -> list[dict]:
+        """クエリに一致する要素と、それが参照する要素（下方向の再帰）を返す。"""
+        node_ids: set[int] = set()
+        way_ids: set[int] = set()
+        relation_ids: set[int] = set()
+        within_cache: dict[str, set[int]] = {}
+
+        for kind, filter_text, _, coord_str in _STATEMENT_RE.findall(query):
+            filters = _parse_filters(filter_text)
+            if coord_str not in within_cache:
+                within_cache[coord_str] = self._nodes_within(coord_str)
+            within = within_cache[coord_str]
+
+            if kind == "node":
+                node_ids.update(
+                    n for n in within if _match_tags(self.nodes[n][2], filters)
+                )
+            elif kind == "way":
+                way_ids.update(
+                    w
+                    for w, (refs, tags) in self.ways.items()
+                    if _match_tags(tags, filters) and not within.isdisjoint(refs)
+                )
+            else:
+                for r, (members, tags) in self.relations.items():
+                    if _match_tags(tags, filters) and self._relation_within(
+                        members, within
+                    ):
+                        relation_ids.add(r)
+
+        # 下方向の再帰：リレーションのメンバーとウェイの構成ノードを含める
+        for r in relation_ids:
+            for kind, ref, _ in self.relations[r][0]:
+                if kind == "way" and ref in self.ways:
+                    way_ids.add(ref)
+                elif kind == "node" and ref in self.nodes:
+                    node_ids.add(ref)
+        for w in way_ids:
+            node_ids.update(n for n in self.ways[w][0] if n in self.nodes)
+
+        return (
+            [self._node_json(n) for n in sorted(node_ids)]
+            + [self._way_json(w) for w in sorted(way_ids)]
+            + [self._relation_json(r) for r in sorted(relation_ids)]
+        )
+
+    def _relation_within(self, members, within: set[int]) -> bool:
+        for kind, ref, _ in members:
+            if kind == "node" and ref in within:
+                return True
+            if (
+                kind == "way"
+                and ref in self.ways
+                and not within.isdisjoint(self.ways[ref][0])
+            ):
+                return True
+        return False
+
+    def _node_json(self, osmid: int) -> dict:
+        lat, lon, tags = self.nodes[osmid]
+        element = {"type": "node", "id": osmid, "lat": lat, "lon": lon}
+        if tags:
+            element["tags"] = tags
+        return element
+
+    def _way_json(self, osmid: int) -> dict:
+        refs, tags = self.ways[osmid]
+        element = {"type": "way", "id": osmid, "nodes": refs}
+        if tags:
+            element["tags"] = tags
+        return element
+
+    def _relation_json(self, osmid: int) -> dict:
+        members, tags = self.relations[osmid]
+        element = {
+            "type": "relation",
+            "id": osmid,
+            "members": [
+                {"type": kind, "ref": ref, "role": role} for kind, ref, role in members
+            ],
+        }
+        if tags:
+            element["tags"] = tags
+        return element
+
+
+class StubBackend:
+    """記録済みレスポンスと OSM 抽出ファイルから API の応答を組み立てる。"""
+
+    def __init__(
+        self,
+        extract: OsmExtract | None = None,
+        places: str | Path | None = None,
+        responses_dir: str | Path | None = None,
+        upstream_overpass: str | None = None,
+        upstream_nominatim: str | None = None,
+        delay: float = 0.0,
+    ):
+        self.extract = extract
+        self.places = self._load_places(places) if places else []
+        self.responses_dir = Path(responses_dir) if responses_dir else None
+        self.upstream_overpass = upstream_overpass
+        self.upstream_nominatim = upstream_nominatim
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    # --------------------
+    # 記録済みレスポンス
+    # --------------------
+    def _recorded_path(self, api: str, key: str) -> Path | None:
+        if self.responses_dir is None:
+            return None
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.responses_dir / api / f"{digest}.json"
+
+    def _load_recorded(self, api: str, key: str):
+        path = self._recorded_path(api, key)
+        if path is None or not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _record(self, api: str, key: str, response) -> None:
+        path = self._recorded_path(api, key)
+        if path is None:
+            return
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(response, f, ensure_ascii=False)
+
+    # --------------------
+    # Overpass
+    # --------------------
+    def overpass(self, query: str) -> dict:
+        response = self._load_recorded("overpass", query)
+        if response is None and self.upstream_overpass:
+            data = urllib.parse.urlencode({"data": query}).encode("utf-8")
+            url = self.upstream_overpass.rstrip("/") + "/interpreter"
+            with urllib.request.urlopen(url, data=data, timeout=180) as r:
+                response = json.load(r)
+            self._record("overpass", query, response)
+        if response is None:
+            elements = self.extract.query(query) if self.extract else []
+            response = {
+                "version": 0.6,
+                "generator": "osmnx-gallery stub server",
+                "osm3s": {
+                    "timestamp_osm_base": datetime.now(UTC).strftime(
+                        "%Y-%m-%dT%H:%M:%SZ"
+                    ),
+                    "copyright": "The data included in this document is from "
+                    "www.openstreetmap.org. The data is made available under ODbL.",
+                },
+                "elements": elements,
+            }
+        return response
+
+    @staticmethod
+    def overpass_status() -> str:
+        now = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return (
+            "Connected as: 0\n"
+            f"Current time: {now}\n"
+            "Announced endpoint: none\n"
+            "Rate limit: 0\n"
+            "4 slots available now.\n"
+            "Currently running queries (pid, space limit, time limit, start time):\n"
+        )
+
+    # --------------------
+    # Nominatim
+    # --------------------
+    def nominatim(self, request_type: str, params: dict) -> list:
+        key = request_type + ":" + normalize_query(params.get("q", ""))
+        response = self._load_recorded("nominatim", key)
+        if response is None and self.upstream_nominatim:
+            query = urllib.parse.urlencode(params)
+            url = f"{self.upstream_nominatim.rstrip('/')}/{request_type}?{query}"
+            request = urllib.request.Request(
+                url, headers={"User-Agent": "osmnx-gallery stub server"}
+            )
+            with urllib.request.urlopen(request, timeout=180) as r:
+                response = json.load(r)
+            self._record("nominatim", key, response)
+        if response is None:
+            response = self._match_places(params.get("q", ""))
+        if response is None:
+            response = self._extract_place(params.get("q", ""))
+        return response
+
+    @staticmethod
+    def _load_places(path: str | Path) -> list[dict]:
+        """``ox.geocode_to_gdf`` の結果を保存したファイルを Nominatim 形式に戻す。"""
+        import geopandas as gpd
+        from shapely.geometry import mapping
+
+        gdf = gpd.read_file(path).to_crs(epsg=4326)
+        places = []
+        for row in gdf.itertuples(index=False):
+            place = {
+                k: getattr(row, k)
+                for k in (
+                    "place_id",
+                    "osm_type",
+                    "osm_id",
+                    "class",
+                    "type",
+                    "place_rank",
+                    "importance",
+                    "addresstype",
+                    "name",
+                    "display_name",
+                )
+                if hasattr(row, k)
+            }
+            place = {
+                k: v.item() if isinstance(v, np.generic) else v
+                for k, v in place.items()
+            }
+            place["lat"], place["lon"] = str(row.lat), str(row.lon)
+            place["boundingbox"] = [
+                str(row.bbox_south),
+                str(row.bbox_north),
+                str(row.bbox_west),
+                str(row.bbox_east),
+            ]
+            place["geojson"] = mapping(row.geometry)
+            places.append(place)
+        return places
+
+    def _match_places(self, query: str) -> list | None:
+        """地名の先頭（最初のカンマまで）が一致する場所を返す。"""
+        head = normalize_query(query).split(",")[0].strip()
+        matches = [
+            p
+            for p in self.places
+            if normalize_query(p.get("name", "")) == head
+            or normalize_query(p.get("display_name", "")).startswith(head)
+        ]
+        return matches or None
+
+    def _extract_place(self, query: str) -> list:
+        """抽出ファイルの範囲を、どの地名に対しても境界として返す。"""
+        if self.extract is None or self.extract.bounds is None:
+            return []
+        west, south, east, north = self.extract.bounds
+        ring = [[west, south], [east, south], [east, north], [west, north]]
+        return [
+            {
+                "place_id": 0,
+                "licence": "Data © OpenStreetMap contributors, ODbL 1.0.",
+                "osm_type": "relation",
+                "osm_id": 0,
+                "lat": str((south + north) / 2),
+                "lon": str((west + east) / 2),
+                "class": "boundary",
+                "type": "administrative",
+                "place_rank": 16,
+                "importance": 0.5,
+                "addresstype": "city",
+                "name": query,
+                "display_name": query,
+                "boundingbox": [str(south), str(north), str(west), str(east)],
+                "geojson": {"type": "Polygon", "coordinates": [ring + [ring[0]]]},
+            }
+        ]
+
+
+def _make_handler(backend: StubBackend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: str, content_type: str) -> None:
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_json(self, response) -> None:
+            self._send(200, json.dumps(response), "application/json")
+
+        def _dispatch(self, params: dict) -> None:
+            path = urllib.parse.urlparse(self.path).path.rstrip("/")
+            if backend.delay:
+                time.sleep(backend.delay)
+            try:
+                if path.endswith("/status"):
+                    self._send(200, backend.overpass_status(), "text/plain")
+                elif path.endswith("/interpreter"):
+                    self._send_json(backend.overpass(params.get("data", "")))
+                elif path.split("/")[-1] in ("search", "reverse", "lookup"):
+                    self._send_json(backend.nominatim(path.split("/")[-1], params))
+                else:
+                    self._send(404, "not found", "text/plain")
+            except (ValueError, re.error, OSError, shapely.errors.ShapelyError) as e:
+                # クエリや記録済みレスポンスを解釈できない、転送先に接続できないなど
+                self._send(500, f"stub server error: {e}", "text/plain")
+
+        def do_GET(self):
+            query = urllib.parse.urlparse(self.path).query
+            self._dispatch(dict(urllib.parse.parse_qsl(query)))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode("utf-8")
+            self._dispatch(dict(urllib.parse.parse_qsl(body)))
+
+    return Handler
+
+
+def make_server(
+    backend: StubBackend, host: str = "127.0.0.1", port: int = 8800
+) -> ThreadingHTTPServer:
+    """代替サーバーを作成する（``port=0`` で空いているポートを使う）。"""
+    server = ThreadingHTTPServer((host, port), _make_handler(backend))
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(backend: StubBackend, host: str = "127.0.0.1", port: int = 0):
+    """代替サーバーをバックグラウンドスレッドで起動し、サーバーと URL を返す。"""
+    server = make_server(backend, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return server, url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--osm",
+        nargs="*",
+        default=[],
+        help="応答に使う OSM データ（.osm / .osm.bz2 / .graphml、複数指定可）",
+    )
+    parser.add_argument(
+        "--places", help="Nominatim の応答に使う、ジオコーディング結果のファイル"
+    )
+    parser.add_argument(
+        "--responses",
+        default="input_data/stub_responses",
+        help="記録済みレスポンスのディレクトリ",
+    )
+    parser.add_argument("--upstream-overpass", help="記録がない場合の転送先 Overpass")
+    parser.add_argument("--upstream-nominatim", help="記録がない場合の転送先 Nominatim")
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="応答ごとに加える遅延（秒）"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    args = parser.parse_args()
+
+    backend = StubBackend(
+        extract=OsmExtract(*args.osm) if args.osm else None,
+        places=args.places,
+        responses_dir=args.responses,
+        upstream_overpass=args.upstream_overpass,
+        upstream_nominatim=args.upstream_nominatim,
+        delay=args.delay,
+    )
+    server = make_server(backend, args.host, args.port)
+    print(f"Overpass:  http://{args.host}:{args.port}/api")
+    print(f"Nominatim: http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
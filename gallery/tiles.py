@@ -0,0 +1,202 @@
+"""GeoDataFrame をベクタータイル（Mapbox Vector Tile）として配信する。
+
+インタラクティブマップに GeoDataFrame 全体を GeoJSON として埋め込むと、
+都市全体のデータではページが重くなる。ここではレイヤーを Web メルカトルに
+変換して空間インデックス（``shapely.STRtree``）を作っておき、ブラウザが
+要求したタイルの範囲だけを切り出し、ズームに応じて簡略化して返す。
+
+    layer_id = tiles.publish("network", edges, columns=["highway", "name"])
+    url = tiles.tile_url(layer_id)  # .../tiles/<layer_id>/{z}/{x}/{y}.pbf
+
+タイルはローカルの HTTP サーバー（``GALLERY_TILE_HOST``・``GALLERY_TILE_PORT``）が配信する。
+ブラウザから見たサーバーの URL が異なる場合は ``GALLERY_TILE_URL`` で指定する。
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import shapely
+
+from gallery import settings
+from gallery.cache import SessionStore, estimate_nbytes
+from gallery.payload import property_value
+
+# Web メルカトル（EPSG:3857）の範囲の半分（メートル）
+HALF_WORLD = 20037508.342789244
+
+# タイル内の座標の分解能
+EXTENT = 4096
+
+# 簡略化の許容誤差と、省略する小さな図形の大きさ（いずれもタイル幅に対する割合）
+SIMPLIFY_RATIO = 1 / 1024
+MIN_SIZE_RATIO = 1 / 512
+# 大きさを持たず、MIN_SIZE_RATIO で省かない図形の種類
+_POINT_TYPES = [shapely.GeometryType.POINT, shapely.GeometryType.MULTIPOINT]
+
+_PATH_RE = re.compile(r"^/tiles/(\w+)/(\d+)/(\d+)/(\d+)\.pbf$")
+
+
+@dataclass
+class Layer:
+    name: str
+    geometry: np.ndarray
+    properties: list[dict]
+    tree: shapely.STRtree
+
+
+_lock = threading.Lock()
+_layers = SessionStore(settings.TILE_STORE_MB * 1024**2)
+
+
+def publish(name: str, gdf, columns=()) -> str:
+    """GeoDataFrame をタイル配信用に登録し、レイヤー ID を返す。
+
+    ``name`` はタイル内のレイヤー名、``columns`` はタイルに含める属性。
+    レイヤー ID はデータの内容から決まるため、同じデータは一度だけ登録される。
+    """
+    from gallery.render import fingerprint
+
+    columns = [c for c in columns if c in gdf.columns]
+    layer_id = f"{name}_{fingerprint(gdf, columns)}"
+    with _lock:
+        if layer_id in _layers:
+            return layer_id
+
+    gdf = gdf[gdf.geometry.notna()].to_crs(epsg=3857)
+    geometry = np.asarray(gdf.geometry.values)
+    records = gdf[columns].to_dict("records") if columns else [{}] * len(gdf)
+    properties = [
+        {c: v for c in columns if (v := property_value(row[c])) is not None}
+        for row in records
+    ]
+    layer = Layer(name, geometry, properties, shapely.STRtree(geometry))
+    with _lock:
+        _layers.put(layer_id, layer, nbytes=estimate_nbytes(gdf))
+    return layer_id
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """タイル ``z/x/y`` の範囲（EPSG:3857 の ``minx, miny, maxx, maxy``）。"""
+    size = 2 * HALF_WORLD / 2**z
+    minx = -HALF_WORLD + x * size
+    maxy = HALF_WORLD - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> tuple[int, int]:
+    """緯度経度を含むタイルの ``(x, y)``。"""
+    n = 2**z
+    x = (lon + 180) / 360 * n
+    y = (1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * n
+    return int(x), int(y)
+
+
+def tile_features(layer: Layer, z: int, x: int, y: int) -> list[dict]:
+    """タイルの範囲に含まれる図形を切り出し、ズームに応じて簡略化する。"""
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    size = maxx - minx
+    # 線の太さの分だけ少し広めに切り出す
+    pad = size / 64
+    box = (minx - pad, miny - pad, maxx + pad, maxy + pad)
+
+    index = layer.tree.query(shapely.box(*box))
+    if not len(index):
+        return []
+    index = np.sort(index)
+    geoms = layer.geometry[index]
+
+    # 1 ピクセルに満たない線や面は描いても見えないので省く（点は記号で描くので残す）
+    gminx, gminy, gmaxx, gmaxy = shapely.bounds(geoms).T
+    large = np.maximum(gmaxx - gminx, gmaxy - gminy) >= size * MIN_SIZE_RATIO
+    keep = large | np.isin(shapely.get_type_id(geoms), _POINT_TYPES)
+    index, geoms = index[keep], geoms[keep]
+
+    geoms = shapely.clip_by_rect(geoms, *box)
+    geoms = shapely.simplify(geoms, size * SIMPLIFY_RATIO, preserve_topology=False)
+    return [
+        {"geometry": geom, "properties": layer.properties[i]}
+        for i, geom in zip(index, geoms)
+        if not geom.is_empty
+    ]
+
+
+def render_tile(layer_id: str, z: int, x: int, y: int) -> bytes | None:
+    """タイルを MVT 形式で返す（登録されていないレイヤーは None）。"""
+    import mapbox_vector_tile
+
+    with _lock:
+        layer = _layers.get(layer_id)
+    if layer is None:
+        return None
+    features = tile_features(layer, z, x, y)
+    return mapbox_vector_tile.encode(
+        [{"name": layer.name, "features": features}],
+        default_options={
+            "quantize_bounds": tile_bounds(z, x, y),
+            "extents": EXTENT,
+        },
+    )
+
+
+def tile_url(layer_id: str) -> str:
+    """Leaflet などに渡すタイル URL のテンプレート。"""
+    port = _server.server_address[1] if _server is not None else settings.TILE_PORT
+    base = settings.TILE_URL or f"http://localhost:{port}"
+    return f"{base.rstrip('/')}/tiles/{layer_id}/{{z}}/{{x}}/{{y}}.pbf"
+
+
+def layer_stats() -> dict:
+    with _lock:
+        return _layers.stats()
+
+
+# --------------------
+# タイルサーバー
+# --------------------
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        match = _PATH_RE.match(self.path.split("?")[0])
+        body = None
+        if match:
+            layer_id, z, x, y = match.group(1), *map(int, match.groups()[1:])
+            body = render_tile(layer_id, z, x, y)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.mapbox-vector-tile")
+        self.send_header("Content-Length", str(len(body)))
+        # Streamlit のページ（別のオリジン）から読み込むため
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port: int | None = None) -> int:
+    """タイルサーバーを 1 度だけ起動し、ポート番号を返す。
+
+    ``port`` を省略すると ``GALLERY_TILE_PORT`` を使い、``GALLERY_TILE_HOST``
+    （既定は ``127.0.0.1``）で待ち受ける。
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(
+                (settings.TILE_HOST, port or settings.TILE_PORT), _Handler
+            )
+            threading.Thread(
+                target=_server.serve_forever, name="gallery-tiles", daemon=True
+            ).start()
+        return _server.server_address[1]
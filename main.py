@@ -1,7 +1,13 @@
 import streamlit as st
 
+from gallery import preload
+
 st.set_page_config(page_title="📦 OSMnx デモギャラリー", layout="wide")
 st.title("📦 OSMnx デモギャラリー")
+
+# よく使われる場所のデータを別スレッドで読み込んでおく（gallery/preload.py）
+preload.start()
+
 st.markdown(
     """
 このアプリは [OSMnx](https://osmnx.readthedocs.io/) の公式デモノートブックをもとに作成した Streamlit アプリのギャラリーページです。
@@ -3,11 +3,18 @@
 import streamlit as st
 import osmnx as ox
 
+from gallery import perf
+from gallery import raster
+from gallery import render
+from gallery.acquire import features_layer, graph_layer, iter_cached_layers
+from gallery.cache import cache_key, get_store
+
 # --------------------
 # ページ設定
 # --------------------
 st.set_page_config(page_title="00 - OSMnx Features Demo", layout="wide")
 st.title("📦 OSMnx Features Demo")
+perf.start_trace("00")
 
 # --------------------
 # 入力フォーム（メインカラムに配置）
@@ -19,40 +26,85 @@ with st.form("place_form"):
         "場所の名前", placeholder="東京都千代田区丸の内", value="東京都千代田区丸の内"
     )
     network_type = st.selectbox("ネットワークタイプ", ["drive", "walk", "bike", "all"])
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         get_graph = st.form_submit_button("ネットワークを取得・表示")
     with col2:
         get_buildings = st.form_submit_button("建物を取得・表示")
+    with col3:
+        get_both = st.form_submit_button("両方を並行取得・表示")
+
+# 最後に押したボタンを記録し、他の操作による再実行でも同じ結果を表示する
+if get_graph or get_buildings or get_both:
+    st.session_state["features_demo_view"] = (
+        "graph" if get_graph else "buildings" if get_buildings else "both"
+    )
+view = st.session_state.get("features_demo_view")
+store = get_store()
+graph_key = cache_key("graph", place_name, network_type)
+buildings_key = cache_key("buildings", place_name)
+
+
+@perf.stage("render")
+def show_graph(G):
+    def draw():
+        fig, _ = raster.plot_graph(
+            G, bgcolor="w", node_size=0, edge_color="black", show=False, close=False
+        )
+        return fig
+
+    render.show_figure(draw, G)
+
+
+@perf.stage("render")
+def show_buildings(gdf):
+    def draw():
+        fig, _ = ox.plot_footprints(
+            gdf, color="black", bgcolor="w", show=False, close=False
+        )
+        return fig
+
+    render.show_figure(draw, gdf)
+
 
 # --------------------
-# ネットワーク取得と描画
+# ネットワーク・建物ポリゴンの取得と描画
+# 両方を表示する場合は並行して取得し、取得できたものから順に描画する
 # --------------------
-if get_graph:
-    with st.spinner("ネットワークを取得中..."):
+layers = {}
+if view in ("graph", "both"):
+    layers["graph"] = (graph_key, graph_layer(network_type))
+if view in ("buildings", "both"):
+    layers["buildings"] = (buildings_key, features_layer({"building": True}))
+
+renderers = {"graph": show_graph, "buildings": show_buildings}
+error_messages = {
+    "graph": "ネットワークの取得に失敗しました",
+    "buildings": "建物データの取得に失敗しました",
+}
+containers = {name: st.container() for name in layers}
+if layers:
+    with st.spinner("データを取得中..."):
+        # 検索・取得の失敗を表示する（osmnx・requests の例外は ValueError か OSError、
+        # 地名が範囲にならない場合は TypeError）
         try:
-            G = ox.graph_from_place(place_name, network_type=network_type)
-            fig, ax = ox.plot_graph(
-                G, bgcolor="w", node_size=0, edge_color="black", show=False, close=False
-            )
-            st.pyplot(fig)
-        except Exception as e:
-            st.error(f"ネットワークの取得に失敗しました: {e}")
+            for name, value, error in iter_cached_layers(store, place_name, layers):
+                with containers[name]:
+                    if error is not None:
+                        st.error(f"{error_messages[name]}: {error}")
+                        continue
+                    try:
+                        renderers[name](value)
+                    except ValueError as e:
+                        # 空のネットワーク・建物など、描画できないデータ
+                        st.error(f"{error_messages[name]}: {e}")
+        except (OSError, ValueError, TypeError) as e:
+            st.error(f"場所の検索に失敗しました: {e}")
 
 # --------------------
-# 建物ポリゴンの取得と描画
+# パフォーマンス計測結果
 # --------------------
-if get_buildings:
-    with st.spinner("建物を取得中..."):
-        try:
-            tags = {"building": True}
-            gdf = ox.features_from_place(place_name, tags=tags)
-            fig, ax = ox.plot_footprints(
-                gdf, color="black", bgcolor="w", show=False, close=False
-            )
-            st.pyplot(fig)
-        except Exception as e:
-            st.error(f"建物データの取得に失敗しました: {e}")
+perf.perf_panel()
 
 # --------------------
 # 解説マークダウン
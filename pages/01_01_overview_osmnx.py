@@ -2,12 +2,18 @@
 
 import streamlit as st
 import osmnx as ox
-import tempfile
-import os
+
+from gallery import perf
+from gallery import raster
+from gallery import render
+from gallery.acquire import features_layer, graph_layer, iter_cached_layers
+from gallery.cache import cache_key, get_store
+from gallery.exports import EXPORT_FORMATS, build_export, get_export
 
 # ページ設定
 st.set_page_config(page_title="01 - OSMnx Overview", layout="wide")
 st.title("🗺️ OSMnx Overview")
+perf.start_trace("01")
 
 # 入力フォーム（メインコンテンツ）
 st.markdown("### 📍 場所とネットワークタイプを指定")
@@ -17,75 +23,145 @@ with st.form("place_form"):
         "場所の名前", placeholder="東京都千代田区丸の内", value="東京都千代田区丸の内"
     )
     network_type = st.selectbox("ネットワークタイプ", ["drive", "walk", "bike", "all"])
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         show_graph = st.form_submit_button("① ネットワーク表示")
     with col2:
         show_buildings = st.form_submit_button("② 建物表示")
     with col3:
         show_stats = st.form_submit_button("③ 統計量表示")
-
-# 共通処理：ネットワーク取得
-G = None
+    with col4:
+        show_all = st.form_submit_button("④ まとめて表示")
+
+# 共通処理：ネットワーク・建物の取得
+# 取得したデータと表示状態はセッションストアに保持し、保存ボタン等による再実行でも再取得しない
+if show_graph or show_buildings or show_stats or show_all:
+    st.session_state["overview_view"] = {
+        "graph": show_graph or show_all,
+        "buildings": show_buildings or show_all,
+        "stats": show_stats or show_all,
+    }
+view = st.session_state.get("overview_view", {})
+show_graph = view.get("graph", False)
+show_buildings = view.get("buildings", False)
+show_stats = view.get("stats", False)
+
+store = get_store()
+graph_key = cache_key("graph", place_name, network_type)
+buildings_key = cache_key("buildings", place_name)
+
+layers = {}
 if show_graph or show_stats:
-    try:
-        G = ox.graph_from_place(place_name, network_type=network_type)
-    except Exception as e:
-        st.error(f"ネットワーク取得に失敗しました: {e}")
-
-# グラフ描画
-if show_graph and G:
-    with st.spinner("ネットワークを描画中..."):
-        fig, ax = ox.plot_graph(
+    layers["graph"] = (graph_key, graph_layer(network_type))
+if show_buildings:
+    layers["buildings"] = (buildings_key, features_layer({"building": True}))
+
+# ネットワークと建物は並行して取得し、取得できたものから順に描画する
+graph_area = st.container()
+buildings_area = st.container()
+stats_area = st.container()
+G = store.get(graph_key) if graph_key in store else None
+
+
+@perf.stage("render")
+def draw_graph(G):
+    def draw():
+        fig, _ = raster.plot_graph(
             G, bgcolor="w", node_size=0, edge_color="black", show=False, close=False
         )
-        st.pyplot(fig)
+        return fig
 
-# 建物表示
-if show_buildings:
-    with st.spinner("建物データ取得中..."):
-        try:
-            tags = {"building": True}
-            gdf = ox.features_from_place(place_name, tags=tags)
-            fig, ax = ox.plot_footprints(
-                gdf, color="black", bgcolor="w", show=False, close=False
-            )
-            st.pyplot(fig)
-        except Exception as e:
-            st.error(f"建物データの取得に失敗しました: {e}")
-
-# 統計量表示
-if show_stats and G:
-    with st.spinner("統計量を計算中..."):
+    render.show_figure(draw, G)
+
+
+@perf.stage("render")
+def draw_buildings(gdf):
+    def draw():
+        fig, _ = ox.plot_footprints(
+            gdf, color="black", bgcolor="w", show=False, close=False
+        )
+        return fig
+
+    render.show_figure(draw, gdf)
+
+
+@perf.stage("analyze")
+def draw_stats(G):
+    stats = ox.basic_stats(G)
+    st.subheader("📊 基本統計量")
+    for k, v in stats.items():
+        st.markdown(f"- **{k}**: {v}")
+
+
+if layers:
+    with st.spinner("データを取得中..."):
+        # 検索・取得の失敗を表示する（osmnx・requests の例外は ValueError か OSError、
+        # 地名が範囲にならない場合は TypeError）
         try:
-            stats = ox.basic_stats(G)
-            st.subheader("📊 基本統計量")
-            for k, v in stats.items():
-                st.markdown(f"- **{k}**: {v}")
-        except Exception as e:
-            st.error(f"統計量の取得に失敗しました: {e}")
+            for name, value, error in iter_cached_layers(store, place_name, layers):
+                if name == "buildings":
+                    # 建物表示
+                    with buildings_area:
+                        if error is not None:
+                            st.error(f"建物データの取得に失敗しました: {error}")
+                            continue
+                        try:
+                            draw_buildings(value)
+                        except ValueError as e:
+                            st.error(f"建物データの取得に失敗しました: {e}")
+                    continue
+
+                if error is not None:
+                    graph_area.error(f"ネットワーク取得に失敗しました: {error}")
+                    continue
+                G = value
+
+                # グラフ描画
+                if show_graph:
+                    with graph_area:
+                        draw_graph(G)
+
+                # 統計量表示
+                if show_stats:
+                    with stats_area:
+                        try:
+                            draw_stats(G)
+                        except ValueError as e:
+                            st.error(f"統計量の取得に失敗しました: {e}")
+        except (OSError, ValueError, TypeError) as e:
+            st.error(f"場所の検索に失敗しました: {e}")
 
 # 保存・読み込み（ダウンロード用）
+# ファイルはボタンが押されたときに初めて生成し、グラフのキーごとにセッションへ保持する
 st.markdown("### 💾 データの保存")
 if G:
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("📥 GraphMLとして保存"):
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix=".graphml"
-            ) as tmp_file:
-                ox.save_graphml(G, filepath=tmp_file.name)
-                with open(tmp_file.name, "rb") as f:
-                    st.download_button("Download GraphML", f, file_name="graph.graphml")
-                os.remove(tmp_file.name)
+    cols = st.columns(len(EXPORT_FORMATS))
+    for col, (fmt, spec) in zip(cols, EXPORT_FORMATS.items()):
+        with col:
+            data = get_export(graph_key, fmt)
+            if data is None and st.button(
+                f"📦 {spec['label']}を生成", key=f"build_{fmt}"
+            ):
+                with st.spinner(f"{spec['label']}を生成中..."):
+                    # 書き込みの失敗（GeoPackage では GDAL の RuntimeError）を表示する
+                    try:
+                        with perf.stage("export", format=fmt):
+                            data = build_export(G, graph_key, fmt)
+                    except (OSError, ValueError, RuntimeError) as e:
+                        st.error(f"{spec['label']}の生成に失敗しました: {e}")
+            if data is not None:
+                st.download_button(
+                    f"📥 {spec['label']}をダウンロード",
+                    data,
+                    file_name=f"graph{spec['suffix']}",
+                    mime=spec["mime"],
+                    key=f"download_{fmt}",
+                )
 
-    with col2:
-        if st.button("📥 GeoPackageとして保存"):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".gpkg") as tmp_file:
-                ox.save_graph_geopackage(G, filepath=tmp_file.name)
-                with open(tmp_file.name, "rb") as f:
-                    st.download_button("Download GPKG", f, file_name="graph.gpkg")
-                os.remove(tmp_file.name)
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
 
 # --------------------
 # 解説マークダウン
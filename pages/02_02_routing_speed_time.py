@@ -1,10 +1,14 @@
 import streamlit as st
 import osmnx as ox
 import random
-import contextily as ctx
+
+from gallery import perf
+from gallery import render
+from gallery.acquire import graph_from_place
 
 st.set_page_config(page_title="02 - Routing: Speed and Time", layout="wide")
 st.title("🚗 Routing: Speed and Travel Time in OSMnx")
+perf.start_trace("02")
 
 st.markdown("### 📍 場所と経路探索パラメータの指定")
 with st.form("routing_form"):
@@ -20,29 +24,38 @@ if submitted:
     with st.spinner("ネットワークとルートを取得中..."):
         try:
             # ✅ グラフの取得と最大連結成分の抽出（ox.graphで統一）
-            G = ox.graph.graph_from_place(place_name, network_type="drive")
+            with perf.stage("acquire"):
+                G = graph_from_place(place_name, network_type="drive")
 
             # エッジ属性追加
-            G = ox.add_edge_speeds(G)
-            G = ox.add_edge_travel_times(G)
-
-            # ランダムな出発地・目的地
-            nodes = list(G.nodes())
-            orig, dest = random.sample(nodes, 2)
-            weight = "length" if route_type == "距離（length）" else "travel_time"
-
-            # 経路計算と描画
-            route = ox.routing.shortest_path(G, orig, dest, weight=weight)
-            fig, ax = ox.plot.plot_graph_route(
-                G,
-                route,
-                route_color="red",
-                route_linewidth=2,
-                bgcolor="white",
-                show=False,
-                close=False,
-            )
-            st.pyplot(fig)
+            with perf.stage("analyze"):
+                G = ox.add_edge_speeds(G)
+                G = ox.add_edge_travel_times(G)
+
+                # ランダムな出発地・目的地
+                nodes = list(G.nodes())
+                orig, dest = random.sample(nodes, 2)
+                weight = "length" if route_type == "距離（length）" else "travel_time"
+
+                # 経路計算
+                route = ox.routing.shortest_path(G, orig, dest, weight=weight)
+
+            # 描画
+            with perf.stage("render"):
+
+                def draw():
+                    fig, _ = ox.plot.plot_graph_route(
+                        G,
+                        route,
+                        route_color="red",
+                        route_linewidth=2,
+                        bgcolor="white",
+                        show=False,
+                        close=False,
+                    )
+                    return fig
+
+                render.show_figure(draw, G, route)
 
             # 属性の合計を計算
             route_edges = list(zip(route[:-1], route[1:]))
@@ -61,6 +74,11 @@ if submitted:
         except Exception as e:
             st.error(f"ルートの計算に失敗しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -1,10 +1,22 @@
 # 📄 ファイル名の例: pages/03-graph-place-queries.py
 
 import streamlit as st
-import osmnx as ox
+
+from gallery import graph_tiles
+from gallery import perf
+from gallery import raster
+from gallery import render
+from gallery.acquire import (
+    graph_from_bbox,
+    graph_from_place,
+    graph_from_point,
+    graph_from_polygon,
+)
+from gallery.geocode import geocode_to_gdf
 
 st.set_page_config(page_title="03 - Graph Place Queries", layout="wide")
 st.title("🧭 Graph from Place Queries")
+perf.start_trace("03")
 
 st.markdown("### 📍 道路ネットワークの取得方法を選択してください")
 
@@ -57,27 +69,52 @@ with st.form("graph_form"):
 if submitted:
     with st.spinner("ネットワークを取得中..."):
         try:
-            if query_method == "地名から取得":
-                G = ox.graph_from_place(place, network_type=network_type)
-            elif query_method == "複数の地名":
-                place_list = [p.strip() for p in places.splitlines() if p.strip()]
-                G = ox.graph_from_place(place_list, network_type=network_type)
-            elif query_method == "緯度経度 + 距離":
-                point = (lat, lon)
-                G = ox.graph_from_point(point, dist=dist, network_type=network_type)
-            elif query_method == "バウンディングボックス":
-                G = ox.graph_from_bbox(
-                    north, south, east, west, network_type=network_type
-                )
-            elif query_method == "ポリゴン":
-                gdf = ox.geocode_to_gdf(place_poly)
-                polygon = gdf.loc[0, "geometry"]
-                G = ox.graph_from_polygon(polygon, network_type=network_type)
-
-            fig, ax = ox.plot_graph(G, bgcolor="white", show=False, close=False)
-            st.pyplot(fig)
+            # 範囲を指定する取得方法では、その範囲を含むネットワーク（地名から
+            # 取得したものなど）が取得済みであれば、そこから切り出す
+            with perf.stage("acquire", method=query_method):
+                if query_method == "地名から取得":
+                    G = graph_from_place(place, network_type=network_type)
+                elif query_method == "複数の地名":
+                    place_list = [p.strip() for p in places.splitlines() if p.strip()]
+                    # 地名ごとのジオコーディングと、格子のタイル単位の取得を
+                    # 並行に行い、最後にタイルをつなぎ合わせる
+                    progress = st.progress(0.0, text="取得中...")
+
+                    def on_progress(place, done, total):
+                        progress.progress(
+                            done / total, text=f"✅ {place}（{done}/{total}）"
+                        )
+
+                    G = graph_tiles.graph_from_places(
+                        place_list, network_type, on_progress=on_progress
+                    )
+                elif query_method == "緯度経度 + 距離":
+                    point = (lat, lon)
+                    G = graph_from_point(point, dist, network_type)
+                elif query_method == "バウンディングボックス":
+                    G = graph_from_bbox((west, south, east, north), network_type)
+                elif query_method == "ポリゴン":
+                    gdf = geocode_to_gdf(place_poly)
+                    polygon = gdf.loc[0, "geometry"]
+                    G = graph_from_polygon(polygon, network_type)
+
+            with perf.stage("render"):
+
+                def draw():
+                    fig, _ = raster.plot_graph(
+                        G, bgcolor="white", show=False, close=False
+                    )
+                    return fig
+
+                render.show_figure(draw, G)
         except Exception as e:
             st.error(f"ネットワーク取得に失敗しました: {e}")
+
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -3,56 +3,99 @@
 import streamlit as st
 import osmnx as ox
 import matplotlib.pyplot as plt
-from matplotlib import rcParams
-import matplotlib.font_manager as fm
+
+from gallery import consolidate
+from gallery import perf
+from gallery import projection
+from gallery import render
+from gallery.acquire import graph_from_place
+from gallery.cache import cache_key, get_store
+from gallery.simplify import simplify_graph
+from gallery.startup import use_japanese_font
 
 # --------------------
 # ✅ 日本語フォント設定（Noto Sans CJK JPを使う）
 # --------------------
-# 利用可能なフォントから Noto Sans CJK JP を優先設定
-jp_font_candidates = [
-    f
-    for f in fm.findSystemFonts()
-    if "NotoSansCJK" in f or "NotoSansCJKjp" in f or "Noto Sans CJK JP" in f
-]
-if jp_font_candidates:
-    rcParams["font.family"] = fm.FontProperties(fname=jp_font_candidates[0]).get_name()
-else:
-    rcParams["font.family"] = "IPAexGothic"  # フォールバック（あれば）
+# 利用可能なフォントの探索はプロセスごとに一度だけ行う
+use_japanese_font()
 
 st.set_page_config(page_title="04 - Simplify and Consolidate", layout="wide")
 st.title("🔧 Simplify Graph and Consolidate Nodes")
+perf.start_trace("04")
 
 st.markdown("### 📍 地名と処理パラメータを指定")
 
 with st.form("simplify_form"):
     place = st.text_input("場所（例: 東京都千代田区）", "東京都千代田区")
-    tolerance = st.slider(
-        "ノード統合の許容距離（メートル）", min_value=5, max_value=50, value=15, step=5
-    )
-    submitted = st.form_submit_button("グラフを取得・処理・描画")
+    submitted = st.form_submit_button("グラフを取得・処理")
+
+# 許容距離はフォームの外に置き、変更するたびに統合だけを計算し直す
+tolerance = st.slider(
+    "ノード統合の許容距離（メートル）",
+    min_value=5,
+    max_value=int(consolidate.MAX_TOLERANCE),
+    value=15,
+    step=5,
+)
 
 if submitted:
-    with st.spinner("データ取得と処理中..."):
-        try:
-            G_raw = ox.graph_from_place(place, network_type="drive", simplify=False)
-            G_simple = ox.simplify_graph(G_raw)
-            G_proj = ox.project_graph(G_simple)
-            G_cons = ox.consolidate_intersections(G_proj, tolerance=tolerance)
+    st.session_state["simplify_place"] = place
+place = st.session_state.get("simplify_place")
+
 
-            nodes_before, _ = ox.graph_to_gdfs(G_proj)
-            nodes_after, _ = ox.graph_to_gdfs(G_cons)
+def prepare_graphs(place):
+    """未簡素化・簡素化・投影済みのグラフ（場所ごとにセッションストアに保持する）。"""
+    with perf.stage("acquire"):
+        G_raw = graph_from_place(place, network_type="drive", simplify=False)
+    with perf.stage("analyze.simplify"):
+        G_simple = simplify_graph(G_raw)
+    with perf.stage("project"):
+        G_proj = projection.project_graph(G_simple)
+    return G_raw, G_simple, G_proj
 
-            fig, ax = plt.subplots(figsize=(8, 8))
-            nodes_before.plot(ax=ax, color="red", markersize=8, label="元のノード")
-            nodes_after.plot(ax=ax, color="blue", markersize=8, label="統合後ノード")
-            ax.set_title("ノード統合前後の比較")
-            ax.legend()
-            st.pyplot(fig)
+
+if place:
+    with st.spinner("データ取得と処理中..."):
+        try:
+            graphs_key = cache_key("simplify", place, "drive")
+            G_raw, G_simple, G_proj = get_store().get_or_create(
+                graphs_key, lambda: prepare_graphs(place)
+            )
+            with perf.stage("analyze.consolidate"):
+                nodes_before, _ = ox.graph_to_gdfs(G_proj)
+                nodes_after = consolidate.hierarchy_for(G_proj).consolidated_nodes(
+                    tolerance
+                )
+
+            col1, col2, col3 = st.columns(3)
+            col1.metric("未簡素化のノード数", f"{len(G_raw):,}")
+            col2.metric("簡素化後のノード数", f"{len(G_simple):,}")
+            col3.metric(f"統合後のノード数（{tolerance}m）", f"{len(nodes_after):,}")
+
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    nodes_before.plot(
+                        ax=ax, color="red", markersize=8, label="元のノード"
+                    )
+                    nodes_after.plot(
+                        ax=ax, color="blue", markersize=8, label="統合後ノード"
+                    )
+                    ax.set_title("ノード統合前後の比較")
+                    ax.legend()
+                    return fig
+
+                render.show_figure(draw, nodes_before, nodes_after)
 
         except Exception as e:
             st.error(f"処理中にエラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -6,8 +6,13 @@ import tempfile
 import os
 import geopandas as gpd
 
+from gallery import perf
+from gallery import render
+from gallery.acquire import graph_from_place
+
 st.set_page_config(page_title="05 - Save and Load Networks", layout="wide")
 st.title("💾 Save and Load Street Networks")
+perf.start_trace("05")
 
 st.markdown("### 📍 ネットワークの取得と保存・読み込みのデモ")
 
@@ -38,27 +43,36 @@ if submitted:
         try:
             if action == "ネットワークを取得して保存":
                 # ネットワーク取得
-                G = ox.graph_from_place(place_name, network_type=network_type)
-                fig, ax = ox.plot_graph(G, bgcolor="white", show=False, close=False)
-                st.pyplot(fig)
+                with perf.stage("acquire"):
+                    G = graph_from_place(place_name, network_type=network_type)
+                with perf.stage("render"):
 
-                # 一時保存 → ダウンロードリンク
-                suffix = ".graphml" if file_format == "graphml" else ".gpkg"
-                with tempfile.NamedTemporaryFile(
-                    delete=False, suffix=suffix
-                ) as tmp_file:
-                    if file_format == "graphml":
-                        ox.save_graphml(G, filepath=tmp_file.name)
-                    elif file_format == "gpkg":
-                        ox.save_graph_geopackage(G, filepath=tmp_file.name)
-                    with open(tmp_file.name, "rb") as f:
-                        st.download_button(
-                            label=f"{file_format.upper()}形式でダウンロード",
-                            data=f,
-                            file_name=f"network.{file_format}",
-                            mime="application/octet-stream",
+                    def draw():
+                        fig, _ = ox.plot_graph(
+                            G, bgcolor="white", show=False, close=False
                         )
-                    os.remove(tmp_file.name)
+                        return fig
+
+                    render.show_figure(draw, G)
+
+                # 一時保存 → ダウンロードリンク
+                with perf.stage("save", format=file_format):
+                    suffix = ".graphml" if file_format == "graphml" else ".gpkg"
+                    with tempfile.NamedTemporaryFile(
+                        delete=False, suffix=suffix
+                    ) as tmp_file:
+                        if file_format == "graphml":
+                            ox.save_graphml(G, filepath=tmp_file.name)
+                        elif file_format == "gpkg":
+                            ox.save_graph_geopackage(G, filepath=tmp_file.name)
+                        with open(tmp_file.name, "rb") as f:
+                            st.download_button(
+                                label=f"{file_format.upper()}形式でダウンロード",
+                                data=f,
+                                file_name=f"network.{file_format}",
+                                mime="application/octet-stream",
+                            )
+                        os.remove(tmp_file.name)
 
             elif action == "保存済みファイルから読み込み":
                 if uploaded_file:
@@ -71,29 +85,37 @@ if submitted:
                         tmp_file_path = tmp_file.name
 
                     # ファイルから読み込み
-                    if file_format == "graphml":
-                        G = ox.load_graphml(tmp_file_path)
-                    elif file_format == "gpkg":
-                        nodes = gpd.read_file(tmp_file_path, layer="nodes")
-                        edges = gpd.read_file(tmp_file_path, layer="edges")
+                    with perf.stage("load", format=file_format):
+                        if file_format == "graphml":
+                            G = ox.load_graphml(tmp_file_path)
+                        elif file_format == "gpkg":
+                            nodes = gpd.read_file(tmp_file_path, layer="nodes")
+                            edges = gpd.read_file(tmp_file_path, layer="edges")
+
+                            # 明示的に u, v, key を型変換（文字列として統一）
+                            edges["u"] = edges["u"].astype(str)
+                            edges["v"] = edges["v"].astype(str)
+                            edges["key"] = edges["key"].astype(str)
+
+                            # MultiIndex を安全に設定
+                            edges.set_index(["u", "v", "key"], inplace=True)
 
-                        # 明示的に u, v, key を型変換（文字列として統一）
-                        edges["u"] = edges["u"].astype(str)
-                        edges["v"] = edges["v"].astype(str)
-                        edges["key"] = edges["key"].astype(str)
+                            # ノードIDとエッジIDの型を一致させる（文字列統一）
+                            nodes["osmid"] = nodes["osmid"].astype(str)
+                            nodes.set_index("osmid", inplace=True)
 
-                        # MultiIndex を安全に設定
-                        edges.set_index(["u", "v", "key"], inplace=True)
+                            # グラフに変換
+                            G = ox.graph_from_gdfs(nodes, edges)
 
-                        # ノードIDとエッジIDの型を一致させる（文字列統一）
-                        nodes["osmid"] = nodes["osmid"].astype(str)
-                        nodes.set_index("osmid", inplace=True)
+                    with perf.stage("render"):
 
-                        # グラフに変換
-                        G = ox.graph_from_gdfs(nodes, edges)
+                        def draw():
+                            fig, _ = ox.plot_graph(
+                                G, bgcolor="white", show=False, close=False
+                            )
+                            return fig
 
-                    fig, ax = ox.plot_graph(G, bgcolor="white", show=False, close=False)
-                    st.pyplot(fig)
+                        render.show_figure(draw, G)
                     os.remove(tmp_file_path)
                 else:
                     st.warning("読み込むファイルを選択してください。")
@@ -101,6 +123,11 @@ if submitted:
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -2,32 +2,69 @@
 
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
-import matplotlib.cm as cm
 import streamlit as st
 import osmnx as ox
-import networkx as nx
+
+from gallery import perf
+from gallery import render
+from gallery import analytics
+from gallery import preload
+from gallery import projection
+from gallery.acquire import graph_from_place
 
 st.set_page_config(page_title="06 - Network Statistics and Centrality", layout="wide")
 st.title("📊 Street Network Statistics and Centrality Indicators")
+perf.start_trace("06")
 
 st.markdown("### 📍 場所と解析対象の選択")
 
 # --- 事前に追加 ---
+# グラフ自体はハッシュしないため、場所とネットワークタイプをキャッシュキーにする
+# 起動時に事前読み込み（gallery.preload）された場所は計算済みの値を使う
 
 
 @st.cache_data(show_spinner="Closeness中心性をキャッシュから取得中...")
-def compute_closeness(_G_proj):
-    return nx.closeness_centrality(_G_proj, distance="length")
+def compute_closeness(_G_proj, place, network_type):
+    return preload.lookup(
+        "closeness",
+        place,
+        network_type,
+        compute=lambda: analytics.closeness(_G_proj),
+    )
 
 
 @st.cache_data(show_spinner="Betweenness中心性をキャッシュから取得中...")
-def compute_betweenness(_G_proj, use_approximation=False):
-    if use_approximation:
-        return nx.betweenness_centrality(
-            _G_proj, weight="length", normalized=True, k=100
-        )
-    else:
-        return nx.betweenness_centrality(_G_proj, weight="length", normalized=True)
+def compute_betweenness(_G_proj, place, network_type):
+    k = analytics.betweenness_samples(_G_proj)
+    return preload.lookup(
+        "betweenness",
+        place,
+        network_type,
+        compute=lambda: analytics.betweenness(_G_proj, k=k),
+    )
+
+
+def plot_centrality(G_proj, centrality, label):
+    """道路網の上にノードの中心性を色分けして重ねた図を作る。"""
+    nc = [centrality[node] for node in G_proj.nodes()]
+    cmap = plt.get_cmap("viridis")
+    norm = colors.Normalize(vmin=min(nc), vmax=max(nc))
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    ox.plot_graph(
+        G_proj,
+        ax=ax,
+        show=False,
+        close=False,
+        edge_color="lightgray",
+        edge_linewidth=0.5,
+        node_size=0,
+    )
+    x = [G_proj.nodes[n]["x"] for n in G_proj.nodes()]
+    y = [G_proj.nodes[n]["y"] for n in G_proj.nodes()]
+    sc = ax.scatter(x, y, c=nc, cmap=cmap, norm=norm, s=10, zorder=3)
+    fig.colorbar(sc, ax=ax, shrink=0.7).set_label(label)
+    return fig
 
 
 with st.form("centrality_form"):
@@ -40,15 +77,23 @@ with st.form("centrality_form"):
 if submitted:
     with st.spinner("ネットワークを取得中..."):
         try:
-            G = ox.graph_from_place(place, network_type=network_type)
-            G_proj = ox.project_graph(G)
+            with perf.stage("acquire"):
+                G = graph_from_place(place, network_type=network_type)
+            with perf.stage("project"):
+                G_proj = preload.lookup(
+                    "graph_proj",
+                    place,
+                    network_type,
+                    compute=lambda: projection.project_graph(G),
+                )
 
             # --------------------
             # 基本統計量の出力
             # --------------------
             if analyze_stats:
                 st.subheader("📈 基本統計量")
-                stats = ox.basic_stats(G)  # ✅ clean_intersects 引数は削除
+                with perf.stage("analyze.stats"):
+                    stats = ox.basic_stats(G)  # ✅ clean_intersects 引数は削除
                 for k, v in stats.items():
                     st.markdown(f"- **{k}**: {v}")
 
@@ -61,63 +106,49 @@ if submitted:
                 # -----------------------
                 # Closeness中心性
                 # -----------------------
-                closeness = compute_closeness(G_proj)
+                with perf.stage("analyze.closeness"):
+                    closeness = compute_closeness(G_proj, place, network_type)
                 st.markdown("#### 📍 近接中心性（Closeness Centrality）")
 
-                nc_close = [closeness[node] for node in G_proj.nodes()]
-                cmap = cm.get_cmap("viridis")
-                norm = colors.Normalize(vmin=min(nc_close), vmax=max(nc_close))
-
-                fig1, ax1 = plt.subplots(figsize=(8, 8))
-                ox.plot_graph(
-                    G_proj,
-                    ax=ax1,
-                    show=False,
-                    close=False,
-                    edge_color="lightgray",
-                    edge_linewidth=0.5,
-                    node_size=0,
-                )
-                x = [G_proj.nodes[n]["x"] for n in G_proj.nodes()]
-                y = [G_proj.nodes[n]["y"] for n in G_proj.nodes()]
-                sc = ax1.scatter(x, y, c=nc_close, cmap=cmap, norm=norm, s=10, zorder=3)
-                fig1.colorbar(sc, ax=ax1, shrink=0.7).set_label("Closeness Centrality")
-                st.pyplot(fig1)
+                with perf.stage("render"):
+
+                    def draw():
+                        return plot_centrality(
+                            G_proj, closeness, "Closeness Centrality"
+                        )
+
+                    render.show_figure(draw, G_proj, closeness)
 
                 # -----------------------
                 # Betweenness中心性（ノード数が多い場合は近似）
                 # -----------------------
                 st.markdown("#### 📍 媒介中心性（Betweenness Centrality）")
-                use_approx = G_proj.number_of_nodes() > 300  # 任意の閾値
-                if use_approx:
+                k = analytics.betweenness_samples(G_proj)
+                if k is not None:
                     st.info(
-                        "ノード数が多いため、betweennessは近似（k=100）で計算します。"
+                        f"ノード数が多いため、betweennessは近似（k={k}）で計算します。"
                     )
                 else:
                     st.info("正確なbetweennessを計算します。")
 
-                betweenness = compute_betweenness(G_proj, use_approximation=use_approx)
-                nc_btw = [betweenness[node] for node in G_proj.nodes()]
-                norm = colors.Normalize(vmin=min(nc_btw), vmax=max(nc_btw))
-
-                fig2, ax2 = plt.subplots(figsize=(8, 8))
-                ox.plot_graph(
-                    G_proj,
-                    ax=ax2,
-                    show=False,
-                    close=False,
-                    edge_color="lightgray",
-                    edge_linewidth=0.5,
-                    node_size=0,
-                )
-                sc = ax2.scatter(x, y, c=nc_btw, cmap=cmap, norm=norm, s=10, zorder=3)
-                fig2.colorbar(sc, ax=ax2, shrink=0.7).set_label(
-                    "Betweenness Centrality"
-                )
-                st.pyplot(fig2)
+                with perf.stage("analyze.betweenness"):
+                    betweenness = compute_betweenness(G_proj, place, network_type)
+                with perf.stage("render"):
+
+                    def draw():
+                        return plot_centrality(
+                            G_proj, betweenness, "Betweenness Centrality"
+                        )
+
+                    render.show_figure(draw, G_proj, betweenness)
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
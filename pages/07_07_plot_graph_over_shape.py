@@ -4,8 +4,15 @@ import streamlit as st
 import osmnx as ox
 import matplotlib.pyplot as plt
 
+from gallery import perf
+from gallery import projection
+from gallery import raster
+from gallery import render
+from gallery.geocode import geocode_to_gdf
+
 st.set_page_config(page_title="07 - Plot Graph Over Shape", layout="wide")
 st.title("🗺️ Plot Street Network Over a Shape")
+perf.start_trace("07")
 
 st.markdown("### 📍 地名を指定して、ポリゴンとネットワークを重ねて描画")
 
@@ -18,37 +25,51 @@ with st.form("graph_over_shape_form"):
 if submitted:
     with st.spinner("ネットワークとポリゴンを取得中..."):
         try:
-            # ポリゴン取得
-            gdf = ox.geocode_to_gdf(place)
-            polygon = gdf.loc[0, "geometry"]
+            with perf.stage("acquire"):
+                # ポリゴン取得
+                gdf = geocode_to_gdf(place)
+                polygon = gdf.loc[0, "geometry"]
 
-            # ネットワーク取得
-            G = ox.graph_from_polygon(polygon, network_type=network_type)
+                # ネットワーク取得
+                G = ox.graph_from_polygon(polygon, network_type=network_type)
 
             # 投影（必要に応じて）
             if use_projection:
-                G = ox.project_graph(G)
-                gdf = gdf.to_crs(G.graph["crs"])  # ✅ project_gdfの代替
+                with perf.stage("project"):
+                    G = projection.project_graph(G)
+                    gdf = gdf.to_crs(G.graph["crs"])  # ✅ project_gdfの代替
 
             # 描画
-            fig, ax = plt.subplots(figsize=(8, 8))
-            ox.plot_graph(
-                G,
-                ax=ax,
-                bgcolor="white",
-                show=False,
-                close=False,
-                edge_color="black",
-                node_size=0,
-                edge_linewidth=0.8,
-            )
-            gdf.plot(ax=ax, facecolor="none", edgecolor="red", linewidth=2)
-            ax.set_title(f"{place} - {network_type} network with boundary", fontsize=12)
-            st.pyplot(fig)
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    raster.plot_graph(
+                        G,
+                        ax=ax,
+                        bgcolor="white",
+                        show=False,
+                        close=False,
+                        edge_color="black",
+                        node_size=0,
+                        edge_linewidth=0.8,
+                    )
+                    gdf.plot(ax=ax, facecolor="none", edgecolor="red", linewidth=2)
+                    ax.set_title(
+                        f"{place} - {network_type} network with boundary", fontsize=12
+                    )
+                    return fig
+
+                render.show_figure(draw, G, gdf, place=place, network_type=network_type)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
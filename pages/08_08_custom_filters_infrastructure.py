@@ -3,8 +3,13 @@
 import streamlit as st
 import osmnx as ox
 
+from gallery import perf
+from gallery import render
+from gallery.acquire import graph_from_place
+
 st.set_page_config(page_title="08 - Custom Filters for Infrastructure", layout="wide")
 st.title("🏗️ Custom Filters for Infrastructure")
+perf.start_trace("08")
 
 st.markdown("### 📍 地名とOSMカスタムフィルターを指定して、インフラ構造を抽出・可視化")
 
@@ -26,22 +31,41 @@ if submitted:
     with st.spinner("カスタムフィルターでネットワークを取得中..."):
         try:
             nt = network_type if network_type != "None (custom only)" else None
-            G = ox.graph_from_place(place, network_type=nt, custom_filter=custom_filter)
-
-            fig, ax = ox.plot_graph(
-                G,
-                node_size=10 if show_nodes else 0,
-                edge_color=edge_color,
-                edge_linewidth=edge_width,
-                bgcolor="white",
-                show=False,
-                close=False,
-            )
-            st.pyplot(fig)
+            with perf.stage("acquire"):
+                G = graph_from_place(
+                    place, network_type=nt, custom_filter=custom_filter
+                )
+
+            with perf.stage("render"):
+
+                def draw():
+                    fig, _ = ox.plot_graph(
+                        G,
+                        node_size=10 if show_nodes else 0,
+                        edge_color=edge_color,
+                        edge_linewidth=edge_width,
+                        bgcolor="white",
+                        show=False,
+                        close=False,
+                    )
+                    return fig
+
+                render.show_figure(
+                    draw,
+                    G,
+                    show_nodes=show_nodes,
+                    edge_color=edge_color,
+                    edge_width=edge_width,
+                )
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
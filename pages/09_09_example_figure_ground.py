@@ -4,8 +4,18 @@ import streamlit as st
 import osmnx as ox
 import matplotlib.pyplot as plt
 
+from gallery import perf
+from gallery import render
+from gallery.acquire import (
+    features_from_place,
+    graph_and_features_from_place,
+    graph_from_place,
+)
+from gallery.cache import cache_key, get_store
+
 st.set_page_config(page_title="09 - Figure-Ground Diagram", layout="wide")
 st.title("🏙️ Figure-Ground Diagram of Urban Form")
+perf.start_trace("09")
 
 st.markdown("### 📍 場所とビジュアル設定を指定して、建物・道路・交差点を可視化")
 
@@ -24,34 +34,84 @@ with st.form("figure_ground_form"):
 
     submitted = st.form_submit_button("描画")
 
+# 取得済みのデータはセッションストアに保持し、色などの変更では再取得しない
+store = get_store()
+buildings_key = cache_key("buildings", place)
+graph_key = cache_key("graph", place, network_type)
 if submitted:
+    st.session_state["figure_ground_shown"] = True
+
+if st.session_state.get("figure_ground_shown"):
     with st.spinner("データ取得中..."):
         try:
-            # 建物ポリゴンの取得
-            tags = {"building": True}
-            buildings = ox.features_from_place(place, tags=tags)
-
-            # 道路ネットワークの取得
-            G = ox.graph_from_place(place, network_type=network_type)
-            nodes, edges = ox.graph_to_gdfs(G)
-
-            # 描画
-            fig, ax = plt.subplots(figsize=(8, 8))
-            edges.plot(ax=ax, linewidth=0.5, color=road_color, zorder=1)
-            buildings.plot(ax=ax, facecolor=building_color, edgecolor="none", zorder=2)
-
-            if show_nodes:
-                nodes.plot(ax=ax, color=node_color, markersize=node_size, zorder=3)
-
-            ax.set_axis_off()
-            plt.tight_layout()
-
-            st.pyplot(fig)
+            # 建物ポリゴンと道路ネットワークの取得
+            # 両方とも未取得なら、ジオコーディングを1回にまとめて並行取得する
+            # （ストアは後の登録で古い値を破棄しうるので、取得した値は変数で持つ）
+            with perf.stage("acquire"):
+                tags = {"building": True}
+                G = store.get(graph_key)
+                buildings = store.get(buildings_key)
+                if G is None and buildings is None:
+                    G, buildings = graph_and_features_from_place(
+                        place, network_type, tags
+                    )
+                    store.put(graph_key, G)
+                    store.put(buildings_key, buildings)
+                elif buildings is None:
+                    buildings = store.put(
+                        buildings_key, features_from_place(place, tags=tags)
+                    )
+                elif G is None:
+                    G = store.put(
+                        graph_key, graph_from_place(place, network_type=network_type)
+                    )
+
+            gdfs_key = cache_key("gdfs", graph_key)
+            with perf.stage("analyze.graph_to_gdfs"):
+                gdfs = store.get(gdfs_key)
+                if gdfs is None:
+                    gdfs = store.put(gdfs_key, ox.graph_to_gdfs(G))
+            nodes, edges = gdfs
+
+            # 描画（データと見た目の設定ごとに描画結果を保持）
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    edges.plot(ax=ax, linewidth=0.5, color=road_color, zorder=1)
+                    buildings.plot(
+                        ax=ax, facecolor=building_color, edgecolor="none", zorder=2
+                    )
+
+                    if show_nodes:
+                        nodes.plot(
+                            ax=ax, color=node_color, markersize=node_size, zorder=3
+                        )
+
+                    ax.set_axis_off()
+                    plt.tight_layout()
+                    return fig
+
+                render.show_figure(
+                    draw,
+                    G,
+                    buildings,
+                    building_color=building_color,
+                    road_color=road_color,
+                    show_nodes=show_nodes,
+                    node_color=node_color,
+                    node_size=node_size,
+                )
 
         except Exception as e:
             st.error(f"描画中にエラーが発生しました: {e}")
 
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
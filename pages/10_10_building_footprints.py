@@ -4,8 +4,13 @@ import streamlit as st
 import osmnx as ox
 import matplotlib.pyplot as plt
 
+from gallery import perf
+from gallery import render
+from gallery.acquire import features_from_place
+
 st.set_page_config(page_title="10 - Building Footprints", layout="wide")
 st.title("🏢 Building Footprints from OpenStreetMap")
+perf.start_trace("10")
 
 st.markdown("### 📍 場所を指定して、建物ポリゴンを取得・可視化・面積分析")
 
@@ -19,7 +24,8 @@ if submitted:
         try:
             # 建物ポリゴンの取得
             tags = {"building": True}
-            gdf = ox.features_from_place(place, tags=tags)
+            with perf.stage("acquire"):
+                gdf = features_from_place(place, tags=tags)
 
             if gdf.empty:
                 st.warning(
@@ -27,33 +33,45 @@ if submitted:
                 )
             else:
                 # 投影（面積計算のため）
-                gdf_proj = gdf.to_crs(ox.settings.default_crs)
+                with perf.stage("project"):
+                    gdf_proj = gdf.to_crs(ox.settings.default_crs)
 
                 # 面積の計算
                 if show_area:
-                    gdf_proj["area_m2"] = gdf_proj.geometry.area
+                    with perf.stage("analyze.area"):
+                        gdf_proj["area_m2"] = gdf_proj.geometry.area
 
                 # 描画
-                fig, ax = plt.subplots(figsize=(8, 8))
-                if show_area:
-                    gdf_proj.plot(
-                        ax=ax,
-                        column="area_m2",
-                        cmap="OrRd",
-                        legend=True,
-                        legend_kwds={"label": "建物面積 (m²)"},
-                    )
-                else:
-                    gdf.plot(ax=ax, facecolor="black", edgecolor="none")
-
-                ax.set_title(f"{place} - 建物フットプリント", fontsize=12)
-                ax.set_axis_off()
-                plt.tight_layout()
-                st.pyplot(fig)
+                with perf.stage("render"):
+
+                    def draw():
+                        fig, ax = plt.subplots(figsize=(8, 8))
+                        if show_area:
+                            gdf_proj.plot(
+                                ax=ax,
+                                column="area_m2",
+                                cmap="OrRd",
+                                legend=True,
+                                legend_kwds={"label": "建物面積 (m²)"},
+                            )
+                        else:
+                            gdf.plot(ax=ax, facecolor="black", edgecolor="none")
+
+                        ax.set_title(f"{place} - 建物フットプリント", fontsize=12)
+                        ax.set_axis_off()
+                        plt.tight_layout()
+                        return fig
+
+                    render.show_figure(draw, gdf_proj, place=place, show_area=show_area)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -2,11 +2,43 @@
 
 import streamlit as st
 import osmnx as ox
-import folium
-from streamlit_folium import st_folium
+
+from gallery import payload
+from gallery import perf
+from gallery import preload
+from gallery import tiles
+from gallery.acquire import features_layer, graph_layer, iter_layers
+from gallery.startup import lazy_import
+
+# 地図ライブラリはフォーム送信後にだけ使うため、読み込みを遅らせる
+folium = lazy_import("folium")
+folium_plugins = lazy_import("folium.plugins")
+streamlit_folium = lazy_import("streamlit_folium")
+
+# GeoJSON / TopoJSON で埋め込む図形は、このズームまで拡大しても見分けられる精度に簡略化する
+EMBED_ZOOM = 17
+
+# GeoJSON / TopoJSON で埋め込む図形の上限（範囲全体から重要なものを選ぶ）
+MAX_EDGES = 2000
+MAX_BUILDINGS = 1000
+
+
+def embed_layer(m, gdf, name, label, columns, topojson):
+    """簡略化・属性の削減をしたデータを地図に埋め込み、そのバイト数を返す。"""
+    with perf.stage("analyze.payload", layer=name):
+        data = payload.optimize(
+            gdf, EMBED_ZOOM, columns=columns, topojson=topojson, name=name
+        )
+    if topojson:
+        folium.TopoJson(data, f"objects.{name}", name=label).add_to(m)
+    else:
+        folium.GeoJson(data, name=label).add_to(m)
+    return payload.payload_bytes(data)
+
 
 st.set_page_config(page_title="11 - Interactive Web Mapping", layout="wide")
 st.title("🗺️ Interactive Web Mapping with OSMnx + Folium")
+perf.start_trace("11")
 
 st.markdown(
     "### 📍 場所を指定して、道路ネットワークと建物をインタラクティブマップに表示"
@@ -16,48 +48,132 @@ with st.form("web_map_form"):
     place = st.text_input("場所（例: 東京都千代田区）", "東京都千代田区")
     include_buildings = st.checkbox("建物ポリゴンも表示する", value=True)
     network_type = st.selectbox("ネットワークの種類", ["drive", "walk", "bike", "all"])
+    mode = st.radio(
+        "表示方式",
+        ["ベクタータイル", "GeoJSON", "TopoJSON"],
+        horizontal=True,
+        help=(
+            "ベクタータイルは表示範囲のデータだけを読み込むため、都市全体でも軽く表示できます。"
+            "GeoJSON / TopoJSON はデータを簡略化してページに埋め込みます"
+        ),
+    )
     submitted = st.form_submit_button("マップを生成")
 
 if submitted:
     with st.spinner("データを取得中..."):
         try:
-            # ネットワーク取得
-            G = ox.graph_from_place(place, network_type=network_type)
-            nodes, edges = ox.graph_to_gdfs(G)
-
-            # データ量制限（最大2000本）
-            if len(edges) > 2000:
-                edges = edges[edges["highway"].notna()].iloc[:2000]
-
-            # 中心座標を取得
-            center_lat = nodes.geometry.y.mean()
-            center_lon = nodes.geometry.x.mean()
+            # ネットワークと建物（任意）を並行して取得
+            with perf.stage("acquire"):
+                layers = {"network": graph_layer(network_type)}
+                if include_buildings:
+                    layers["buildings"] = features_layer({"building": True})
+                results = {}
+                for name, value, error in iter_layers(place, layers):
+                    if error is not None:
+                        raise error
+                    results[name] = value
+
+            G = results["network"]
+            with perf.stage("analyze"):
+                nodes, edges = ox.graph_to_gdfs(G)
+
+                # ページに埋め込む場合は、範囲全体から道路種別・長さ・中心性
+                # （事前読み込み済みの場合）の重要なものを選んでデータ量を制限
+                total_edges = len(edges)
+                if mode != "ベクタータイル":
+                    centrality = preload.lookup(
+                        "betweenness", place, network_type, wait=False
+                    )
+                    edges = payload.representative(
+                        edges, MAX_EDGES, payload.edge_importance(edges, centrality)
+                    )
+
+                # 中心座標を取得
+                center_lat = nodes.geometry.y.mean()
+                center_lon = nodes.geometry.x.mean()
 
             # foliumマップ作成
-            m = folium.Map(
-                location=[center_lat, center_lon], zoom_start=14, control_scale=True
-            )
-
-            # 道路エッジを追加（属性を表示せず軽量化）
-            folium.GeoJson(edges, name="Network").add_to(m)
-
-            # 建物の取得と追加（任意）
-            if include_buildings:
-                tags = {"building": True}
-                buildings = ox.features_from_place(place, tags=tags)
-                if not buildings.empty:
-                    buildings = buildings.iloc[:1000]  # 最大1000件に制限
-                    folium.GeoJson(buildings, name="Buildings").add_to(m)
-
-            folium.LayerControl().add_to(m)
+            with perf.stage("render.folium"):
+                m = folium.Map(
+                    location=[center_lat, center_lon], zoom_start=14, control_scale=True
+                )
+
+                buildings = results.get("buildings")
+                if buildings is not None and buildings.empty:
+                    buildings = None
+
+                if mode == "ベクタータイル":
+                    # 表示範囲のタイルだけをローカルのタイルサーバーから読み込む
+                    tiles.serve()
+                    layer_id = tiles.publish(
+                        "network", edges, columns=["highway", "name"]
+                    )
+                    folium_plugins.VectorGridProtobuf(
+                        tiles.tile_url(layer_id),
+                        name="Network",
+                        options={
+                            "vectorTileLayerStyles": {
+                                "network": {"color": "#3388ff", "weight": 2}
+                            }
+                        },
+                    ).add_to(m)
+                    if buildings is not None:
+                        layer_id = tiles.publish(
+                            "buildings", buildings, columns=["building", "name"]
+                        )
+                        folium_plugins.VectorGridProtobuf(
+                            tiles.tile_url(layer_id),
+                            name="Buildings",
+                            options={
+                                "vectorTileLayerStyles": {
+                                    "buildings": {
+                                        "color": "#ff7800",
+                                        "weight": 1,
+                                        "fill": True,
+                                        "fillOpacity": 0.4,
+                                    }
+                                }
+                            },
+                        ).add_to(m)
+                else:
+                    # 道路エッジ・建物を、表示に使う属性だけに絞って埋め込む
+                    topojson = mode == "TopoJSON"
+                    nbytes = embed_layer(
+                        m, edges, "network", "Network", ["highway", "name"], topojson
+                    )
+                    if buildings is not None:
+                        # 面積の大きいものを優先して最大1000件
+                        buildings = payload.representative(
+                            buildings, MAX_BUILDINGS, payload.area_importance
+                        )
+                        nbytes += embed_layer(
+                            m,
+                            buildings,
+                            "buildings",
+                            "Buildings",
+                            ["building", "name"],
+                            topojson,
+                        )
+                    st.caption(
+                        f"道路 {len(edges)} / {total_edges} 本を表示"
+                        f"（埋め込みデータ: {nbytes / 1024**2:.2f} MB）"
+                    )
+
+                folium.LayerControl().add_to(m)
 
             # 表示
             st.markdown("#### 🌍 インタラクティブマップ")
-            st_data = st_folium(m, width=800, height=600)
+            with perf.stage("render"):
+                st_data = streamlit_folium.st_folium(m, width=800, height=600)
 
         except Exception as e:
             st.error(f"マップ生成に失敗しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -141,6 +257,21 @@ m.save("map.html")
 
 ---
 
+## 🧩 7. ベクタータイルで大きなデータを表示（このページの既定）
+
+```python
+from folium.plugins import VectorGridProtobuf
+
+VectorGridProtobuf("http://localhost:8765/tiles/<レイヤーID>/{z}/{x}/{y}.pbf").add_to(m)
+```
+
+- `folium.GeoJson` はデータ全体をHTMLに埋め込むため、都市全体の道路・建物では重くなる
+- ベクタータイルでは、表示中の範囲・ズームのタイルだけをブラウザが読み込む
+- このページでは、アプリ内のタイルサーバーが空間インデックスから図形を切り出して配信する
+- GeoJSON / TopoJSON で埋め込む場合も、ズームに合わせた簡略化・座標の丸め・属性の削減でデータを小さくしている
+
+---
+
 ## ✅ まとめ
 
 | ステップ | 使用関数 | 内容 |
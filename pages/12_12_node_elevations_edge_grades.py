@@ -3,10 +3,18 @@ import osmnx as ox
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
-import contextily as ctx
+
+from gallery import perf
+from gallery import render
+from gallery.acquire import graph_from_place
+from gallery.startup import lazy_import
+
+# 背景地図は描画時にだけ使うため、読み込みを遅らせる
+ctx = lazy_import("contextily")
 
 st.set_page_config(page_title="12 - Elevation and Grade", layout="wide")
 st.title("🏔️ Node Elevations and Edge Grades")
+perf.start_trace("12")
 
 st.markdown("### 📍 場所を指定して、標高と道路の勾配を可視化（カラースキーマ凡例付き）")
 
@@ -20,17 +28,20 @@ if submitted:
     with st.spinner("ネットワークと標高データを取得中..."):
         try:
             # 1. ネットワーク取得
-            G = ox.graph_from_place(place, network_type=network_type)
+            with perf.stage("acquire"):
+                G = graph_from_place(place, network_type=network_type)
 
             # 2. 標高データ付加
             if not api_key:
                 st.error("Google Elevation APIキーが必要です。")
                 st.stop()
 
-            G = ox.elevation.add_node_elevations_google(G, api_key=api_key)
+            with perf.stage("fetch.elevation"):
+                G = ox.elevation.add_node_elevations_google(G, api_key=api_key)
 
             # 3. 勾配の計算
-            G = ox.elevation.add_edge_grades(G)
+            with perf.stage("analyze.grades"):
+                G = ox.elevation.add_edge_grades(G)
 
             # 4. 勾配リスト抽出
             grades = [
@@ -45,46 +56,60 @@ if submitted:
             edge_colors = [cmap(norm(grade)) for grade in grades]
 
             # 6. 描画（カラーバー付き）
-            fig, ax = plt.subplots(figsize=(10, 8))
-            ox.plot_graph(
-                G,
-                ax=ax,
-                edge_color=edge_colors,
-                edge_linewidth=3,
-                node_size=0,
-                bgcolor="white",
-                show=False,
-                close=False,
-            )
-            ctx.add_basemap(
-                ax,
-                crs=G.graph["crs"],
-                source=ctx.providers.OpenStreetMap.Mapnik,
-                alpha=0.5,
-            )
-
-            # カラーバー（凡例）を追加
-            sm = cm.ScalarMappable(cmap=cmap, norm=norm)
-            sm.set_array([])
-            cbar = fig.colorbar(sm, ax=ax, shrink=0.6,
-                                label="Edge Grade (slope)")
-            cbar.ax.tick_params(labelsize=8)
-
-            st.pyplot(fig)
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(10, 8))
+                    ox.plot_graph(
+                        G,
+                        ax=ax,
+                        edge_color=edge_colors,
+                        edge_linewidth=3,
+                        node_size=0,
+                        bgcolor="white",
+                        show=False,
+                        close=False,
+                    )
+                    ctx.add_basemap(
+                        ax,
+                        crs=G.graph["crs"],
+                        source=ctx.providers.OpenStreetMap.Mapnik,
+                        alpha=0.5,
+                    )
+
+                    # カラーバー（凡例）を追加
+                    sm = cm.ScalarMappable(cmap=cmap, norm=norm)
+                    sm.set_array([])
+                    cbar = fig.colorbar(sm, ax=ax, shrink=0.6,
+                                        label="Edge Grade (slope)")
+                    cbar.ax.tick_params(labelsize=8)
+                    return fig
+
+                render.show_figure(draw, G, grades)
 
             # 7. 勾配ヒストグラム
             st.markdown("#### 📊 勾配の分布（ヒストグラム）")
-            fig2, ax2 = plt.subplots()
-            ax2.hist(grades, bins=30, color="purple", edgecolor="black")
-            ax2.set_title("Edge Grade Distribution")
-            ax2.set_xlabel("Grade (slope)")
-            ax2.set_ylabel("Frequency")
-            st.pyplot(fig2)
+            with perf.stage("render"):
+
+                def draw():
+                    fig2, ax2 = plt.subplots()
+                    ax2.hist(grades, bins=30, color="purple", edgecolor="black")
+                    ax2.set_title("Edge Grade Distribution")
+                    ax2.set_xlabel("Grade (slope)")
+                    ax2.set_ylabel("Frequency")
+                    return fig2
+
+                render.show_figure(draw, grades)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -2,13 +2,21 @@
 
 import streamlit as st
 import osmnx as ox
-import networkx as nx
 import geopandas as gpd
 import matplotlib.pyplot as plt
-from shapely.geometry import Point
+
+from gallery import perf
+from gallery import projection
+from gallery import render
+from gallery import analytics
+from gallery import spatial
+from gallery.settings import configure_osmnx
+
+configure_osmnx()
 
 st.set_page_config(page_title="13 - Isochrones", layout="wide")
 st.title("🕒 Isochrones by Travel Time")
+perf.start_trace("13")
 
 st.markdown(
     "指定地点から、歩行ネットワークに基づくアイソクロン（等時間圏）を描画します。"
@@ -28,59 +36,65 @@ if submitted:
     with st.spinner("ネットワークとアイソクロンを計算中..."):
         try:
             # ネットワーク取得
-            G = ox.graph_from_point((lat, lon), dist=distance, network_type="walk")
-            gdf_nodes = ox.convert.graph_to_gdfs(G, edges=False)
-            x, y = gdf_nodes["geometry"].union_all().centroid.xy
-            # 中心ノード
-            center_node = ox.distance.nearest_nodes(G, x[0], y[0])
-            G = ox.project_graph(G)
-
-            # 時間属性を追加（分単位）
-            meters_per_minute = travel_speed * 1000 / 60
-            for _, _, _, data in G.edges(keys=True, data=True):
-                data["time"] = data["length"] / meters_per_minute
-
-            # カラー設定
-            trip_times_sorted = sorted(trip_times, reverse=True)
-            iso_colors = ox.plot.get_colors(
-                n=len(trip_times_sorted), cmap="plasma", start=0.3
-            )
-
-            # ポリゴン生成
-            isochrone_polys = []
-            for trip_time in trip_times_sorted:
-                subgraph = nx.ego_graph(
-                    G, center_node, radius=trip_time, distance="time"
+            with perf.stage("acquire"):
+                G = ox.graph_from_point((lat, lon), dist=distance, network_type="walk")
+            with perf.stage("analyze.center"):
+                gdf_nodes = ox.convert.graph_to_gdfs(G, edges=False)
+                x, y = gdf_nodes["geometry"].union_all().centroid.xy
+                # 中心ノード
+                center_node = spatial.index_for(G).nearest_nodes(x[0], y[0])
+            with perf.stage("project"):
+                G = projection.project_graph(G)
+
+            with perf.stage("analyze.isochrones"):
+                # カラー設定
+                trip_times_sorted = sorted(trip_times, reverse=True)
+                iso_colors = ox.plot.get_colors(
+                    n=len(trip_times_sorted), cmap="plasma", start=0.3
                 )
-                node_points = [
-                    Point((data["x"], data["y"]))
-                    for node, data in subgraph.nodes(data=True)
-                ]
-                if node_points:
-                    poly = gpd.GeoSeries(node_points).unary_union.convex_hull
-                    isochrone_polys.append(poly)
 
-            # 可視化
-            fig, ax = plt.subplots(figsize=(8, 8))
-
-            for i, poly in enumerate(isochrone_polys):
-                gpd.GeoSeries(poly).plot(
-                    ax=ax,
-                    color=iso_colors[i],
-                    alpha=0.6,
-                    edgecolor="none",
-                    label=f"{trip_times_sorted[i]}分",
+                # ポリゴン生成（時間属性は分単位）
+                meters_per_minute = travel_speed * 1000 / 60
+                isochrone_polys = analytics.isochrone_polygons(
+                    G, center_node, trip_times_sorted, meters_per_minute
                 )
-            ox.plot_graph(
-                G, ax=ax, node_size=0, edge_color="gray", show=False, close=False
-            )
-            ax.set_title("Isochrones from center")
-            ax.legend()
-            st.pyplot(fig)
+
+            # 可視化
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(8, 8))
+
+                    for i, (trip_time, poly) in enumerate(isochrone_polys):
+                        gpd.GeoSeries(poly).plot(
+                            ax=ax,
+                            color=iso_colors[i],
+                            alpha=0.6,
+                            edgecolor="none",
+                            label=f"{trip_time}分",
+                        )
+                    ox.plot_graph(
+                        G,
+                        ax=ax,
+                        node_size=0,
+                        edge_color="gray",
+                        show=False,
+                        close=False,
+                    )
+                    ax.set_title("Isochrones from center")
+                    ax.legend()
+                    return fig
+
+                render.show_figure(draw, G, isochrone_polys)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
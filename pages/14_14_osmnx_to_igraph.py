@@ -1,12 +1,15 @@
 # 📄 ファイル名: pages/14-osmnx-to-igraph.py
 
 import streamlit as st
-import osmnx as ox
-import igraph as ig
 import pandas as pd
 
+from gallery import perf
+from gallery import analytics
+from gallery.acquire import graph_from_place
+
 st.set_page_config(page_title="14 - Convert to iGraph", layout="wide")
 st.title("🔁 Convert OSMnx Network to iGraph")
+perf.start_trace("14")
 
 st.markdown(
     "OSMnxで取得した道路ネットワークをNetworkX形式からiGraph形式に変換し、基本的な分析を行います。"
@@ -22,19 +25,14 @@ if submitted:
     with st.spinner("ネットワークを取得中..."):
         try:
             # OSMnxでネットワーク取得（デフォルトで簡素化済み）
-            G_nx = ox.graph_from_place(place, network_type=network_type)
+            with perf.stage("acquire"):
+                G_nx = graph_from_place(place, network_type=network_type)
             if not directed:
                 G_nx = G_nx.to_undirected()
 
             # igraphへの変換
-            G_ig = ig.Graph(directed=directed)
-            node_mapping = {}  # NetworkXノードID → igraphノードID
-            for i, node in enumerate(G_nx.nodes()):
-                G_ig.add_vertex(name=str(node))
-                node_mapping[node] = i
-
-            for u, v in G_nx.edges():
-                G_ig.add_edge(node_mapping[u], node_mapping[v])
+            with perf.stage("analyze.to_igraph"):
+                G_ig, node_mapping = analytics.to_igraph(G_nx, directed=directed)
 
             # 基本統計表示
             st.subheader("📊 基本統計")
@@ -43,11 +41,12 @@ if submitted:
             st.markdown(f"- 有向グラフ: `{G_ig.is_directed()}`")
 
             # Degree Centralityを計算
-            degrees = G_ig.degree()
-            top_k = 10
-            top_nodes = sorted(enumerate(degrees), key=lambda x: x[1], reverse=True)[
-                :top_k
-            ]
+            with perf.stage("analyze.degree"):
+                degrees = G_ig.degree()
+                top_k = 10
+                top_nodes = sorted(
+                    enumerate(degrees), key=lambda x: x[1], reverse=True
+                )[:top_k]
             df_top = pd.DataFrame(
                 {
                     "igraph_node_id": [n for n, _ in top_nodes],
@@ -60,6 +59,11 @@ if submitted:
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
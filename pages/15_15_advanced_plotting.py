@@ -4,8 +4,16 @@ import streamlit as st
 import osmnx as ox
 import random
 
+from gallery import perf
+from gallery import raster
+from gallery import render
+from gallery import preload
+from gallery import projection
+from gallery.acquire import graph_from_place
+
 st.set_page_config(page_title="15 - Advanced Plotting", layout="wide")
 st.title("🎨 Advanced Plotting with OSMnx")
+perf.start_trace("15")
 
 st.markdown(
     "高度な描画オプションを活用して、OSMnxで美しい道路ネットワークを可視化します。"
@@ -27,46 +35,70 @@ with st.form("plotting_form"):
 if submitted:
     with st.spinner("ネットワークを取得中..."):
         try:
-            G = ox.graph_from_place(place, network_type=network_type)
-            G = ox.project_graph(G)
+            with perf.stage("acquire"):
+                G = graph_from_place(place, network_type=network_type)
+            with perf.stage("project"):
+                G = preload.lookup(
+                    "graph_proj",
+                    place,
+                    network_type,
+                    compute=lambda: projection.project_graph(G),
+                )
 
             # エッジに距離属性を色分け
-            edge_colors = ox.plot.get_edge_colors_by_attr(
-                G, attr="length", cmap=edge_cmap
-            )
-
-            fig, ax = ox.plot_graph(
-                G,
-                bgcolor=bgcolor,
-                node_color=node_color,
-                node_size=node_size,
-                edge_color=edge_colors,
-                edge_linewidth=edge_linewidth,
-                show=False,
-                close=False,
-            )
+            with perf.stage("analyze.edge_colors"):
+                edge_colors = ox.plot.get_edge_colors_by_attr(
+                    G, attr="length", cmap=edge_cmap
+                )
 
+            # ランダムな2点間の経路（描画結果のキャッシュキーに含める）
+            route = None
             if show_route:
                 nodes = list(G.nodes)
                 orig, dest = random.sample(nodes, 2)
                 route = ox.shortest_path(G, orig, dest, weight="length")
-                fig, ax = ox.plot_graph_route(
+
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = raster.plot_graph(
+                        G,
+                        bgcolor=bgcolor,
+                        node_color=node_color,
+                        node_size=node_size,
+                        edge_color=edge_colors,
+                        edge_linewidth=edge_linewidth,
+                        show=False,
+                        close=False,
+                    )
+
+                    # 描画済みのグラフに経路だけを重ねる（ox.plot_graph_route は
+                    # 図全体を描き直すため使わない）
+                    if route is not None:
+                        route_edges = ox.routing.route_to_gdf(G, route)
+                        for line in route_edges.geometry:
+                            ax.plot(*line.xy, color="red", linewidth=4)
+                    return fig
+
+                render.show_figure(
+                    draw,
                     G,
                     route,
-                    route_color="red",
-                    route_linewidth=4,
-                    ax=ax,
-                    node_size=0,
-                    edge_color="lightgray",
-                    show=False,
-                    close=False,
+                    edge_cmap=edge_cmap,
+                    bgcolor=bgcolor,
+                    node_color=node_color,
+                    node_size=node_size,
+                    edge_linewidth=edge_linewidth,
                 )
 
-            st.pyplot(fig)
-
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -1,25 +1,21 @@
 import streamlit as st
 import osmnx as ox
 import matplotlib.pyplot as plt
-from matplotlib import rcParams
-import matplotlib.font_manager as fm
+
+from gallery import perf
+from gallery import render
+from gallery.acquire import features_from_place
+from gallery.startup import use_japanese_font
 
 # --------------------
 # ✅ 日本語フォント設定（Noto Sans CJK JPを使う）
 # --------------------
-# 利用可能なフォントから Noto Sans CJK JP を優先設定
-jp_font_candidates = [
-    f
-    for f in fm.findSystemFonts()
-    if "NotoSansCJK" in f or "NotoSansCJKjp" in f or "Noto Sans CJK JP" in f
-]
-if jp_font_candidates:
-    rcParams["font.family"] = fm.FontProperties(fname=jp_font_candidates[0]).get_name()
-else:
-    rcParams["font.family"] = "IPAexGothic"  # フォールバック（あれば）
+# 利用可能なフォントの探索はプロセスごとに一度だけ行う
+use_japanese_font()
 
 st.set_page_config(page_title="16 - Download OSM Features", layout="wide")
 st.title("📥 Download OSM Geospatial Features")
+perf.start_trace("16")
 
 st.markdown(
     "指定した地名またはジオメトリ範囲から、OpenStreetMapの地理空間フィーチャ（建物、公園、水路など）を取得して可視化します。"
@@ -41,22 +37,34 @@ if submitted:
             tags = {tag_key: True} if tag_value == "" else {tag_key: tag_value}
 
             # データ取得
-            gdf = ox.features_from_place(place, tags=tags)
+            with perf.stage("acquire"):
+                gdf = features_from_place(place, tags=tags)
 
             if gdf.empty:
                 st.warning("指定された条件に一致するデータが見つかりませんでした。")
             else:
                 # 投影
-                gdf_proj = gdf.to_crs(ox.settings.default_crs)
+                with perf.stage("project"):
+                    gdf_proj = gdf.to_crs(ox.settings.default_crs)
 
                 # 可視化
-                fig, ax = plt.subplots(figsize=(8, 8))
-                gdf_proj.plot(ax=ax, facecolor="cornflowerblue", edgecolor="black")
-                ax.set_title(
-                    f"OSMフィーチャ: {tag_key} = {tag_value or 'ANY'}", fontsize=12
-                )
-                ax.set_axis_off()
-                st.pyplot(fig)
+                with perf.stage("render"):
+
+                    def draw():
+                        fig, ax = plt.subplots(figsize=(8, 8))
+                        gdf_proj.plot(
+                            ax=ax, facecolor="cornflowerblue", edgecolor="black"
+                        )
+                        ax.set_title(
+                            f"OSMフィーチャ: {tag_key} = {tag_value or 'ANY'}",
+                            fontsize=12,
+                        )
+                        ax.set_axis_off()
+                        return fig
+
+                    render.show_figure(
+                        draw, gdf_proj, tag_key=tag_key, tag_value=tag_value
+                    )
 
                 # 属性データ表示
                 st.subheader("📋 属性テーブル（先頭10行）")
@@ -65,6 +73,11 @@ if submitted:
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
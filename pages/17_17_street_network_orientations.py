@@ -1,10 +1,16 @@
 import streamlit as st
-import osmnx as ox
 import matplotlib.pyplot as plt
 import numpy as np
 
+from gallery import perf
+from gallery import render
+from gallery import analytics
+from gallery import preload
+from gallery.acquire import graph_from_place
+
 st.set_page_config(page_title="17 - Street Orientation Histogram", layout="wide")
 st.title("🧭 Street Network Orientation Analysis")
+perf.start_trace("17")
 
 st.markdown(
     "指定した場所の道路ネットワークに基づいて、方位角（北からの角度）を分析し、都市構造のグリッド性や方向性を可視化します。"
@@ -20,29 +26,58 @@ if submitted:
     with st.spinner("ネットワークと道路方位の取得中..."):
         try:
             # ネットワーク取得
-            G = ox.graph_from_place(place, network_type=network_type)
-
-            # エッジに bearing（方位角）を追加
-            G = ox.bearing.add_edge_bearings(G)
-            # bearing属性を抽出
-            bearings = [
-                d["bearing"] for _, _, d in G.edges(data=True) if "bearing" in d
-            ]
-
-            # ヒストグラムの作成
-            fig, ax = plt.subplots(figsize=(8, 6))
-            ax.hist(
-                bearings, bins=bins, density=True, color="skyblue", edgecolor="black"
-            )
-            ax.set_title(f"Street Orientation Histogram: {place}")
-            ax.set_xlabel("方位角 (degrees from North)")
-            ax.set_ylabel("割合")
-            ax.set_xticks(np.arange(0, 361, 45))
-            st.pyplot(fig)
+            with perf.stage("acquire"):
+                G = graph_from_place(place, network_type=network_type)
+
+            # エッジの方位角と長さ（グラフには属性を追加しない）
+            with perf.stage("analyze.bearings"):
+                bearings, lengths = preload.lookup(
+                    "bearings",
+                    place,
+                    network_type,
+                    compute=lambda: analytics.edge_bearing_arrays(G),
+                )
+                # 長さで重み付けしたヒストグラムと方位エントロピー
+                counts, centers = analytics.bearing_histogram(bearings, lengths, bins)
+                entropy = analytics.orientation_entropy(counts)
+
+            # エッジがない、または長さがすべて 0 なら割合を求められない
+            total = counts.sum()
+            if total == 0:
+                st.warning("方位を求められる道路がありません")
+            else:
+                col1, col2 = st.columns(2)
+                col1.metric("方位エントロピー", f"{entropy:.3f}")
+                col2.metric("最大値（全方向に均等）", f"{np.log(bins):.3f}")
+
+                # ヒストグラムの作成
+                with perf.stage("render"):
+
+                    def draw():
+                        fig, ax = plt.subplots(figsize=(8, 6))
+                        ax.bar(
+                            centers,
+                            counts / total,
+                            width=360 / bins,
+                            color="skyblue",
+                            edgecolor="black",
+                        )
+                        ax.set_title(f"Street Orientation Histogram: {place}")
+                        ax.set_xlabel("方位角 (degrees from North)")
+                        ax.set_ylabel("割合（道路の長さで重み付け）")
+                        ax.set_xticks(np.arange(0, 361, 45))
+                        return fig
+
+                    render.show_figure(draw, counts, bins=bins, place=place)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
@@ -1,12 +1,21 @@
 import streamlit as st
-import osmnx as ox
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
 import numpy as np
-import contextily as ctx
+
+from gallery import perf
+from gallery import render
+from gallery import preload
+from gallery import projection
+from gallery import analytics
+from gallery.acquire import graph_from_place
+from gallery.startup import lazy_import
+
+# 背景地図は描画時にだけ使うため、読み込みを遅らせる
+ctx = lazy_import("contextily")
 
 st.set_page_config(page_title="18 - Network-Constrained Clustering", layout="wide")
 st.title("🧭 Network-Constrained Clustering")
+perf.start_trace("18")
 
 st.markdown(
     "指定した場所の道路ネットワークにおいて、ノードをネットワーク距離に基づいてクラスタリングします。"
@@ -22,52 +31,67 @@ if submitted:
     with st.spinner("ネットワークとクラスタを計算中..."):
         try:
             # ネットワーク取得
-            G = ox.graph_from_place(place, network_type=network_type)
-            G = ox.project_graph(G)
-
-            # ノード座標取得
-            nodes = list(G.nodes(data=True))
-            node_ids = [n for n, _ in nodes]
-            X = np.array([[data["x"], data["y"]] for _, data in nodes])
-
-            # KMeansクラスタリング（ユークリッド距離ベース）
-            kmeans = KMeans(n_clusters=n_clusters, random_state=0).fit(X)
-            labels = kmeans.labels_
-
-            # ノードにクラスタラベルを追加
-            for i, node_id in enumerate(node_ids):
-                G.nodes[node_id]["cluster"] = labels[i]
+            with perf.stage("acquire"):
+                G = graph_from_place(place, network_type=network_type)
+            with perf.stage("project"):
+                G = preload.lookup(
+                    "graph_proj",
+                    place,
+                    network_type,
+                    compute=lambda: projection.project_graph(G),
+                )
+
+            with perf.stage("analyze.kmeans"):
+                # KMeansクラスタリング（ユークリッド距離ベース）
+                labels = analytics.kmeans_labels(G, n_clusters)
+
+                # ノードにクラスタラベルを追加
+                node_ids = list(G.nodes)
+                for node_id, label in labels.items():
+                    G.nodes[node_id]["cluster"] = label
 
             # 可視化：クラスタごとに色分け
-            fig, ax = plt.subplots(figsize=(8, 8))
-            colors = plt.cm.tab10(np.linspace(0, 1, n_clusters))
-            for i in range(n_clusters):
-                cluster_nodes = [n for n in node_ids if G.nodes[n]["cluster"] == i]
-                x = [G.nodes[n]["x"] for n in cluster_nodes]
-                y = [G.nodes[n]["y"] for n in cluster_nodes]
-                ax.scatter(x, y, c=[colors[i]], label=f"Cluster {i}", s=20)
-
-            # エッジ描画
-            for u, v in G.edges():
-                x = [G.nodes[u]["x"], G.nodes[v]["x"]]
-                y = [G.nodes[u]["y"], G.nodes[v]["y"]]
-                ax.plot(x, y, color="lightgray", linewidth=0.5)
-
-            # 背景地図の追加
-            ctx.add_basemap(
-                ax,
-                crs=G.graph["crs"],
-                source=ctx.providers.OpenStreetMap.Mapnik,
-                alpha=0.5,
-            )
-            ax.set_title(f"Network-Constrained Clustering in {place}")
-            ax.set_axis_off()
-            ax.legend()
-            st.pyplot(fig)
+            with perf.stage("render"):
+
+                def draw():
+                    fig, ax = plt.subplots(figsize=(8, 8))
+                    colors = plt.cm.tab10(np.linspace(0, 1, n_clusters))
+                    for i in range(n_clusters):
+                        cluster_nodes = [
+                            n for n in node_ids if G.nodes[n]["cluster"] == i
+                        ]
+                        x = [G.nodes[n]["x"] for n in cluster_nodes]
+                        y = [G.nodes[n]["y"] for n in cluster_nodes]
+                        ax.scatter(x, y, c=[colors[i]], label=f"Cluster {i}", s=20)
+
+                    # エッジ描画
+                    for u, v in G.edges():
+                        x = [G.nodes[u]["x"], G.nodes[v]["x"]]
+                        y = [G.nodes[u]["y"], G.nodes[v]["y"]]
+                        ax.plot(x, y, color="lightgray", linewidth=0.5)
+
+                    # 背景地図の追加
+                    ctx.add_basemap(
+                        ax,
+                        crs=G.graph["crs"],
+                        source=ctx.providers.OpenStreetMap.Mapnik,
+                        alpha=0.5,
+                    )
+                    ax.set_title(f"Network-Constrained Clustering in {place}")
+                    ax.set_axis_off()
+                    ax.legend()
+                    return fig
+
+                render.show_figure(draw, G, labels, place=place)
 
         except Exception as e:
             st.error(f"エラーが発生しました: {e}")
 
+# --------------------
+# パフォーマンス計測結果
+# --------------------
+perf.perf_panel()
+
 # --------------------
 # 解説マークダウン
 # --------------------
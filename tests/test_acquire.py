@@ -0,0 +1,41 @@
+# tests/test_acquire.py
+import importlib
+
+import osmnx as ox
+import pytest
+import shapely
+
+from benchmarks.graphs import grid_graph
+from gallery.cache import SessionStore
+
+
+@pytest.fixture
+def acquire(monkeypatch):
+    module = importlib.import_module("gallery.acquire")
+    monkeypatch.setattr(module, "_coverage", SessionStore(64 * 1024**2))
+
+    def fetch(*args, **kwargs):
+        raise AssertionError("Overpass に問い合わせてはいけない")
+
+    monkeypatch.setattr(ox, "graph_from_polygon", fetch)
+    return module
+
+
+def test_bbox_inside_cached_graph_is_extracted_locally(acquire):
+    G = grid_graph(10)
+    xs = [d["x"] for _, d in G.nodes(data=True)]
+    ys = [d["y"] for _, d in G.nodes(data=True)]
+    boundary = shapely.box(min(xs), min(ys), max(xs), max(ys)).buffer(1e-6)
+    acquire.register_coverage(boundary, "drive", G)
+
+    # 格子の左下 4 × 4 のノードを含む範囲
+    dx, dy = xs[1] - xs[0], ys[10] - ys[0]
+    bbox = (min(xs), min(ys), xs[3] + dx / 2, ys[30] + dy / 2)
+    sub = acquire.graph_from_bbox(bbox, "drive")
+    assert sorted(sub.nodes) == [i * 10 + j for i in range(4) for j in range(4)]
+    assert sub.number_of_edges() == 2 * 2 * 4 * 3
+
+    # 別のネットワークタイプや範囲外は取得し直す
+    assert acquire.covering_graph(shapely.box(*bbox), "walk") is None
+    with pytest.raises(AssertionError):
+        acquire.graph_from_polygon(boundary.buffer(1), "drive")
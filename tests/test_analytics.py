@@ -0,0 +1,62 @@
+# tests/test_analytics.py
+import warnings
+
+import pytest
+
+pytest.importorskip("osmnx")
+
+import numpy as np
+import osmnx as ox
+from osmnx.bearing import _bearings_distribution
+
+from benchmarks.graphs import grid_graph, load
+from gallery import analytics
+
+
+def test_isochrones_grow_with_trip_time():
+    G = ox.project_graph(grid_graph(5))
+    # 100m 間隔の格子を分速 100m で移動する
+    polygons = analytics.isochrone_polygons(G, 12, [4, 2, 0], 100)
+    assert [t for t, _ in polygons] == [4, 2, 0]
+    areas = [poly.area for _, poly in polygons]
+    assert areas[0] > areas[1] > areas[2] == 0
+
+
+def test_to_igraph_keeps_nodes_and_edges():
+    pytest.importorskip("igraph")
+    G = grid_graph(3)
+    G_ig, mapping = analytics.to_igraph(G)
+    assert (G_ig.vcount(), G_ig.ecount()) == (9, 24)
+    assert G_ig.vs[mapping[4]]["name"] == "4"
+    assert G_ig.degree(mapping[4]) == 8
+
+
+def test_bearings_match_osmnx_without_mutating_graph():
+    G = load("mynetwork")
+    bearings, lengths = analytics.edge_bearing_arrays(G)
+    assert all("bearing" not in d for *_, d in G.edges(data=True))
+
+    G_ox = ox.bearing.add_edge_bearings(G.copy())
+    expected = [d["bearing"] for u, v, d in G_ox.edges(data=True) if u != v]
+    assert np.allclose(bearings, expected)
+
+    counts, centers = analytics.bearing_histogram(bearings, lengths, 36)
+    with warnings.catch_warnings():
+        # 有向グラフでは方向ごとの方位角になるという警告
+        warnings.simplefilter("ignore", UserWarning)
+        ox_counts, ox_centers = _bearings_distribution(G_ox, 36, 0, "length")
+        ox_entropy = ox.bearing.orientation_entropy(G_ox, weight="length")
+    assert np.allclose(counts, ox_counts)
+    assert np.allclose(centers, ox_centers)
+    assert analytics.orientation_entropy(counts) == pytest.approx(ox_entropy)
+
+
+def test_orientation_entropy_of_grid():
+    # 南北・東西の 4 方向だけの格子
+    bearings = analytics.edge_bearings(grid_graph(5))
+    counts, _ = analytics.bearing_histogram(bearings, num_bins=36)
+    assert np.count_nonzero(counts) == 4
+    assert analytics.orientation_entropy(counts) == pytest.approx(np.log(4))
+    assert analytics.orientation_entropy([1, 0, 0]) == 0
+    # エッジがない（長さがすべて 0 の）場合も NaN にしない
+    assert analytics.orientation_entropy(np.zeros(36)) == 0
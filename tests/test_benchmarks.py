@@ -0,0 +1,20 @@
+# tests/test_benchmarks.py
+from benchmarks.e2e import _union_length, compare
+
+
+def test_union_length_does_not_double_count_overlaps():
+    assert _union_length([(0.0, 2.0), (1.0, 3.0), (5.0, 6.0)]) == 4.0
+    assert _union_length([(0.0, 4.0), (1.0, 2.0)]) == 4.0
+    assert _union_length([]) == 0.0
+
+
+def test_compare_reports_only_significant_regressions():
+    baseline = {"pages": {"06": {"median": {"total": 1.0, "render": 0.01}}}}
+    current = {
+        "pages": {
+            "06": {"median": {"total": 1.5, "render": 0.03}},
+            "13": {"median": {"total": 9.0}},
+        }
+    }
+    regressions = compare(current, baseline, threshold=0.2)
+    assert [(r["page"], r["metric"]) for r in regressions] == [("06", "total")]
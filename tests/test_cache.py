@@ -0,0 +1,53 @@
+# tests/test_cache.py
+import pytest
+
+pytest.importorskip("streamlit")
+
+from gallery.cache import SessionStore, cache_key
+
+
+def test_cache_key_is_stable():
+    assert cache_key("graph", "東京都千代田区", "drive") == cache_key(
+        "graph", "東京都千代田区", "drive"
+    )
+    assert cache_key("graph", "東京都千代田区", "drive") != cache_key(
+        "graph", "東京都千代田区", "walk"
+    )
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_bytes=250)
+    store.put("a", b"x" * 100)
+    store.put("b", b"x" * 100)
+    assert store.get("a") is not None  # "a" を最近使用にする
+    store.put("c", b"x" * 100)
+
+    assert "a" in store and "c" in store
+    assert "b" not in store
+    assert store.nbytes == 200
+    assert store.stats()["evictions"] == 1
+
+
+def test_store_rejects_values_larger_than_budget():
+    store = SessionStore(max_bytes=250)
+    store.put("a", b"x" * 100)
+    value = b"x" * 300
+    assert store.put("big", value) is value
+
+    assert "big" not in store
+    assert "a" in store
+    assert store.nbytes == 100
+    assert store.stats()["rejected"] == 1
+
+
+def test_store_get_or_create_calls_factory_once():
+    store = SessionStore(max_bytes=1024)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return b"value"
+
+    assert store.get_or_create("k", factory) == b"value"
+    assert store.get_or_create("k", factory) == b"value"
+    assert len(calls) == 1
@@ -0,0 +1,44 @@
+# tests/test_consolidate.py
+import numpy as np
+import osmnx as ox
+import pytest
+
+from benchmarks.graphs import load_projected
+from gallery import consolidate
+
+
+def _sorted_xy(xy):
+    return np.array(sorted(map(tuple, np.round(np.asarray(xy, dtype=float), 3))))
+
+
+@pytest.mark.parametrize("tolerance", [5, 15, 50])
+def test_consolidated_nodes_match_osmnx(tolerance):
+    G = load_projected("mynetwork")
+    nodes = consolidate.hierarchy_for(G).consolidated_nodes(tolerance)
+    expected = ox.consolidate_intersections(G, tolerance=tolerance)
+
+    assert len(nodes) == len(expected)
+    assert np.allclose(
+        _sorted_xy(nodes[["x", "y"]].values),
+        _sorted_xy([(d["x"], d["y"]) for _, d in expected.nodes(data=True)]),
+        atol=0.01,
+    )
+    originals = {
+        tuple(sorted(ids)) if isinstance(ids, list) else (ids,)
+        for ids in nodes["osmid_original"]
+    }
+    assert originals == {
+        tuple(sorted(ids)) if isinstance(ids, list) else (ids,)
+        for _, ids in expected.nodes(data="osmid_original")
+    }
+
+
+def test_hierarchy_is_shared_and_bounded():
+    G = load_projected("grid-10")
+    hierarchy = consolidate.hierarchy_for(G)
+    assert consolidate.hierarchy_for(G) is hierarchy
+
+    # 格子の間隔は 100m なので、許容距離 50m 未満ではどのノードも統合されない
+    assert hierarchy.count(45) == len(G)
+    with pytest.raises(ValueError):
+        hierarchy.clusters(consolidate.MAX_TOLERANCE + 1)
@@ -0,0 +1,39 @@
+# tests/test_geocode.py
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pytest.importorskip("osmnx")
+
+from shapely.geometry import box
+
+from gallery import geocode
+
+
+def test_normalize_query_absorbs_width_and_spacing():
+    assert geocode.normalize_query("  東京都　千代田区 ") == "東京都 千代田区"
+    assert geocode.normalize_query("Ｐｉｅｄｍｏｎｔ,  CA") == "piedmont, ca"
+
+
+def test_geocode_is_cached_on_disk(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_geocode_to_gdf(query):
+        calls.append(query)
+        return gpd.GeoDataFrame(
+            {"display_name": [query], "geometry": [box(139.7, 35.6, 139.8, 35.7)]},
+            crs="epsg:4326",
+        )
+
+    monkeypatch.setattr(geocode, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(geocode, "_memory", {})
+    monkeypatch.setattr(geocode.ox, "geocode_to_gdf", fake_geocode_to_gdf)
+
+    first = geocode.place_polygon("東京都千代田区")
+    geocode._memory.clear()  # 別プロセスからの利用を想定してディスクから読み直す
+    second = geocode.place_polygon("東京都千代田区 ")
+    simplified = geocode.place_polygon("東京都千代田区", simplified=True)
+
+    assert calls == ["東京都千代田区"]
+    assert first.equals(second)
+    assert simplified.equals(first)
+    assert len(list(tmp_path.glob("*.json"))) == 1
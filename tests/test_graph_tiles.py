@@ -0,0 +1,101 @@
+# tests/test_graph_tiles.py
+import osmnx as ox
+import pytest
+import shapely
+
+from benchmarks.graphs import grid_graph
+from gallery import graph_tiles
+from gallery.cache import SessionStore
+
+
+@pytest.fixture
+def network(monkeypatch):
+    """格子状のネットワークを Overpass の代わりにタイル単位で返す。"""
+    G = grid_graph(20)
+    G.graph["simplified"] = False
+    fetched = []
+
+    def graph_from_bbox(bbox, **kwargs):
+        fetched.append(bbox)
+        box = shapely.box(*bbox)
+        inside = {
+            n
+            for n, d in G.nodes(data=True)
+            if box.intersects(shapely.Point(d["x"], d["y"]))
+        }
+        edges = [
+            (u, v, k) for u, v, k in G.edges(keys=True) if u in inside or v in inside
+        ]
+        return G.edge_subgraph(edges).copy()
+
+    monkeypatch.setattr(ox, "graph_from_bbox", graph_from_bbox)
+    monkeypatch.setattr(graph_tiles, "TILE_DEG", 0.005)
+    monkeypatch.setattr(graph_tiles, "_tiles", SessionStore(64 * 1024**2))
+    return G, fetched
+
+
+def _area(G, i0, i1):
+    # 格子の i0〜i1 行・列のノードを含む範囲
+    a, b = G.nodes[i0 * 20 + i0], G.nodes[i1 * 20 + i1]
+    return shapely.box(a["x"], a["y"], b["x"], b["y"]).buffer(1e-6)
+
+
+def test_stitched_tiles_match_a_single_fetch(network):
+    G, fetched = network
+    polygon = _area(G, 2, 15)
+    stitched = graph_tiles.graph_from_polygon(polygon, "drive")
+    assert len(fetched) == len(graph_tiles.tiles_for(polygon)) > 1
+
+    expected = ox.truncate.largest_component(
+        ox.truncate.truncate_graph_polygon(ox.simplify_graph(G), polygon)
+    )
+    assert set(stitched.nodes) == set(expected.nodes)
+    assert set(stitched.edges(keys=True)) == set(expected.edges(keys=True))
+
+
+def test_overlapping_queries_share_tiles(network):
+    G, fetched = network
+    graph_tiles.graph_from_polygon(_area(G, 0, 10), "drive")
+    first = len(fetched)
+    graph_tiles.graph_from_polygon(_area(G, 5, 12), "drive")
+    assert len(fetched) < 2 * first
+    # 重ならないタイルだけを取得し、破棄したタイルは取得し直す
+    before = len(fetched)
+    dropped = graph_tiles.invalidate(_area(G, 0, 1), "drive")
+    assert 0 < dropped < first
+    graph_tiles.graph_from_polygon(_area(G, 0, 10), "drive")
+    assert len(fetched) == before + dropped
+
+
+def test_graph_from_places_reports_progress(network, monkeypatch):
+    G, fetched = network
+    areas = {"west": _area(G, 0, 9), "east": _area(G, 8, 19)}
+    monkeypatch.setattr(graph_tiles, "place_polygon", areas.__getitem__)
+
+    progress = []
+    stitched = graph_tiles.graph_from_places(
+        list(areas), "drive", on_progress=lambda *args: progress.append(args)
+    )
+    assert sorted(p for p, _, _ in progress) == ["east", "west"]
+    assert [(done, total) for _, done, total in progress] == [(1, 2), (2, 2)]
+    # 共有するタイルは 1 度だけ取得する
+    assert len(fetched) == len(set(fetched))
+
+    union = shapely.union_all(list(areas.values()))
+    expected = graph_tiles.graph_from_polygon(union, "drive")
+    assert set(stitched.edges(keys=True)) == set(expected.edges(keys=True))
+
+
+def test_empty_tile_is_cached_and_other_errors_propagate(monkeypatch):
+    monkeypatch.setattr(graph_tiles, "_tiles", SessionStore(64 * 1024**2))
+
+    def graph_from_bbox(bbox, **kwargs):
+        if bbox[0] < 0:
+            raise ValueError("Found no graph nodes within the requested polygon")
+        raise ValueError("No data elements in server response.")
+
+    monkeypatch.setattr(ox, "graph_from_bbox", graph_from_bbox)
+    assert len(graph_tiles.get_tile((0, 0), "drive")) == 0
+    with pytest.raises(ValueError, match="no graph nodes"):
+        graph_tiles.get_tile((-1, 0), "drive")
+    assert graph_tiles._fetching == {}
@@ -0,0 +1,91 @@
+# tests/test_payload.py
+import json
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import LineString
+
+from gallery import payload
+
+
+def _lines():
+    # 1e-7 度（約 1cm）の揺れを含む線と、属性にリストを持つ線
+    x = np.linspace(139.70, 139.71, 50)
+    wiggly = LineString(np.c_[x, 35.68 + 1e-7 * np.sin(np.arange(50))])
+    straight = LineString([(139.70, 35.69), (139.71, 35.69)])
+    return gpd.GeoDataFrame(
+        {"highway": ["primary", ["residential", "tertiary"]], "osmid": [1, 2]},
+        geometry=[wiggly, straight],
+        crs="epsg:4326",
+    )
+
+
+def test_optimize_simplifies_rounds_and_prunes_columns():
+    data = payload.optimize(_lines(), zoom=16, columns=["highway", "missing"])
+    first, second = data["features"]
+    assert first["properties"] == {"highway": "primary"}
+    assert second["properties"] == {"highway": "['residential', 'tertiary']"}
+
+    # 1 ピクセルより細かい揺れは消え、座標は表示に必要な桁数に丸められる
+    coords = first["geometry"]["coordinates"]
+    assert len(coords) == 2
+    digits = payload.precision_for_zoom(16, 35.68)
+    assert all(round(v, digits) == v for xy in coords for v in xy)
+    assert payload.payload_bytes(data) < len(_lines().to_json())
+
+
+def test_optimize_drops_missing_numeric_values():
+    gdf = gpd.GeoDataFrame(
+        {"lanes": [2.0, np.nan]},
+        geometry=[LineString([(139.0, 35.0), (139.1, 35.1)])] * 2,
+        crs="epsg:4326",
+    )
+    data = payload.optimize(gdf, zoom=14, columns=["lanes"])
+    json.dumps(data, allow_nan=False)
+    assert [f["properties"] for f in data["features"]] == [{"lanes": 2.0}, {}]
+
+
+def test_tolerance_shrinks_with_zoom():
+    assert payload.tolerance_for_zoom(18) < payload.tolerance_for_zoom(14)
+    assert payload.precision_for_zoom(18) >= payload.precision_for_zoom(14)
+
+
+def test_optimize_topojson():
+    pytest.importorskip("topojson")
+    data = payload.optimize(_lines(), zoom=16, topojson=True, name="network")
+    assert data["type"] == "Topology"
+    assert "transform" in data
+    assert len(data["objects"]["network"]["geometries"]) == 2
+
+
+def test_representative_covers_the_whole_area():
+    import osmnx as ox
+
+    from benchmarks.graphs import grid_graph
+
+    edges = ox.graph_to_gdfs(grid_graph(20), nodes=False)
+    edges["highway"] = "residential"
+    # 西側の 1 列だけを幹線にする
+    west = edges.geometry.bounds["maxx"] <= edges.total_bounds[0] + 1e-9
+    edges.loc[west, "highway"] = "primary"
+
+    selected = payload.representative(
+        edges, 200, payload.edge_importance(edges), cells=4
+    )
+    assert len(selected) == 200
+    assert selected.index.equals(edges.index[edges.index.isin(selected.index)])
+    # 幹線はすべて残り、残りは範囲全体に散らばる
+    assert west[selected.index].sum() == west.sum()
+    minx, miny, maxx, maxy = edges.total_bounds
+    sminx, sminy, smaxx, smaxy = selected.total_bounds
+    assert smaxx - sminx > 0.9 * (maxx - minx)
+    assert smaxy - sminy > 0.9 * (maxy - miny)
+
+    assert payload.representative(edges, len(edges), None) is edges
+
+
+def test_highway_rank():
+    assert payload.highway_rank("primary_link") == payload.highway_rank("primary")
+    assert payload.highway_rank(["residential", "trunk"]) == 1
+    assert payload.highway_rank(None) == len(payload.HIGHWAY_CLASSES)
@@ -0,0 +1,68 @@
+# tests/test_perf.py
+import contextvars
+import socket
+import threading
+
+from gallery import perf
+
+
+def test_nested_stages_record_parent_spans():
+    trace = perf.start_trace("test")
+    with perf.stage("acquire"), perf.stage("fetch.graph", layer="graph"):
+        pass
+
+    # 別スレッドでもコンテキストをコピーすれば呼び出し元の子になる
+    with perf.stage("render"):
+        ctx = contextvars.copy_context()
+        thread = threading.Thread(target=ctx.run, args=(perf.stage("draw")(int),))
+        thread.start()
+        thread.join()
+
+    spans = {span.name: span for span in trace.spans}
+    assert spans["fetch.graph"].parent_id == spans["acquire"].span_id
+    assert spans["draw"].parent_id == spans["render"].span_id
+    assert spans["acquire"].parent_id is None
+    assert spans["fetch.graph"].attributes["layer"] == "graph"
+
+
+def test_stage_records_errors_and_exports():
+    trace = perf.start_trace("test-error")
+    try:
+        with perf.stage("analyze"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+
+    otlp = perf.to_otlp(trace)
+    (span,) = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert span["name"] == "analyze"
+    assert span["status"] == {"code": 2, "message": "ValueError: boom"}
+
+    text = perf.prometheus_text()
+    assert 'gallery_stage_errors_total{page="test-error",stage="analyze"} 1' in text
+    assert (
+        'gallery_stage_duration_seconds_count{page="test-error",stage="analyze"} 1'
+        in text
+    )
+
+
+def test_stage_without_trace_is_a_no_op():
+    perf._trace.set(None)
+    with perf.stage("acquire") as span:
+        assert span is None
+
+
+def test_metrics_server_binds_locally_by_default(monkeypatch):
+    monkeypatch.setattr(perf, "_metrics_server", None)
+    monkeypatch.delenv("GALLERY_METRICS_HOST", raising=False)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    perf.serve_metrics(port=port)
+    server = perf._metrics_server
+    try:
+        assert server.server_address == ("127.0.0.1", port)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,59 @@
+# tests/test_preload.py
+import threading
+
+import networkx as nx
+import pytest
+
+from gallery import preload
+from gallery.cache import SessionStore, cache_key
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(preload, "_store", SessionStore(1024**2))
+    monkeypatch.setattr(preload, "_pending", {})
+
+
+def test_parse_places():
+    assert preload.parse_places(None) == preload.DEFAULT_PLACES
+    assert preload.parse_places("") == []
+    assert preload.parse_places("東京都港区@walk; 京都市左京区") == [
+        ("東京都港区", "walk"),
+        ("京都市左京区", "drive"),
+    ]
+
+
+def test_lookup_returns_copies_and_falls_back_to_compute():
+    assert preload.lookup("graph", "港区", "drive", compute=lambda: "fetched") == (
+        "fetched"
+    )
+    G = nx.MultiDiGraph()
+    G.add_edge(1, 2)
+    preload._put(cache_key("graph", "港区", "drive"), G)
+    warm = preload.lookup("graph", "港区", "drive", compute=lambda: "fetched")
+    assert warm is not G and list(warm.edges) == list(G.edges)
+    assert preload.get(cache_key("graph", "港区", "drive")) is not None
+
+
+def test_lookup_waits_for_pending_value():
+    key = cache_key("bearings", "港区", "drive")
+    preload._pending[key] = threading.Event()
+    timer = threading.Timer(0.05, preload._put, args=(key, [0.0, 90.0]))
+    timer.start()
+    assert preload.lookup("bearings", "港区", "drive") == [0.0, 90.0]
+    timer.join()
+
+
+def test_preload_place_marks_only_the_running_stage_pending(monkeypatch):
+    seen = {}
+
+    def fetch(polygon, network_type):
+        seen["pending"] = set(preload._pending)
+        raise ValueError("取得できない")
+
+    monkeypatch.setattr(preload, "place_polygon", lambda place: None)
+    monkeypatch.setattr(preload.ox, "graph_from_polygon", fetch)
+    with pytest.raises(ValueError):
+        preload.preload_place("港区", "drive")
+    assert seen["pending"] == {cache_key("graph", "港区", "drive")}
+    assert preload._pending == {}
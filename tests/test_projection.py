@@ -0,0 +1,39 @@
+# tests/test_projection.py
+import osmnx as ox
+import pytest
+
+from benchmarks.graphs import grid_graph, load
+from gallery import projection
+
+
+@pytest.mark.parametrize("name", ["mynetwork", "grid-10"])
+def test_project_graph_matches_osmnx(name):
+    G = load(name)
+    expected = ox.project_graph(G)
+    result = projection.project_graph(G)
+
+    assert result.graph["crs"] == expected.graph["crs"]
+    assert set(result.nodes) == set(expected.nodes)
+    for n, d in expected.nodes(data=True):
+        assert result.nodes[n] == pytest.approx(d)
+    for u, v, k, d in expected.edges(keys=True, data=True):
+        data = result.edges[u, v, k]
+        assert data.keys() == d.keys()
+        if "geometry" in d:
+            assert data["geometry"].equals_exact(d["geometry"], 1e-6)
+
+
+def test_projection_is_shared_by_content():
+    G = grid_graph(5)
+    assert projection.projection_for(G.copy()) is projection.projection_for(G)
+
+    # 投影したグラフの属性を書き換えても元のグラフは変わらない
+    G_proj = projection.project_graph(G)
+    for *_, data in G_proj.edges(keys=True, data=True):
+        data["time"] = 1.0
+    G_proj.nodes[0]["cluster"] = 1
+    assert all("time" not in d for *_, d in G.edges(data=True))
+    assert "cluster" not in G.nodes[0]
+
+    # 投影済みのグラフはそのまま ox に任せる
+    assert projection.project_graph(G_proj).graph["crs"] == G_proj.graph["crs"]
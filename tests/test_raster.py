@@ -0,0 +1,36 @@
+# tests/test_raster.py
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+
+from benchmarks.graphs import grid_graph
+from gallery import raster, render
+
+
+def test_rasterize_counts_overlapping_segments():
+    segments = np.array([[0, 0, 9, 0], [0, 0, 9, 0], [0, 0, 0, 9]], dtype=float)
+    counts = raster.rasterize(segments, (0, 0, 9, 9), (10, 10))
+    # y 軸は画像の下が最小値
+    assert counts[9].tolist() == [3] + [2] * 9
+    assert counts[:, 0].sum() == 10 + 2
+    assert counts.sum() == 10 * 3
+
+
+def test_plot_graph_switches_to_raster_above_threshold(monkeypatch):
+    G = grid_graph(10)
+    segments, edge_ids = raster.edge_segments(G)
+    assert len(segments) == len(edge_ids) == G.number_of_edges()
+
+    monkeypatch.setattr(raster.settings, "RASTER_EDGE_THRESHOLD", 10)
+    assert raster.should_rasterize(G)
+
+    def draw():
+        fig, ax = raster.plot_graph(
+            G, bgcolor="w", node_size=0, edge_linewidth=0.8, show=False, close=False
+        )
+        assert len(ax.images) == 1 and not ax.collections
+        return fig
+
+    assert render.render_figure(draw)[:4] == b"\x89PNG"
@@ -0,0 +1,77 @@
+# tests/test_render.py
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import networkx as nx
+
+from gallery import render
+
+
+def _graph(x):
+    G = nx.MultiDiGraph(crs="epsg:4326")
+    G.add_node(1, x=0.0, y=0.0)
+    G.add_node(2, x=x, y=1.0)
+    G.add_edge(1, 2)
+    return G
+
+
+def test_fingerprint_follows_data():
+    assert render.fingerprint(_graph(1.0)) == render.fingerprint(_graph(1.0))
+    assert render.fingerprint(_graph(1.0)) != render.fingerprint(_graph(2.0))
+    assert render.fingerprint([1, 2]) != render.fingerprint([2, 1])
+
+
+def test_cached_figure_draws_once_per_data_and_style():
+    calls = []
+
+    def draw():
+        calls.append(1)
+        fig, ax = plt.subplots()
+        ax.plot([0, 1], [0, 1])
+        return fig
+
+    first = render.cached_figure(draw, _graph(1.0), color="red")
+    assert first.startswith(b"\x89PNG")
+    assert render.cached_figure(draw, _graph(1.0), color="red") == first
+    assert len(calls) == 1
+    render.cached_figure(draw, _graph(1.0), color="blue")
+    render.cached_figure(draw, _graph(1.0), color="blue", fmt="svg")
+    assert len(calls) == 3
+    assert plt.get_fignums() == []
+
+
+def test_render_figure_closes_figures_when_drawing_fails():
+    def draw():
+        plt.subplots()
+        raise RuntimeError("basemap unavailable")
+
+    try:
+        render.render_figure(draw)
+    except RuntimeError:
+        pass
+    assert plt.get_fignums() == []
+
+
+def test_render_figure_leaves_other_figures_open():
+    # 別のセッションが描画中の図
+    other = plt.figure()
+    try:
+
+        def draw():
+            plt.figure()  # 返さない図も閉じる
+            fig, _ = plt.subplots()
+            return fig
+
+        render.render_figure(draw)
+        assert plt.get_fignums() == [other.number]
+    finally:
+        plt.close(other)
+
+
+def test_record_memory_publishes_gauges():
+    render.record_memory()
+    text = render.perf.prometheus_text()
+    assert "gallery_matplotlib_open_figures 0" in text
+    assert "# TYPE gallery_figure_cache_bytes gauge" in text
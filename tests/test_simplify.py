@@ -0,0 +1,59 @@
+# tests/test_simplify.py
+import osmnx as ox
+import pytest
+
+from benchmarks.graphs import grid_graph, load, unsimplified
+from gallery import settings, simplify
+
+
+def _edges(G):
+    # エッジのキーは問わず、両端・長さ・形状で比べる
+    return sorted(
+        (
+            u,
+            v,
+            round(d["length"], 6),
+            tuple(d["geometry"].coords) if "geometry" in d else (),
+        )
+        for u, v, d in G.edges(data=True)
+    )
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    monkeypatch.setattr(settings, "SIMPLIFY_WORKERS", 2)
+    monkeypatch.setattr(settings, "SIMPLIFY_PARALLEL_NODES", 0)
+
+
+@pytest.mark.parametrize("name", ["mynetwork", "grid-20"])
+def test_parallel_simplify_matches_osmnx(parallel, name):
+    G = unsimplified(load(name))
+    expected = ox.simplify_graph(G)
+    result = simplify.simplify_graph(G)
+
+    assert result.graph["simplified"]
+    assert set(result.nodes) == set(expected.nodes)
+    assert _edges(result) == _edges(expected)
+    # 元のグラフは変更しない
+    assert not G.graph.get("simplified")
+
+
+def test_partition_covers_all_nodes():
+    G = grid_graph(10)
+    parts = simplify.partition(G, 8)
+    assert len(parts) == 9
+    assert set().union(*parts) == set(G.nodes)
+    assert sum(map(len, parts)) == len(G)
+
+
+def test_small_graphs_use_osmnx(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ox, "simplify_graph", lambda G, **kw: calls.append(G) or G)
+    G = unsimplified(grid_graph(3))
+    assert simplify.simplify_graph(G) is G
+    assert calls == [G]
+
+
+def test_simplified_graph_is_rejected(parallel):
+    with pytest.raises(simplify.GraphSimplificationError):
+        simplify.simplify_graph(grid_graph(3))
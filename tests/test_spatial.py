@@ -0,0 +1,64 @@
+# tests/test_spatial.py
+import gc
+import weakref
+
+import numpy as np
+import osmnx as ox
+import shapely
+
+from benchmarks.graphs import grid_graph
+from gallery import spatial
+
+
+def _points(G, n=200):
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)])
+    rng = np.random.default_rng(0)
+    points = rng.uniform(xy.min(axis=0), xy.max(axis=0), size=(n, 2))
+    return points[:, 0], points[:, 1]
+
+
+def test_nearest_nodes_match_osmnx():
+    G = grid_graph(10)
+    index = spatial.index_for(G)
+    assert spatial.index_for(G) is index
+
+    X, Y = _points(G)
+    assert (index.nearest_nodes(X, Y) == ox.distance.nearest_nodes(G, X, Y)).all()
+    node, dist = index.nearest_nodes(X[0], Y[0], return_dist=True)
+    expected = ox.distance.nearest_nodes(G, X[0], Y[0], return_dist=True)
+    assert node == expected[0]
+    assert np.isclose(dist, expected[1])
+
+    G_proj = ox.project_graph(G)
+    X, Y = _points(G_proj)
+    assert (
+        spatial.index_for(G_proj).nearest_nodes(X, Y)
+        == ox.distance.nearest_nodes(G_proj, X, Y)
+    ).all()
+
+
+def test_nearest_edges_and_area_queries():
+    G = ox.project_graph(grid_graph(5))
+    index = spatial.index_for(G)
+
+    X, Y = _points(G, 50)
+    edges = index.nearest_edges(X, Y)
+    expected = ox.distance.nearest_edges(G, X, Y)
+    # 双方向のエッジはどちらの向きでもよい
+    assert all({u, v} == {eu, ev} for (u, v, _), (eu, ev, _) in zip(edges, expected))
+
+    x, y = G.nodes[0]["x"], G.nodes[0]["y"]
+    assert index.nodes_in_bbox((x - 1, y - 1, x + 150, y + 150)) == [0, 1, 5, 6]
+    assert set(index.edges_within(shapely.Point(x, y).buffer(1))) == {
+        (u, v, k) for u, v, k in G.edges(keys=True) if 0 in (u, v)
+    }
+
+
+def test_index_is_released_with_graph():
+    G = grid_graph(3)
+    index = spatial.index_for(G)
+    index.nearest_nodes(0.0, 0.0)
+    ref = weakref.ref(index)
+    del G, index
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,23 @@
+# tests/test_startup.py
+import sys
+
+from gallery import startup
+
+
+def test_lazy_import_defers_until_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / "gallery_lazy_sample.py").write_text("VALUE = 42\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "gallery_lazy_sample", raising=False)
+
+    module = startup.lazy_import("gallery_lazy_sample")
+    assert "gallery_lazy_sample" not in sys.modules
+    assert module.VALUE == 42
+    assert "gallery_lazy_sample" in sys.modules
+    assert startup.lazy_import("gallery_lazy_sample") is sys.modules[module.__name__]
+
+
+def test_japanese_font_is_resolved_once():
+    startup._resolve_japanese_font.cache_clear()
+    first = startup.japanese_font()
+    assert startup.japanese_font() == first
+    assert startup._resolve_japanese_font.cache_info().hits == 1
@@ -0,0 +1,67 @@
+# tests/test_stub_server.py
+import pytest
+
+pytest.importorskip("osmnx")
+
+from benchmarks.graphs import FIXTURE
+from gallery.stub_server import OsmExtract, StubBackend
+
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <bounds minlat="0" minlon="0" maxlat="1" maxlon="1"/>
+  <node id="1" lat="0.1" lon="0.1"/>
+  <node id="2" lat="0.2" lon="0.2"/>
+  <node id="3" lat="5.0" lon="5.0"/>
+  <node id="4" lat="0.3" lon="0.3"><tag k="amenity" v="cafe"/></node>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="residential"/></way>
+  <way id="11"><nd ref="2"/><nd ref="3"/><tag k="highway" v="service"/></way>
+  <way id="12"><nd ref="1"/><nd ref="4"/><tag k="building" v="yes"/></way>
+</osm>
+"""
+
+POLY = "0 0 0 1 1 1 1 0"
+
+
+@pytest.fixture
+def extract(tmp_path):
+    path = tmp_path / "sample.osm"
+    path.write_text(OSM_XML, encoding="utf-8")
+    return OsmExtract(path)
+
+
+def test_way_query_applies_filters_and_recurses_down(extract):
+    query = f'[out:json];(way["highway"]["highway"!~"service"](poly:"{POLY}");>;);out;'
+    elements = extract.query(query)
+    ids = {(e["type"], e["id"]) for e in elements}
+    assert ids == {("way", 10), ("node", 1), ("node", 2)}
+
+
+def test_node_query_is_limited_to_polygon(extract):
+    query = f"[out:json];(node['amenity'='cafe'](poly:'{POLY}');(._;>;););out;"
+    elements = extract.query(query)
+    assert [(e["type"], e["id"]) for e in elements] == [("node", 4)]
+
+
+def test_recorded_response_takes_precedence(extract, tmp_path):
+    backend = StubBackend(extract, responses_dir=tmp_path / "responses")
+    query = f"[out:json];(node['amenity'='cafe'](poly:'{POLY}'););out;"
+    backend._record("overpass", query, {"elements": []})
+    assert backend.overpass(query) == {"elements": []}
+    assert backend.nominatim("search", {"q": "anywhere"})[0]["boundingbox"] == [
+        "0.0",
+        "5.0",
+        "0.0",
+        "5.0",
+    ]
+
+
+def test_graphml_elements_do_not_collide_with_osm_ids(tmp_path):
+    path = tmp_path / "sample.osm"
+    path.write_text(OSM_XML, encoding="utf-8")
+    extract = OsmExtract(FIXTURE, path)
+
+    # 復元したウェイと形状点のノードは負の ID、OSM データの要素はそのまま残る
+    assert all(w < 0 for w in extract.ways if w not in (10, 11, 12))
+    assert extract.ways[10][0] == [1, 2]
+    assert min(extract.nodes) < 0
+    assert extract.nodes[4][2] == {"amenity": "cafe"}
@@ -0,0 +1,71 @@
+# tests/test_tiles.py
+import urllib.request
+
+import osmnx as ox
+import pytest
+
+from benchmarks.graphs import grid_graph
+from gallery import tiles
+from gallery.cache import SessionStore
+
+
+@pytest.fixture(autouse=True)
+def empty_layers(monkeypatch):
+    monkeypatch.setattr(tiles, "_layers", SessionStore(64 * 1024**2))
+
+
+def _edges():
+    return ox.graph_to_gdfs(grid_graph(10), nodes=False)
+
+
+def test_tile_features_are_clipped_and_thinned_by_zoom():
+    edges = _edges()
+    layer_id = tiles.publish("network", edges, columns=["length", "osmid"])
+    assert tiles.publish("network", edges, columns=["length", "osmid"]) == layer_id
+    layer = tiles._layers.get(layer_id)
+
+    lon, lat = edges.union_all().centroid.coords[0]
+    # 格子全体が 1 タイルに収まるズームでは、すべてのエッジが含まれる
+    features = tiles.tile_features(layer, 12, *tiles.lonlat_to_tile(lon, lat, 12))
+    assert len(features) == len(edges)
+    assert set(features[0]["properties"]) <= {"length", "osmid"}
+
+    # ズームを上げると範囲外のエッジは含まれない
+    x, y = tiles.lonlat_to_tile(lon, lat, 18)
+    features = tiles.tile_features(layer, 18, x, y)
+    assert 0 < len(features) < len(edges)
+    bounds = tiles.tile_bounds(18, x, y)
+    for feature in features:
+        minx, miny, maxx, maxy = feature["geometry"].bounds
+        assert minx >= bounds[0] - 20 and maxx <= bounds[2] + 20
+        assert miny >= bounds[1] - 20 and maxy <= bounds[3] + 20
+
+    # 小さすぎて見えないズームでは省略される
+    assert tiles.tile_features(layer, 4, *tiles.lonlat_to_tile(lon, lat, 4)) == []
+
+
+def test_tile_features_keep_points():
+    nodes = ox.graph_to_gdfs(grid_graph(10), edges=False)
+    layer = tiles._layers.get(tiles.publish("nodes", nodes))
+    lon, lat = nodes.union_all().centroid.coords[0]
+    features = tiles.tile_features(layer, 12, *tiles.lonlat_to_tile(lon, lat, 12))
+    assert len(features) == len(nodes)
+
+
+def test_tile_server_returns_vector_tiles():
+    mapbox_vector_tile = pytest.importorskip("mapbox_vector_tile")
+    edges = _edges()
+    layer_id = tiles.publish("network", edges)
+    port = tiles.serve(0)
+
+    lon, lat = edges.union_all().centroid.coords[0]
+    x, y = tiles.lonlat_to_tile(lon, lat, 15)
+    url = tiles.tile_url(layer_id).format(z=15, x=x, y=y)
+    assert url.startswith(f"http://localhost:{port}/tiles/")
+    with urllib.request.urlopen(url) as response:
+        assert response.headers["Access-Control-Allow-Origin"] == "*"
+        tile = mapbox_vector_tile.decode(response.read())
+    assert 0 < len(tile["network"]["features"]) <= len(edges)
+
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(tiles.tile_url("missing").format(z=15, x=x, y=y))